@@ -1,9 +1,40 @@
-from seekret.apitest.auth import auth_method_factory, register_auth_method_factory
-from seekret.apitest.context import Context
-from seekret.apitest.pytest_plugin import seekret
-from seekret.apitest.runprofile import RunProfile
+import importlib
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from seekret.apitest.auth import auth_method_factory, register_auth_method_factory
+    from seekret.apitest.context import Context
+    from seekret.apitest.pytest_plugin import seekret
+    from seekret.apitest.runprofile import RunProfile, RunProfileError, RequestPolicy
+
+# Modules of the exported names. The package is imported by the pytest plugin entry point on every pytest run, so the
+# exported names are imported on first access only, to keep `requests` and the other dependencies out of pytest runs
+# that don't use Seekret.
+_EXPORTS = {
+    'Context': 'seekret.apitest.context',
+    'seekret': 'seekret.apitest.pytest_plugin',
+    'auth_method_factory': 'seekret.apitest.auth',
+    'register_auth_method_factory': 'seekret.apitest.auth',
+    'RunProfile': 'seekret.apitest.runprofile',
+    'RunProfileError': 'seekret.apitest.runprofile',
+    'RequestPolicy': 'seekret.apitest.runprofile',
+}
+
+
+def __getattr__(name: str):
+    if name not in _EXPORTS:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+    value = getattr(importlib.import_module(_EXPORTS[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
+
 
 __all__ = [
     'Context', 'seekret', 'auth_method_factory', 'RunProfile',
-    'register_auth_method_factory'
+    'RunProfileError', 'RequestPolicy', 'register_auth_method_factory'
 ]
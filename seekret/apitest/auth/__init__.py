@@ -1,8 +1,9 @@
 from seekret.apitest.auth.bearer import BearerAuth
 from seekret.apitest.auth.factory import create_auth, auth_method_factory, register_auth_method_factory
 from seekret.apitest.auth.headers import HeadersAuth
+from seekret.apitest.auth.oauth2 import OAuth2ClientCredentialsAuth, OAuth2Error
 
 __all__ = [
     'create_auth', 'auth_method_factory', 'HeadersAuth', 'BearerAuth',
-    'register_auth_method_factory'
+    'OAuth2ClientCredentialsAuth', 'OAuth2Error', 'register_auth_method_factory'
 ]
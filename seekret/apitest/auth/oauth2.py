@@ -0,0 +1,365 @@
+import dataclasses
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Optional, Union
+
+import requests
+from requests import PreparedRequest
+from requests.auth import AuthBase
+
+from seekret.apitest.auth.factory import auth_method_factory
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Lifetime of tokens whose response has no "expires_in" value, in seconds.
+DEFAULT_EXPIRES_IN = 3600
+
+# Time before the expiration of a token to refresh it in the background, in seconds.
+DEFAULT_REFRESH_MARGIN = 60
+
+# Tokens are not used in the last seconds before they expire, to account for clock skew and request latency.
+_EXPIRY_SAFETY_MARGIN = 5
+
+_TOKEN_REQUEST_TIMEOUT = 30
+
+
+class OAuth2Error(RuntimeError):
+    """
+    Raised when the token endpoint fails to issue a token.
+    """
+    pass
+
+
+@dataclasses.dataclass(frozen=True)
+class _ClientConfig(object):
+    token_url: str
+    client_id: str
+    client_secret: str
+    scope: Optional[str]
+    audience: Optional[str]
+    client_auth: str
+    refresh_margin: float
+    cache_file: Optional[str]
+
+    @classmethod
+    def from_data(cls, data: dict[str, Any]) -> '_ClientConfig':
+        for key in ('token_url', 'client_id', 'client_secret'):
+            if key not in data:
+                raise ValueError(
+                    f'oauth2_client_credentials auth requires "{key}"')
+
+        client_auth = data.get('client_auth', 'basic')
+        if client_auth not in ('basic', 'post'):
+            raise ValueError(
+                f'unsupported oauth2 client_auth "{client_auth}", expected "basic" or "post"'
+            )
+
+        scope: Union[str, list[str], None] = data.get('scope')
+        if isinstance(scope, list):
+            scope = ' '.join(scope)
+
+        cache_file = data.get('cache_file', True)
+        if cache_file is True:
+            cache_file = _default_cache_file(data['token_url'],
+                                             data['client_id'],
+                                             data['client_secret'],
+                                             client_auth, scope,
+                                             data.get('audience'))
+        elif cache_file is False:
+            cache_file = None
+
+        return cls(token_url=data['token_url'],
+                   client_id=data['client_id'],
+                   client_secret=data['client_secret'],
+                   scope=scope,
+                   audience=data.get('audience'),
+                   client_auth=client_auth,
+                   refresh_margin=float(
+                       data.get('refresh_margin', DEFAULT_REFRESH_MARGIN)),
+                   cache_file=cache_file)
+
+
+def _default_cache_file(token_url: str, client_id: str, client_secret: str,
+                        client_auth: str, scope: Optional[str],
+                        audience: Optional[str]) -> str:
+    """
+    Path of the token cache file of the client, shared by all the processes of the current user.
+    The secret is part of the key, so a client with another secret never gets the token issued for this one.
+    """
+
+    key = hashlib.sha256(
+        f'{token_url}\n{client_id}\n{client_secret}\n{client_auth}\n{scope}\n{audience}'
+        .encode()).hexdigest()
+    user = os.getuid() if hasattr(os, 'getuid') else os.getlogin()
+    return os.path.join(tempfile.gettempdir(),
+                        f'seekret-oauth2-{user}-{key[:16]}.json')
+
+
+@dataclasses.dataclass(frozen=True)
+class _Token(object):
+    access_token: str
+
+    # Time to refresh the token at, in seconds since the epoch.
+    refresh_at: float
+
+    # Time to stop using the token at, shortly before it expires, in seconds since the epoch.
+    expires_at: float
+
+    @classmethod
+    def issued(cls, access_token: str, issued_at: float, lifetime: float,
+               refresh_margin: float) -> '_Token':
+        # Short-lived tokens are refreshed half way through their lifetime, instead of right away.
+        return cls(access_token=access_token,
+                   refresh_at=issued_at +
+                   max(lifetime - refresh_margin, lifetime / 2),
+                   expires_at=issued_at +
+                   max(lifetime - _EXPIRY_SAFETY_MARGIN, lifetime * 0.9))
+
+    def usable(self, now: float) -> bool:
+        return now < self.expires_at
+
+    def fresh(self, now: float) -> bool:
+        return now < self.refresh_at
+
+
+class _TokenManager(object):
+    """
+    Issues and caches the tokens of a single OAuth2 client.
+
+    Tokens are cached in memory, and in a local file shared by all the processes of the test session (such as
+    `pytest-xdist` workers). Fetching a token is locked across the processes, so only one process requests a token
+    from the token endpoint at a time, and the others use the token it stored in the file.
+    Tokens are refreshed in the background shortly before they expire, so requests never wait for the token endpoint
+    after the first token was issued. Tokens that weren't used since the request that fetched them are not refreshed in
+    the background, so clients that are no longer used stop calling the token endpoint.
+    """
+    def __init__(self, config: _ClientConfig):
+        self.config = config
+
+        self._token: Optional[_Token] = None
+        self._lock = threading.Lock()
+        self._refresh_timer: Optional[threading.Timer] = None
+        # Whether the token was used since it was stored, by other requests than the one that fetched it.
+        self._used = False
+
+    def get_token(self) -> _Token:
+        now = time.time()
+        token = self._token
+        if token is None or not token.usable(now):
+            return self._refresh(force=False)
+
+        self._used = True
+        if self._refresh_timer is None and not token.fresh(now):
+            # The background refresh stopped while the token wasn't used.
+            with self._lock:
+                if self._refresh_timer is None:
+                    self._schedule_refresh(token)
+        return token
+
+    def _refresh(self, force: bool) -> _Token:
+        """
+        Get a fresh token, from the file cache or the token endpoint.
+
+        :param force: Fetch a new token even if the current token is still usable, as long as it's not fresh.
+        """
+
+        with self._lock:
+            now = time.time()
+            token = self._token
+            if token is not None and (token.fresh(now) or
+                                      (not force and token.usable(now))):
+                return token
+
+            with self._file_lock():
+                token = self._read_cache_file()
+                if token is None or not token.fresh(time.time()):
+                    token = self._fetch_token()
+                    self._write_cache_file(token)
+
+            self._token = token
+            self._used = False
+            self._schedule_refresh(token)
+            return token
+
+    def close(self):
+        """
+        Stop refreshing the token in the background.
+        """
+
+        with self._lock:
+            if self._refresh_timer is not None:
+                self._refresh_timer.cancel()
+                self._refresh_timer = None
+
+    def _schedule_refresh(self, token: _Token):
+        if self._refresh_timer is not None:
+            self._refresh_timer.cancel()
+
+        delay = max(token.refresh_at - time.time(), 0)
+        self._refresh_timer = threading.Timer(delay, self._background_refresh)
+        self._refresh_timer.daemon = True
+        self._refresh_timer.start()
+
+    def _background_refresh(self):
+        if not self._used:
+            # Not used since the last refresh. The next request refreshes the token once it expires.
+            with self._lock:
+                self._refresh_timer = None
+            return
+
+        try:
+            self._refresh(force=True)
+        except Exception as e:
+            # The token is refreshed again by the next request once it expires.
+            logger.warning(
+                f'failed refreshing oauth2 token of client {self.config.client_id}: {e}'
+            )
+
+    def _fetch_token(self) -> _Token:
+        config = self.config
+        form = {'grant_type': 'client_credentials'}
+        if config.scope:
+            form['scope'] = config.scope
+        if config.audience:
+            form['audience'] = config.audience
+
+        auth = None
+        if config.client_auth == 'basic':
+            auth = (config.client_id, config.client_secret)
+        else:
+            form['client_id'] = config.client_id
+            form['client_secret'] = config.client_secret
+
+        issued_at = time.time()
+        response = requests.post(config.token_url,
+                                 data=form,
+                                 auth=auth,
+                                 headers={'Accept': 'application/json'},
+                                 timeout=_TOKEN_REQUEST_TIMEOUT)
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+
+        if not response.ok or not isinstance(
+                body, dict) or 'access_token' not in body:
+            raise OAuth2Error(
+                f'token request to {config.token_url} failed with status {response.status_code}: '
+                f'{response.text[:500]}')
+
+        return _Token.issued(body['access_token'],
+                             issued_at=issued_at,
+                             lifetime=float(
+                                 body.get('expires_in', DEFAULT_EXPIRES_IN)),
+                             refresh_margin=config.refresh_margin)
+
+    def _file_lock(self):
+        return _FileLock(self.config.cache_file and
+                         f'{self.config.cache_file}.lock')
+
+    def _read_cache_file(self) -> Optional[_Token]:
+        if self.config.cache_file is None:
+            return None
+
+        try:
+            with open(self.config.cache_file, 'r') as f:
+                return _Token(**json.load(f))
+        except (OSError, ValueError, TypeError):
+            return None
+
+    def _write_cache_file(self, token: _Token):
+        if self.config.cache_file is None:
+            return
+
+        temp_path = f'{self.config.cache_file}.{os.getpid()}.tmp'
+        try:
+            # Readable by the current user only, since the file holds credentials.
+            fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC,
+                         0o600)
+            with os.fdopen(fd, 'w') as f:
+                json.dump(dataclasses.asdict(token), f)
+            os.replace(temp_path, self.config.cache_file)
+        except OSError as e:
+            logger.warning(
+                f'failed writing oauth2 token cache {self.config.cache_file}: {e}'
+            )
+
+
+class _FileLock(object):
+    """
+    Exclusive lock across processes, held while the context is entered. Does nothing without a path, or on platforms
+    without `fcntl`.
+    """
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self._fd: Optional[int] = None
+
+    def __enter__(self):
+        if self.path is not None and fcntl is not None:
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+
+# Token managers of the OAuth2 clients, shared by all auth handlers of the same client.
+_token_managers: dict[_ClientConfig, _TokenManager] = {}
+_token_managers_lock = threading.Lock()
+
+
+def _get_token_manager(config: _ClientConfig) -> _TokenManager:
+    with _token_managers_lock:
+        manager = _token_managers.get(config)
+        if manager is None:
+            manager = _token_managers[config] = _TokenManager(config)
+
+        return manager
+
+
+@auth_method_factory(type_name='oauth2_client_credentials')
+class OAuth2ClientCredentialsAuth(AuthBase):
+    """
+    OAuth2 client credentials grant.
+
+    The token is issued by the token endpoint on the first request, cached and shared by all users and processes with
+    the same client, and refreshed in the background before it expires.
+
+    Supported data keys:
+
+    * `token_url` - URL of the token endpoint (required).
+    * `client_id`, `client_secret` - Credentials of the client (required).
+    * `scope` - Requested scope, as a string or a list of scopes.
+    * `audience` - Requested audience.
+    * `client_auth` - How the client credentials are sent: "basic" (HTTP basic auth, default) or "post" (in the form).
+    * `refresh_margin` - Time before the token expires to refresh it, in seconds (default: 60).
+    * `cache_file` - Path of the token cache file shared by processes, or `false` to disable the file cache.
+    """
+    def __init__(self, data: dict[str, Any]):
+        self._manager = _get_token_manager(_ClientConfig.from_data(data))
+
+    def __call__(self, request: PreparedRequest) -> PreparedRequest:
+        token = self._manager.get_token()
+        request.headers['Authorization'] = f'Bearer {token.access_token}'
+        return request
+
+    def close(self):
+        """
+        Stop refreshing the token of the client in the background, until it's used again.
+        """
+
+        self._manager.close()
@@ -0,0 +1,13 @@
+"""
+The `seekret.apitest.benchmark` package measures the overhead of the `seekret.apitest` runtime against a local
+in-process stand-in server.
+
+Run the benchmarks using `python -m seekret.apitest.benchmark`.
+"""
+from seekret.apitest.benchmark.runner import BenchmarkResult, run_benchmarks, compare_results, benchmark
+from seekret.apitest.benchmark.server import StandInServer
+
+__all__ = [
+    'BenchmarkResult', 'run_benchmarks', 'compare_results', 'benchmark',
+    'StandInServer'
+]
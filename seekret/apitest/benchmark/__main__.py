@@ -0,0 +1,50 @@
+import argparse
+import sys
+
+from seekret.apitest.benchmark.runner import run_benchmarks, render_results, save_results, load_results, \
+    compare_results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m seekret.apitest.benchmark',
+        description='Measure the per-request overhead of seekret.apitest against a local stand-in server')
+    parser.add_argument('-k',
+                        dest='patterns',
+                        action='append',
+                        help='Run only benchmarks matching the glob pattern (can be repeated)')
+    parser.add_argument('--min-time',
+                        type=float,
+                        default=0.2,
+                        help='Minimal time of each timing round, in seconds')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of timing rounds of each benchmark')
+    parser.add_argument('--save', help='Save the results to the given JSON file')
+    parser.add_argument('--compare', help='Compare the results against baseline results saved using --save')
+    parser.add_argument(
+        '--max-regression',
+        type=float,
+        default=0.25,
+        help='Fail when a benchmark is slower or uses more memory than the baseline by more than this fraction')
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.patterns, min_time=args.min_time, repeat=args.repeat)
+    print(render_results(results))
+
+    if args.save:
+        save_results(results, args.save)
+
+    if args.compare:
+        report, regressions = compare_results(results,
+                                              load_results(args.compare),
+                                              args.max_regression)
+        print()
+        print(report)
+        if regressions:
+            print(f'\nregressions: {", ".join(regressions)}')
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,447 @@
+import dataclasses
+import fnmatch
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable, Iterable
+from typing import Optional
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from seekret.apitest.benchmark.server import StandInServer, make_payload
+from seekret.apitest.context.cassette import Cassette, CASSETTE_MODE_RECORD, CASSETTE_MODE_REPLAY
+from seekret.apitest.context.jsoncodec import available_codecs, create_codec
+from seekret.apitest.context.listener import SessionListener, RequestRecord
+from seekret.apitest.context.requestlog import RequestLog, LOG_MODE_NONE
+from seekret.apitest.context.response import ResponseWrapper
+from seekret.apitest.context.session import Session, resolve_path_params
+from seekret.apitest.context.stats import render_table
+from seekret.apitest.runprofile import RunProfile, User, UserAuth
+
+# Payload sizes of the end-to-end request benchmarks.
+PAYLOAD_SIZES = (1024, 64 * 1024, 1024 * 1024)
+
+_SCHEMA = """
+type: seq
+sequence:
+  - type: map
+    mapping:
+      id:
+        type: int
+        required: true
+      name:
+        type: str
+      tags:
+        type: seq
+        sequence:
+          - type: str
+      nested:
+        type: map
+        mapping:
+          value:
+            type: float
+"""
+
+
+@dataclasses.dataclass(frozen=True)
+class BenchmarkResult(object):
+    """
+    Result of a single benchmark.
+    """
+
+    name: str
+
+    # Number of operations in each timing round.
+    iterations: int
+
+    # Mean time of a single operation, in seconds.
+    seconds_per_op: float
+
+    # Peak memory allocated while running the operation, in bytes.
+    peak_memory_bytes: int
+
+    # Median time spent by the plugin itself in each request, in seconds. Only set for benchmarks sending requests.
+    overhead_per_op: Optional[float] = None
+
+    @property
+    def ops_per_second(self) -> float:
+        return 1 / self.seconds_per_op if self.seconds_per_op else 0.0
+
+
+class _OverheadCollector(SessionListener):
+    def __init__(self):
+        self.samples: list[float] = []
+
+    def request_finished(self, record: RequestRecord):
+        if record.timings is not None:
+            self.samples.append(record.timings.overhead)
+
+
+class BenchmarkEnvironment(object):
+    """
+    Environment shared by the benchmarks: a stand-in server, and a session targeting it.
+    """
+    def __init__(self, server: StandInServer):
+        self.server = server
+        # The sessions don't log requests, since the log keeps every exchange and would be measured as the memory of
+        # the benchmarks.
+        self.session = Session(RunProfile(
+            target_server=server.url,
+            users={
+                'default':
+                User(auth=UserAuth(type='bearer', data={'token': 'abcd1234'}))
+            }),
+                               request_log=RequestLog(mode=LOG_MODE_NONE))
+
+        self.overhead = _OverheadCollector()
+        self.session.add_listener(self.overhead)
+
+        # Directory for files created by the benchmarks, removed when the environment is closed.
+        self.directory = tempfile.mkdtemp(prefix='seekret-benchmark-')
+        self._sessions = [self.session]
+
+    def create_session(self, cassette: Optional[Cassette] = None) -> Session:
+        """
+        Create another session like the session of the environment, closed when the environment is closed.
+        """
+
+        session = Session(self.session.run_profile,
+                          request_log=RequestLog(mode=LOG_MODE_NONE),
+                          cassette=cassette)
+        session.add_listener(self.overhead)
+        self._sessions.append(session)
+        return session
+
+    def close(self):
+        for session in self._sessions:
+            session.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+# Benchmark factory: receives the environment, and returns the operation to measure.
+BenchmarkFactory = Callable[[BenchmarkEnvironment], Callable[[], None]]
+
+BENCHMARKS: dict[str, BenchmarkFactory] = {}
+
+
+def benchmark(name: str):
+    """
+    Register the decorated function as a benchmark factory.
+    """
+    def decorator(factory: BenchmarkFactory):
+        BENCHMARKS[name] = factory
+        return factory
+
+    return decorator
+
+
+def _make_response(content: bytes) -> requests.Response:
+    response = requests.Response()
+    response.status_code = 200
+    response.reason = 'OK'
+    response.url = 'http://127.0.0.1/api/items'
+    response.headers = CaseInsensitiveDict({
+        'Content-Type': 'application/json',
+        'X-Request-Id': 'abcd'
+    })
+    response._content = content
+    return response
+
+
+@benchmark('resolve_path_params')
+def _resolve_path_params(env: BenchmarkEnvironment):
+    params = {'user_id': 'user/1', 'channel_id': 1234}
+    return lambda: resolve_path_params(
+        '/api/users/{user_id}/channels/{channel_id}', params)
+
+
+@benchmark('prepare_request')
+def _prepare_request(env: BenchmarkEnvironment):
+    env.session._auth_handler('default')  # Create the auth handler once, as in a test session.
+    return lambda: env.session._prepare_request(
+        'POST',
+        '/api/users/{user_id}/channels',
+        json={'name': 'channel'},
+        path_params={'user_id': 'user-1'},
+        query={'limit': 10},
+        user='default')
+
+
+@benchmark('request_log')
+def _request_log(env: BenchmarkEnvironment):
+    request_log = RequestLog()
+    prepared_request = env.session._prepare_request('POST',
+                                                    '/api/items',
+                                                    json={'name': 'item'})
+    response = _make_response(make_payload(16 * 1024))
+
+    def run():
+        exchange = request_log.log_request('POST', prepared_request,
+                                           {'name': 'item'})
+        request_log.log_response(exchange, response)
+        request_log.clear()
+
+    return run
+
+
+@benchmark('request_log_render')
+def _request_log_render(env: BenchmarkEnvironment):
+    request_log = RequestLog()
+    prepared_request = env.session._prepare_request('POST',
+                                                    '/api/items',
+                                                    json={'name': 'item'})
+    exchange = request_log.log_request('POST', prepared_request,
+                                       {'name': 'item'})
+    request_log.log_response(exchange,
+                             _make_response(make_payload(16 * 1024)))
+
+    return request_log.render
+
+
+@benchmark('search')
+def _search(env: BenchmarkEnvironment):
+    content = make_payload(16 * 1024)
+
+    def run():
+        response = ResponseWrapper(_make_response(content))
+        response.search('json[0].id')
+        response.search('json[-1].nested.value')
+        response.search('headers."X-Request-Id"')
+
+    return run
+
+
+@benchmark('assert_schema')
+def _assert_schema(env: BenchmarkEnvironment):
+    content = make_payload(16 * 1024)
+    return lambda: ResponseWrapper(_make_response(content)).assert_schema(
+        _SCHEMA)
+
+
+def _register_json_benchmarks(codec_name: str):
+    # Decoding and encoding the largest payload, the CPU cost of JSON in each request of that size.
+    size = PAYLOAD_SIZES[-1]
+
+    @benchmark(f'json_loads[{codec_name}]')
+    def _json_loads(env: BenchmarkEnvironment):
+        codec = create_codec(codec_name)
+        content = make_payload(size)
+        return lambda: codec.loads(content)
+
+    @benchmark(f'json_dumps[{codec_name}]')
+    def _json_dumps(env: BenchmarkEnvironment):
+        codec = create_codec(codec_name)
+        value = json.loads(make_payload(size))
+        return lambda: codec.dumps(value)
+
+
+for _codec_name in available_codecs():
+    _register_json_benchmarks(_codec_name)
+
+
+def _register_request_benchmark(size: int):
+    @benchmark(f'request[{size}]')
+    def _request(env: BenchmarkEnvironment):
+        return lambda: env.session.request('GET',
+                                           '/payload/{size}',
+                                           path_params={'size': size},
+                                           user='default')
+
+
+for _size in PAYLOAD_SIZES:
+    _register_request_benchmark(_size)
+
+
+@benchmark('request_replay[65536]')
+def _request_replay(env: BenchmarkEnvironment):
+    # Replaying from a cassette measures the CPU cost of the plugin alone, without the network and the server.
+    path = os.path.join(env.directory, 'cassette')
+    env.create_session(Cassette(path, mode=CASSETTE_MODE_RECORD)).request(
+        'GET', '/payload/65536', user='default')
+
+    session = env.create_session(Cassette(path, mode=CASSETTE_MODE_REPLAY))
+    return lambda: session.request('GET', '/payload/65536', user='default')
+
+
+@benchmark(f'request_stream[{PAYLOAD_SIZES[-1]}]')
+def _request_stream(env: BenchmarkEnvironment):
+    return lambda: env.session.request('GET',
+                                       '/payload/{size}',
+                                       path_params={'size': PAYLOAD_SIZES[-1]},
+                                       user='default',
+                                       stream=['json[0].id'])
+
+
+def _calibrate(operation: Callable[[], None], min_time: float) -> int:
+    """
+    Find the number of iterations of the operation taking at least `min_time` seconds.
+    """
+
+    iterations = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            operation()
+        if time.perf_counter() - start >= min_time:
+            return iterations
+        iterations *= 2
+
+
+def _time_operation(operation: Callable[[], None], iterations: int,
+                    repeat: int) -> float:
+    """
+    Time the given number of iterations of the operation several times.
+
+    :return: Time of a single operation in the fastest round, in seconds. The fastest round is the least affected by
+             other processes and garbage collection.
+    """
+
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            operation()
+        best = min(best, time.perf_counter() - start)
+
+    return best / iterations
+
+
+def _measure_peak_memory(operation: Callable[[], None], iterations: int) -> int:
+    tracemalloc.start()
+    try:
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        for _ in range(iterations):
+            operation()
+        _, peak = tracemalloc.get_traced_memory()
+        return max(peak - current, 0)
+    finally:
+        tracemalloc.stop()
+
+
+def run_benchmarks(patterns: Optional[Iterable[str]] = None,
+                   min_time: float = 0.2,
+                   repeat: int = 3,
+                   memory_iterations: int = 10) -> list[BenchmarkResult]:
+    """
+    Run the registered benchmarks against a local stand-in server.
+
+    :param patterns: Names or glob patterns of the benchmarks to run. Runs all benchmarks if not given.
+    :param min_time: Minimal time of each timing round, in seconds.
+    :param repeat: Number of timing rounds of each benchmark.
+    :param memory_iterations: Number of iterations to run while measuring the peak memory.
+    :return: Results of the benchmarks.
+    """
+
+    patterns = list(patterns or ['*'])
+    names = [
+        name for name in BENCHMARKS
+        if any(name == pattern or fnmatch.fnmatchcase(name, pattern)
+               for pattern in patterns)
+    ]
+
+    results = []
+    with StandInServer() as server:
+        env = BenchmarkEnvironment(server)
+        try:
+            for name in names:
+                operation = BENCHMARKS[name](env)
+                operation()  # Warm up caches and connections.
+
+                iterations = _calibrate(operation, min_time)
+                env.overhead.samples.clear()
+                seconds_per_op = _time_operation(operation, iterations, repeat)
+                overhead = (statistics.median(env.overhead.samples)
+                            if env.overhead.samples else None)
+
+                results.append(
+                    BenchmarkResult(name=name,
+                                    iterations=iterations,
+                                    seconds_per_op=seconds_per_op,
+                                    peak_memory_bytes=_measure_peak_memory(
+                                        operation, memory_iterations),
+                                    overhead_per_op=overhead))
+        finally:
+            env.close()
+
+    return results
+
+
+def save_results(results: list[BenchmarkResult], path: str):
+    with open(path, 'w') as f:
+        json.dump([dataclasses.asdict(result) for result in results],
+                  f,
+                  indent=2)
+
+
+def load_results(path: str) -> list[BenchmarkResult]:
+    with open(path, 'r') as f:
+        return [BenchmarkResult(**result) for result in json.load(f)]
+
+
+def _format_bytes(value: int) -> str:
+    return f'{value / 1024:.1f}KiB'
+
+
+def _format_us(seconds: float) -> str:
+    return f'{seconds * 1e6:.1f}us'
+
+
+def render_results(results: list[BenchmarkResult]) -> str:
+    return render_table(
+        ('benchmark', 'iterations', 'time/op', 'ops/s', 'overhead/op',
+         'peak memory'),
+        [(result.name, result.iterations, _format_us(result.seconds_per_op),
+          f'{result.ops_per_second:.0f}', '-' if result.overhead_per_op is None
+          else _format_us(result.overhead_per_op),
+          _format_bytes(result.peak_memory_bytes)) for result in results])
+
+
+def compare_results(results: list[BenchmarkResult],
+                    baseline: list[BenchmarkResult],
+                    max_regression: float) -> tuple[str, list[str]]:
+    """
+    Compare the results against baseline results.
+
+    A benchmark regressed if its time per operation, plugin overhead or peak memory grew by more than the given
+    fraction relative to the baseline.
+
+    :return: Text report of the comparison, and the names of the regressed benchmarks.
+    """
+
+    baseline_by_name = {result.name: result for result in baseline}
+
+    def change(value: Optional[float], base: Optional[float]) -> float:
+        if not value or not base:
+            return 0.0
+        return value / base - 1
+
+    rows = []
+    regressions = []
+    for result in results:
+        base = baseline_by_name.get(result.name)
+        if base is None:
+            rows.append((result.name, '-', _format_us(result.seconds_per_op),
+                         '-', '-', '-', 'new'))
+            continue
+
+        changes = (change(result.seconds_per_op, base.seconds_per_op),
+                   change(result.overhead_per_op, base.overhead_per_op),
+                   change(result.peak_memory_bytes, base.peak_memory_bytes))
+        regressed = any(value > max_regression for value in changes)
+        if regressed:
+            regressions.append(result.name)
+
+        rows.append(
+            (result.name, _format_us(base.seconds_per_op),
+             _format_us(result.seconds_per_op),
+             *(f'{value:+.1%}'
+               for value in changes), 'REGRESSION' if regressed else 'ok'))
+
+    return render_table(('benchmark', 'baseline', 'current', 'time',
+                         'overhead', 'memory', 'status'), rows), regressions
@@ -0,0 +1,174 @@
+import json
+import re
+import ssl
+import threading
+from collections.abc import Callable
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+PAYLOAD_PATH_PATTERN = re.compile(r'^/payload/(?P<size>\d+)$')
+
+
+class StandInRequest(object):
+    """
+    Request received by the stand-in server.
+    """
+    def __init__(self, method: str, path: str, headers: dict[str, str],
+                 body: bytes):
+        self.method = method
+        self.path = path
+        self.headers = headers
+        self.body = body
+
+
+# Response of a stand-in route: status code, headers and body.
+StandInResponse = tuple[int, dict[str, str], bytes]
+
+StandInHandler = Callable[[StandInRequest], StandInResponse]
+
+
+def json_response(value, status: int = 200) -> StandInResponse:
+    return status, {'Content-Type': 'application/json'}, json.dumps(value).encode()
+
+
+def echo(request: StandInRequest) -> StandInResponse:
+    """
+    Respond with a JSON description of the request.
+    """
+
+    return json_response({
+        'method': request.method,
+        'path': request.path,
+        'headers': request.headers,
+        'body': request.body.decode(),
+    })
+
+
+def make_payload(size: int) -> bytes:
+    """
+    Create a JSON array of objects, with a total size of about the given size in bytes.
+    """
+
+    item = {'id': 0, 'name': 'item', 'tags': ['a', 'b'], 'nested': {'value': 1.5}}
+    item_size = len(json.dumps(item)) + 2
+    return json.dumps([
+        dict(item, id=i) for i in range(max(size // item_size, 1))
+    ]).encode()
+
+
+class StandInServer(object):
+    """
+    Local in-process HTTP or HTTPS server standing in for the target server, in tests and benchmarks.
+
+    Requests to "/payload/<size>" are responded with a JSON payload of about the given size. Requests to other paths
+    are handled by the registered routes, or responded with a JSON description of the request.
+
+    >>> with StandInServer() as server:
+    >>>     server.route('POST', '/token', lambda request: json_response({'access_token': 'abcd'}))
+    >>>     requests.post(server.url + 'token')
+    """
+    def __init__(self,
+                 host: str = '127.0.0.1',
+                 port: int = 0,
+                 ssl_context: Optional[ssl.SSLContext] = None):
+        """
+        :param host: Address to listen on.
+        :param port: Port to listen on, or 0 for any free port.
+        :param ssl_context: Server-side TLS context, for serving HTTPS instead of HTTP.
+        """
+
+        self._routes: dict[tuple[str, str], StandInHandler] = {}
+        self._payloads: dict[int, bytes] = {}
+        self._payloads_lock = threading.Lock()
+
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._scheme = 'http'
+        if ssl_context is not None:
+            self._server.socket = ssl_context.wrap_socket(self._server.socket,
+                                                          server_side=True)
+            self._scheme = 'https'
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """
+        Base URL of the server, ending with a slash.
+        """
+
+        host, port = self._server.server_address[:2]
+        return f'{self._scheme}://{host}:{port}/'
+
+    def route(self, method: str, path: str, handler: StandInHandler):
+        """
+        Handle requests with the given method and path (without the query) using the given handler.
+        """
+
+        self._routes[(method.upper(), path)] = handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        name='seekret-stand-in-server',
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def _payload(self, size: int) -> bytes:
+        with self._payloads_lock:
+            if size not in self._payloads:
+                self._payloads[size] = make_payload(size)
+            return self._payloads[size]
+
+    def _handle(self, request: StandInRequest) -> StandInResponse:
+        path = request.path.split('?', 1)[0]
+
+        match = PAYLOAD_PATH_PATTERN.match(path)
+        if match:
+            return 200, {
+                'Content-Type': 'application/json'
+            }, self._payload(int(match.group('size')))
+
+        handler = self._routes.get((request.method, path), echo)
+        return handler(request)
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            # Send small responses right away, instead of waiting for the client to acknowledge the headers.
+            disable_nagle_algorithm = True
+
+            def _respond(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+
+                status, headers, content = server._handle(
+                    StandInRequest(self.command, self.path,
+                                   dict(self.headers.items()), body))
+
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                if self.command != 'HEAD':
+                    self.wfile.write(content)
+
+            do_GET = do_HEAD = do_POST = do_PUT = do_PATCH = do_DELETE = _respond
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
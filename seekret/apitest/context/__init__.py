@@ -1,2 +1,3 @@
 from seekret.apitest.context.context import Context
 from seekret.apitest.context.session import Session
+from seekret.apitest.context.listener import SessionListener, RequestRecord
@@ -0,0 +1,307 @@
+import asyncio
+import contextlib
+import contextvars
+import dataclasses
+import datetime
+import functools
+import time
+from collections.abc import Callable, Mapping
+from typing import Optional, Any
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from seekret.apitest.context.cassette import CASSETTE_MODE_REPLAY
+from seekret.apitest.context.response import ResponseWrapper
+from seekret.apitest.context.session import Session, _make_record, _RequestTimer, _policy_endpoint
+from seekret.apitest.runprofile import RequestPolicy
+
+try:
+    import aiohttp
+    import yarl
+except ImportError:  # pragma: no cover
+    aiohttp = None
+
+
+class AsyncSession(object):
+    """
+    asyncio counterpart of `Session`.
+
+    The async session shares the run profile, auth handlers and request preparation of the `Session` it is created
+    from, and sends the requests using a non-blocking `aiohttp` connection pool. This allows a single worker process
+    to keep many requests in flight concurrently. Auth handlers may block, such as when fetching an OAuth2 token, so
+    requests of users are prepared in the default executor of the event loop.
+
+    The connection pool is bound to the event loop it was created in, and is closed when the event loop shuts down
+    its async generators (as `asyncio.run` does). When used from another event loop, the pool of the previous loop
+    is discarded and a new pool is opened.
+    """
+    def __init__(self, session: Session):
+        if aiohttp is None:
+            raise RuntimeError(
+                'the asyncio API requires aiohttp, install it using "pip install seekret.apitest[async]"'
+            )
+
+        self.session = session
+
+        self._client: Optional[aiohttp.ClientSession] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client_guard = None
+
+    async def _get_client(self) -> 'aiohttp.ClientSession':
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            self._discard_client()
+
+            config = self.session.run_profile.connection_pool
+            connector = aiohttp.TCPConnector(
+                limit=config.pool_size * config.max_connections_per_host,
+                limit_per_host=config.max_connections_per_host,
+                force_close=not config.keep_alive)
+            self._client = aiohttp.ClientSession(
+                connector=connector,
+                cookie_jar=aiohttp.DummyCookieJar(),
+                auto_decompress=True)
+            self._client_loop = loop
+
+            self._client_guard = _close_on_loop_shutdown(self._client)
+            await self._client_guard.__anext__()
+
+        return self._client
+
+    def _discard_client(self):
+        client, self._client = self._client, None
+        loop, self._client_loop = self._client_loop, None
+        self._client_guard = None
+        if client is None or client.closed:
+            return
+
+        if loop.is_closed():
+            # The transports of a closed loop can't be closed gracefully anymore. Mark the connector as closed
+            # synchronously, since its `close` coroutine can't be awaited without the loop.
+            connector = client.connector
+            client.detach()
+            connector._close()
+        elif not loop.is_running():
+            loop.run_until_complete(client.close())
+        else:
+            loop.create_task(client.close())
+
+    async def aclose(self):
+        """
+        Close the pooled connections of the session in the running event loop.
+        """
+
+        client, self._client = self._client, None
+        self._client_loop = None
+        self._client_guard = None
+        if client is not None:
+            await client.close()
+
+    def close(self):
+        """
+        Close the pooled connections of the session from synchronous code.
+        """
+
+        self._discard_client()
+
+    async def request(self,
+                      method: str,
+                      path: str,
+                      json: Optional[Any] = None,
+                      *,
+                      path_params: Optional[dict[str, Any]] = None,
+                      query: Optional[dict[str, Any]] = None,
+                      headers: Optional[Mapping[str, Any]] = None,
+                      cookies: Optional[dict[str, Any]] = None,
+                      user: Optional[str] = None,
+                      cache: bool = True,
+                      policy: Optional[RequestPolicy] = None,
+                      target: Optional[str] = None):
+        """
+        Perform an HTTP request without blocking the event loop.
+
+        The parameters are the same as the parameters of `Session.request`.
+
+        :return: Wrapped response object.
+        """
+
+        timer = _RequestTimer()
+        span = self.session._start_request_span(method, path, user, target)
+        prepared_request = response = None
+        try:
+            prepare = functools.partial(self.session._prepare_request,
+                                        method,
+                                        path,
+                                        json=json,
+                                        path_params=path_params,
+                                        query=query,
+                                        headers=headers,
+                                        cookies=cookies,
+                                        user=user,
+                                        target=target)
+            # Requests without a user run no auth handler, and are prepared without leaving the event loop.
+            prepared_request = prepare() if user is None else await _run_blocking(prepare)
+            timer.mark('prepare')
+
+            request_log = self.session.request_log
+            exchange = request_log.log_request(method, prepared_request, json)
+            timer.mark('logging')
+
+            response = self.session._cached_response(prepared_request, user,
+                                                     cache)
+            cached = response is not None
+            if not cached:
+                async with self._concurrency_slot(user, exchange, target):
+                    response = await self._send_with_policy(
+                        method, path, user, prepared_request, exchange,
+                        policy, timer, target)
+                self.session._cache_response(prepared_request, user, response)
+
+            request_log.log_response(exchange, response)
+            timer.mark('logging')
+        except BaseException as e:
+            self.session._request_finished(
+                _make_record(method,
+                             path,
+                             user,
+                             prepared_request,
+                             response,
+                             timer,
+                             e,
+                             target=target), span)
+            raise
+
+        self.session._request_finished(
+            _make_record(method,
+                         path,
+                         user,
+                         prepared_request,
+                         response,
+                         timer,
+                         cached=cached,
+                         target=target), span)
+        return ResponseWrapper(response, exchange)
+
+    @contextlib.asynccontextmanager
+    async def _concurrency_slot(self, user: Optional[str], exchange,
+                                target: Optional[str]):
+        rate_limiter = self.session._rate_limiter(user, target)
+        if rate_limiter is None:
+            yield
+            return
+
+        async with rate_limiter.slot_async() as waited:
+            self.session._rate_limit_waited(exchange, user,
+                                            'concurrency limit', waited)
+            yield
+
+    async def _send_with_policy(self, method: str, path: str,
+                                user: Optional[str],
+                                prepared_request: requests.PreparedRequest,
+                                exchange, policy: Optional[RequestPolicy],
+                                timer: _RequestTimer,
+                                target: Optional[str]) -> requests.Response:
+        rate_limiter = self.session._rate_limiter(user, target)
+
+        async def send():
+            if rate_limiter is not None:
+                self.session._rate_limit_waited(
+                    exchange, user, 'rate limit', await
+                    rate_limiter.wait_async())
+            return await self._send(prepared_request, timer)
+
+        policy = policy or self.session.run_profile.request_policy
+        if policy.max_retries <= 0 and policy.hedge_after is None:
+            return await send()
+
+        if self.session.cassette is not None:
+            # Replayed responses have no latency, and recording hedged requests would record them twice.
+            policy = dataclasses.replace(policy, hedge_after=None)
+
+        return await self.session.policy_runner.send_async(
+            send,
+            method,
+            _policy_endpoint(method, path, target),
+            policy,
+            note=lambda note: self.session.request_log.log_note(
+                exchange, note),
+            retry_errors=(requests.ConnectionError,
+                          aiohttp.ClientConnectionError))
+
+    async def _send(self, prepared_request: requests.PreparedRequest,
+                    timer: _RequestTimer) -> requests.Response:
+        cassette = self.session.cassette
+        if cassette is not None and cassette.mode == CASSETTE_MODE_REPLAY:
+            response = cassette.replay(prepared_request)
+            timer.mark('ttfb')
+            _ = response.content
+            timer.mark('download')
+            return response
+
+        start = time.perf_counter()
+        client = await self._get_client()
+        async with client.request(
+                prepared_request.method,
+                yarl.URL(prepared_request.url, encoded=True),
+                headers=dict(prepared_request.headers.items()),
+                data=prepared_request.body) as client_response:
+            # Opening connections is not measured separately, and is included in the time to first byte.
+            timer.mark('ttfb')
+            content = await client_response.read()
+            timer.mark('download')
+
+        response = _to_requests_response(prepared_request, client_response,
+                                         content, time.perf_counter() - start)
+        if cassette is not None:
+            cassette.record(prepared_request, response)
+        return response
+
+
+async def _run_blocking(function: Callable[[], Any]) -> Any:
+    """
+    Run a blocking function in the default executor of the running event loop. The function runs in a copy of the
+    context of the current task, so it sees the stage and span of the task, and its phase timings are added to the
+    request of the task.
+    """
+
+    return await asyncio.get_running_loop().run_in_executor(None, contextvars.copy_context().run, function)
+
+
+async def _close_on_loop_shutdown(client: 'aiohttp.ClientSession'):
+    """
+    Async generator closing the given client when finalized.
+    Event loops finalize their pending async generators before closing, which closes the client while the loop is
+    still usable.
+    """
+
+    try:
+        yield
+    finally:
+        await client.close()
+
+
+def _to_requests_response(prepared_request: requests.PreparedRequest,
+                          client_response: 'aiohttp.ClientResponse',
+                          content: bytes, elapsed: float) -> requests.Response:
+    """
+    Convert the aiohttp response to a `requests.Response`, so the same response API is available for both sync and
+    async requests.
+    """
+
+    headers = CaseInsensitiveDict()
+    for name, value in client_response.headers.items():
+        # Join repeated headers the same way `requests` does.
+        headers[name] = f'{headers[name]}, {value}' if name in headers else value
+
+    response = requests.Response()
+    response.status_code = client_response.status
+    response.reason = client_response.reason
+    response.headers = headers
+    response.url = str(client_response.url)
+    response.encoding = get_encoding_from_headers(headers)
+    response.request = prepared_request
+    response.elapsed = datetime.timedelta(seconds=elapsed)
+    response._content = content
+    return response
@@ -0,0 +1,176 @@
+"""
+Cache of responses to safe requests, shared by the tests of a session.
+
+Generated tests repeat the same setup requests, such as fetching a catalog or the current user. When the cache is
+enabled, GET and HEAD responses are served from the cache until they expire, instead of being requested again.
+"""
+import copy
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict
+from typing import Optional
+
+import requests
+
+# Methods whose responses are cached. Requests with other methods invalidate the cached responses of their path.
+CACHED_METHODS = frozenset(('GET', 'HEAD'))
+
+DEFAULT_TTL = 60.0
+DEFAULT_MAX_ENTRIES = 1024
+
+# Request headers which differ between requests for the same response, and are left out of the cache key. All the
+# other request headers are part of the key, so a response is never served for other credentials, such as another
+# `Authorization` or API key header.
+DEFAULT_IGNORED_HEADERS = ('X-Seekret-Test', 'traceparent', 'tracestate')
+
+_CacheKey = tuple[str, str, Optional[str], tuple[tuple[str, str], ...]]
+
+
+class ResponseCache(object):
+    """
+    LRU cache of successful GET and HEAD responses.
+
+    Responses are keyed by the method, the resolved URL (including the query), the requesting user and the request
+    headers, except for the ignored headers. Responses expire after `ttl` seconds, and the least recently used
+    responses are evicted when the cache is full.
+
+    A request with any other method invalidates the cached responses of its path, of the paths under it (such as
+    `/users/1/channels` for `/users/1`), and of the paths above it (such as the `/users` collection).
+    """
+    def __init__(self,
+                 ttl: float = DEFAULT_TTL,
+                 max_entries: int = DEFAULT_MAX_ENTRIES,
+                 ignored_headers: tuple[str, ...] = DEFAULT_IGNORED_HEADERS):
+        """
+        :param ttl: Time to serve a response from the cache, in seconds.
+        :param max_entries: Maximum number of cached responses.
+        :param ignored_headers: Request headers whose values don't need to match to serve a cached response.
+        """
+
+        if max_entries <= 0:
+            raise ValueError('max_entries must be positive')
+
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.ignored_headers = frozenset(name.lower() for name in ignored_headers)
+
+        self._lock = threading.Lock()
+
+        # Cached responses and their expiration time, from the least recently used.
+        self._entries: OrderedDict[_CacheKey, tuple[
+            float, requests.Response]] = OrderedDict()
+
+        # Keys of the cached responses, per URL path.
+        self._paths: dict[str, set[_CacheKey]] = {}
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _key(self, request: requests.PreparedRequest,
+             user: Optional[str]) -> _CacheKey:
+        headers = tuple(
+            sorted((name.lower(), value) for name, value in request.headers.items()
+                   if name.lower() not in self.ignored_headers))
+        return (request.method, request.url, user, headers)
+
+    def get(self, request: requests.PreparedRequest,
+            user: Optional[str]) -> Optional[requests.Response]:
+        """
+        Get the cached response of the request.
+
+        :return: Copy of the cached response, or `None` if the request has no fresh cached response.
+        """
+
+        if request.method not in CACHED_METHODS:
+            return None
+
+        key = self._key(request, user)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            response = entry[1]
+
+        return _copy_response(response, request)
+
+    def put(self, request: requests.PreparedRequest, user: Optional[str],
+            response: requests.Response):
+        """
+        Cache the response of the request, if it's a successful response to a GET or HEAD request.
+        The response body must have been read.
+        """
+
+        if request.method not in CACHED_METHODS or not 200 <= response.status_code < 300:
+            return
+        if 'no-store' in response.headers.get('Cache-Control', ''):
+            return
+
+        key = self._key(request, user)
+        entry = (time.monotonic() + self.ttl, _copy_response(response))
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            else:
+                self._paths.setdefault(_path(request.url), set()).add(key)
+            self._entries[key] = entry
+
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, url: str):
+        """
+        Remove the cached responses of the URL path, of the paths under it and of the paths above it.
+        """
+
+        path = _path(url).rstrip('/')
+        prefix = f'{path}/'
+        with self._lock:
+            for cached_path in list(self._paths):
+                stripped = cached_path.rstrip('/')
+                if stripped == path or cached_path.startswith(
+                        prefix) or path.startswith(f'{stripped}/'):
+                    for key in list(self._paths.get(cached_path, ())):
+                        self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._paths.clear()
+
+    def _remove(self, key: _CacheKey):
+        del self._entries[key]
+
+        path = _path(key[1])
+        keys = self._paths[path]
+        keys.discard(key)
+        if not keys:
+            del self._paths[path]
+
+
+def _path(url: str) -> str:
+    return urllib.parse.urlsplit(url).path or '/'
+
+
+def _copy_response(
+        response: requests.Response,
+        request: Optional[requests.PreparedRequest] = None
+) -> requests.Response:
+    """
+    Copy the response, so tests can't modify the cached response.
+    """
+
+    response_copy = copy.copy(response)
+    response_copy.headers = response.headers.copy()
+    if request is not None:
+        response_copy.request = request
+    return response_copy
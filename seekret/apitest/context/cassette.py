@@ -0,0 +1,280 @@
+"""
+On-disk store of requests and their responses, for replaying test sessions without the target server.
+
+A cassette is a directory with two append-only files:
+
+* `index.ndjson` - a JSON line per recorded response, with the matching key of the request, the status and headers
+  of the response, and the location of its body in the bodies file.
+* `bodies.bin` - the response bodies, one after the other.
+
+On replay, only the index is loaded into memory. The bodies file is memory-mapped, and each body is read from the
+mapping when the response is consumed.
+"""
+import dataclasses
+import hashlib
+import json
+import mmap
+import os
+import threading
+import urllib.parse
+from typing import Optional, Any
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+CASSETTE_MODE_RECORD = 'record'
+CASSETTE_MODE_REPLAY = 'replay'
+CASSETTE_MODES = (CASSETTE_MODE_RECORD, CASSETTE_MODE_REPLAY)
+
+INDEX_FILE_NAME = 'index.ndjson'
+BODIES_FILE_NAME = 'bodies.bin'
+
+# Request headers which are never written to the cassette.
+DEFAULT_REDACTED_HEADERS = ('Authorization', 'Proxy-Authorization', 'Cookie')
+
+
+class CassetteMissError(LookupError):
+    """
+    Raised in replay mode when a request has no recorded response in the cassette.
+    """
+    pass
+
+
+@dataclasses.dataclass(frozen=True)
+class MatchRules(object):
+    """
+    Rules for matching requests to recorded responses.
+
+    Requests are matched by the method, the resolved URL and a hash of the body. Request headers are volatile (for
+    example `Authorization` tokens and the `X-Seekret-Test` marker), and are not matched unless listed in
+    `match_headers`.
+    """
+
+    # Request headers whose values must match, in addition to the method, URL and body.
+    match_headers: tuple[str, ...] = ()
+
+    # Query parameters ignored when matching URLs, such as timestamps and nonces.
+    ignore_query_params: tuple[str, ...] = ()
+
+    # Request headers which are not written to the cassette.
+    redact_headers: tuple[str, ...] = DEFAULT_REDACTED_HEADERS
+
+    def key(self, request: requests.PreparedRequest) -> str:
+        """
+        Compute the matching key of the request.
+        """
+
+        url = request.url
+        if self.ignore_query_params:
+            parts = urllib.parse.urlsplit(url)
+            ignored = {name.lower() for name in self.ignore_query_params}
+            query = [(name, value) for name, value in urllib.parse.parse_qsl(
+                parts.query, keep_blank_values=True)
+                     if name.lower() not in ignored]
+            url = urllib.parse.urlunsplit(
+                parts._replace(query=urllib.parse.urlencode(query)))
+
+        body = request.body or b''
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+
+        headers = [
+            f'{name.lower()}: {request.headers.get(name, "")}'
+            for name in sorted(self.match_headers, key=str.lower)
+        ]
+
+        return '\n'.join([
+            request.method,
+            url,
+            hashlib.sha256(body).hexdigest(), *headers
+        ])
+
+
+class _MappedBody(object):
+    """
+    Raw response body read from a memory-mapped cassette, in place of the `urllib3` response.
+    """
+    def __init__(self, buffer, offset: int, length: int):
+        self._buffer = buffer
+        self._pos = offset
+        self._end = offset + length
+
+    def read(self, amt: Optional[int] = None, **kwargs) -> bytes:
+        end = self._end if amt is None else min(self._pos + amt, self._end)
+        data = self._buffer[self._pos:end]
+        self._pos = end
+        return data
+
+    def close(self):
+        self._pos = self._end
+
+
+class Cassette(object):
+    """
+    Store of requests and their responses, in either record or replay mode.
+
+    In record mode, the responses are appended to the cassette. Appends are locked across processes where supported,
+    so `pytest-xdist` workers can record into the same cassette. Delete the cassette to record it again.
+
+    In replay mode, responses are served from the cassette. When the same request was recorded several times, the
+    recorded responses are served in order, and the last one is repeated once all were served.
+    """
+    def __init__(self,
+                 path: str,
+                 mode: str = CASSETTE_MODE_REPLAY,
+                 rules: Optional[MatchRules] = None):
+        """
+        :param path: Directory of the cassette.
+        :param mode: Either "record" or "replay".
+        :param rules: Rules for matching requests to recorded responses.
+        """
+
+        if mode not in CASSETTE_MODES:
+            raise ValueError(f'unsupported cassette mode "{mode}"')
+
+        self.path = path
+        self.mode = mode
+        self.rules = rules or MatchRules()
+
+        self._lock = threading.Lock()
+
+        # Record mode.
+        self._index_file = None
+        self._bodies_file = None
+
+        # Replay mode.
+        self._index: Optional[dict[str, list[dict[str, Any]]]] = None
+        self._cursors: dict[str, int] = {}
+        self._bodies = None
+
+    @property
+    def _index_path(self) -> str:
+        return os.path.join(self.path, INDEX_FILE_NAME)
+
+    @property
+    def _bodies_path(self) -> str:
+        return os.path.join(self.path, BODIES_FILE_NAME)
+
+    def record(self, request: requests.PreparedRequest,
+               response: requests.Response):
+        """
+        Append the request and its response to the cassette.
+        The response body is read, if it was not read yet.
+        """
+
+        redacted = {name.lower() for name in self.rules.redact_headers}
+        entry = {
+            'key': self.rules.key(request),
+            'method': request.method,
+            'url': request.url,
+            'request_headers': [[name, value]
+                                for name, value in request.headers.items()
+                                if name.lower() not in redacted],
+            'status': response.status_code,
+            'reason': response.reason,
+            'headers': [[name, value]
+                        for name, value in response.headers.items()],
+        }
+        content = response.content
+
+        with self._lock:
+            if self._index_file is None:
+                os.makedirs(self.path, exist_ok=True)
+                self._index_file = open(self._index_path, 'a')
+                self._bodies_file = open(self._bodies_path, 'ab')
+
+            if fcntl is not None:
+                fcntl.flock(self._index_file, fcntl.LOCK_EX)
+            try:
+                entry['offset'] = self._bodies_file.seek(0, os.SEEK_END)
+                entry['length'] = len(content)
+                self._bodies_file.write(content)
+                self._bodies_file.flush()
+
+                self._index_file.write(json.dumps(entry) + '\n')
+                self._index_file.flush()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._index_file, fcntl.LOCK_UN)
+
+    def replay(self, request: requests.PreparedRequest) -> requests.Response:
+        """
+        Get the recorded response of the request.
+
+        The body of the returned response is read from the memory-mapped cassette when the response is consumed.
+
+        :raises CassetteMissError: The request was not recorded.
+        """
+
+        key = self.rules.key(request)
+        with self._lock:
+            if self._index is None:
+                self._load()
+
+            entries = self._index.get(key)
+            if not entries:
+                raise CassetteMissError(
+                    f'no recorded response for {request.method} {request.url} in cassette {self.path}'
+                )
+
+            cursor = self._cursors.get(key, 0)
+            entry = entries[min(cursor, len(entries) - 1)]
+            self._cursors[key] = cursor + 1
+
+        headers = CaseInsensitiveDict()
+        for name, value in entry['headers']:
+            headers[name] = value
+
+        response = requests.Response()
+        response.status_code = entry['status']
+        response.reason = entry['reason']
+        response.headers = headers
+        response.url = request.url
+        response.encoding = get_encoding_from_headers(headers)
+        response.request = request
+        response.raw = _MappedBody(self._bodies, entry['offset'],
+                                   entry['length'])
+        return response
+
+    def _load(self):
+        self._index = {}
+        self._cursors = {}
+        try:
+            with open(self._index_path, 'r') as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._index.setdefault(entry['key'], []).append(entry)
+        except FileNotFoundError:
+            self._index = None
+            raise CassetteMissError(
+                f'cassette {self.path} does not exist, record it first'
+            ) from None
+
+        with open(self._bodies_path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size:
+                self._bodies = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self._bodies = b''
+
+    def close(self):
+        """
+        Close the files of the cassette. The cassette is reopened on the next use.
+        """
+
+        with self._lock:
+            if self._index_file is not None:
+                self._index_file.close()
+                self._bodies_file.close()
+                self._index_file = self._bodies_file = None
+
+            if isinstance(self._bodies, mmap.mmap):
+                self._bodies.close()
+            self._bodies = None
+            self._index = None
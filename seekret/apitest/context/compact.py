@@ -0,0 +1,188 @@
+"""
+Compact responses, keeping only what tests read from a response after its stage ends.
+
+A `requests.Response` keeps its raw body, its request (including the request body) and its connection for as long as
+the response is referenced. Long tests carrying responses between stages, and module-scoped contexts, keep all of them
+alive. A compacted response keeps the status, the headers and the body. JSON bodies are kept parsed, and other bodies as
+bytes, up to the memory cap of the session. Bodies beyond the cap are spilled to a temporary file.
+"""
+import os
+import shutil
+import tempfile
+import threading
+import weakref
+from typing import Any, Optional
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from seekret.apitest.context.jsoncodec import get_codec
+
+_NOT_KEPT = object()
+
+
+class CompactResponse(object):
+    """
+    Response with the status, headers and body of a `requests.Response`, without the raw response and the request.
+
+    The body of a response kept as parsed JSON is re-encoded when read as `content` or `text`, so it may differ from
+    the original body in whitespace and key order.
+    """
+    def __init__(self, response: requests.Response, json_value: Any,
+                 content: Optional[bytes], path: Optional[str]):
+        """
+        :param response: Response to take the status and headers from.
+        :param json_value: Parsed JSON body, or `_NOT_KEPT`.
+        :param content: Raw body kept in memory, if not kept as JSON or spilled.
+        :param path: File the body was spilled to, if any.
+        """
+
+        self.status_code: int = response.status_code
+        self.reason: str = response.reason
+        self.url: str = response.url
+        self.headers = CaseInsensitiveDict(response.headers)
+        self.encoding: Optional[str] = response.encoding
+        self.elapsed = response.elapsed
+
+        self._json = json_value
+        self._content = content
+        self._path = path
+
+    def __getattr__(self, item):
+        raise AttributeError(
+            f"'{item}' is not kept by compacted responses")
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+
+    def raise_for_status(self):
+        if 400 <= self.status_code < 600:
+            kind = 'Client' if self.status_code < 500 else 'Server'
+            raise requests.HTTPError(
+                f'{self.status_code} {kind} Error: {self.reason} for url: {self.url}',
+                response=self)
+
+    @property
+    def spilled(self) -> bool:
+        """
+        Whether the body was spilled to disk, and is read from the disk on every access.
+        """
+
+        return self._path is not None
+
+    @property
+    def content(self) -> bytes:
+        if self._json is not _NOT_KEPT:
+            return get_codec().dumps(self._json)
+        if self._path is not None:
+            with open(self._path, 'rb') as f:
+                return f.read()
+        if self._content is not None:
+            return self._content
+        raise RuntimeError('the body of the response was not kept')
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding or 'utf-8', errors='replace')
+
+    def json(self, **kwargs) -> Any:
+        if self._json is not _NOT_KEPT:
+            return self._json
+        return get_codec().loads(self.content)
+
+
+class ResponseStore(object):
+    """
+    Compacts responses, and accounts for the memory of the compacted responses of a session.
+
+    The memory of a response is approximated by the size of its body. Bodies are kept in memory while the retained
+    bodies are under `max_bytes`, and are spilled to disk otherwise. The memory and the spilled file of a response are
+    released when the response is garbage collected.
+    """
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        """
+        :param max_bytes: Maximum size of the bodies of the compacted responses kept in memory.
+        """
+
+        self.max_bytes = max_bytes
+
+        # Size of the bodies kept in memory and spilled to disk, of the live compacted responses.
+        self.retained_bytes = 0
+        self.spilled_bytes = 0
+
+        self._lock = threading.Lock()
+        self._spill_dir: Optional[str] = None
+
+    def compact(self,
+                response: requests.Response,
+                json_value: Any = _NOT_KEPT,
+                keep_body: bool = True) -> CompactResponse:
+        """
+        Compact the response.
+
+        :param response: Response to compact.
+        :param json_value: Parsed JSON body of the response, if already parsed.
+        :param keep_body: Keep the body of the response. Pass `False` for responses whose body was not read.
+        """
+
+        content = response.content if keep_body else None
+        size = len(content) if content else 0
+
+        with self._lock:
+            in_memory = self.retained_bytes + size <= self.max_bytes
+            if in_memory:
+                self.retained_bytes += size
+            else:
+                self.spilled_bytes += size
+
+        if in_memory:
+            path = None
+            if json_value is _NOT_KEPT and content:
+                try:
+                    json_value = get_codec().loads(content)
+                except ValueError:
+                    pass
+            if json_value is not _NOT_KEPT:
+                content = None
+        else:
+            path = self._spill(content)
+            json_value = _NOT_KEPT
+            content = None
+
+        compacted = CompactResponse(response, json_value, content, path)
+        weakref.finalize(compacted, self._release, size, in_memory, path)
+        return compacted
+
+    def close(self):
+        """
+        Remove the spilled bodies.
+        """
+
+        if self._spill_dir is not None:
+            shutil.rmtree(self._spill_dir, ignore_errors=True)
+            self._spill_dir = None
+
+    def _spill(self, content: bytes) -> str:
+        with self._lock:
+            if self._spill_dir is None:
+                self._spill_dir = tempfile.mkdtemp(prefix='seekret-responses-')
+            spill_dir = self._spill_dir
+
+        fd, path = tempfile.mkstemp(dir=spill_dir)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        return path
+
+    def _release(self, size: int, in_memory: bool, path: Optional[str]):
+        with self._lock:
+            if in_memory:
+                self.retained_bytes -= size
+            else:
+                self.spilled_bytes -= size
+
+        if path is not None:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -1,8 +1,18 @@
-import contextlib
+import asyncio
+import contextvars
+import functools
 import logging
+import time
+from collections.abc import Callable, Iterable
 from typing import Any, Optional, Union, NewType, cast
 
+from seekret.apitest.context.fanout import PendingFanOut
+from seekret.apitest.context.listener import StageInfo, _current_stage, current_stage
+from seekret.apitest.context.requestlog import buffered_output, flush_output
+from seekret.apitest.context.response import ResponseWrapper
 from seekret.apitest.context.session import Session
+from seekret.apitest.context.tracing import Span
+from seekret.apitest.runprofile import RequestPolicy, PRIMARY_TARGET
 
 logger = logging.getLogger(__name__)
 
@@ -19,32 +29,64 @@ class Context(object):
     This class is the interface from the test function to the Seekret testing infrastructure. It is intended to be used
     as a fixture and returned from the `seekret` and `seekret_module` fixtures.
     """
-    def __init__(self, session: Session, scope: str):
+    def __init__(self,
+                 session: Session,
+                 scope: str,
+                 nodeid: Optional[str] = None):
         """
         Initialize the context.
 
         :param session: Seekret session associated with this context.
         :param scope: The scope of this context. The scope is used for logging only, and is
                       specified in the stage start log.
+        :param nodeid: Node ID of the test or module of this context, attached to the records of its requests.
         """
         self.session = session
         self._scope = scope
+        self.nodeid = nodeid
 
         self._current_stage_index = 1  # 1-based.
         self.default_user: User = 'default'
 
-    @contextlib.contextmanager
-    def stage(self, method: str, path: str):
+        # Serve responses from the response cache of the session, if enabled.
+        self.use_response_cache = True
+
+        # Compact the responses of each stage when the stage ends, if the session has a response store.
+        self.compact_responses = True
+
+        # Send the requests of each stage to all the targets of the run profile, if it has several targets.
+        self.fan_out = True
+
+    def stage(self,
+              method: str,
+              path: str,
+              policy: Optional[RequestPolicy] = None):
         """
         Declare the next test stage targets the given endpoint.
 
         The purpose of this function is to create a readable structure to tests.
+        The stage can be entered using either `with` or `async with`. In the latter case, the stage requests are
+        coroutines which are sent without blocking the event loop.
+
+        >>> with seekret.stage(method='GET', path='/api/users') as request:
+        >>>     response = request()
+        >>>
+        >>> async with seekret.stage(method='GET', path='/api/users') as request:
+        >>>     response = await request()
 
         :param method: Method of the stage target endpoint.
         :param path: Path of the stage target endpoint.
-        :return: Callable value for performing requests to the target endpoint.
+        :param policy: Hedging and retry policy of the stage requests, instead of the request policy of the run
+                       profile.
+        :return: Context manager of the stage, which returns a callable value for performing requests to the target
+                 endpoint.
         """
 
+        return _Stage(self, method, path, policy)
+
+    def _begin_stage(
+            self, method: str,
+            path: str) -> tuple[contextvars.Token, Optional[Span]]:
         if self._scope == 'function':
             # Special case: in function scope don't print a prefix at all.
             prefix = ''
@@ -54,27 +96,298 @@ class Context(object):
         logger.info(
             prefix +
             f'Test Stage #{self._current_stage_index}: {method} {path}')
-        try:
-            yield _StageWrapper(self, method, path)
-        finally:
-            self._current_stage_index += 1
+
+        token = _current_stage.set(
+            StageInfo(self.nodeid, self._current_stage_index, method, path))
+
+        span = None
+        if self.session.tracer is not None:
+            span = self.session.tracer.start_span(
+                f'Stage #{self._current_stage_index}: {method} {path}',
+                attributes={
+                    'http.request.method': method,
+                    'url.template': path,
+                    'seekret.stage': self._current_stage_index,
+                    'seekret.nodeid': self.nodeid,
+                })
+
+        for listener in self.session.listeners:
+            listener.stage_started(self, method, path)
+
+        return token, span
+
+    def _end_stage(self, method: str, path: str,
+                   error: Optional[BaseException], token: contextvars.Token,
+                   span: Optional[Span]):
+        for listener in self.session.listeners:
+            listener.stage_finished(self, method, path, error)
+
+        if span is not None:
+            self.session.tracer.end_span(span, error)
+        _current_stage.reset(token)
+        self._current_stage_index += 1
 
     def request(self, *args, user: User = NOT_SET, **kwargs):
+        kwargs.setdefault('cache', self.use_response_cache)
         return self.session.request(
             *args,
             user=(self.default_user if user is NOT_SET else user),
             **kwargs)
 
+    def gather(
+        self, requests: Iterable[Callable[[], ResponseWrapper]]
+    ) -> list[ResponseWrapper]:
+        """
+        Send independent requests concurrently, and return their responses in order.
+
+        The requests are sent using the bounded thread pool of the session. The log output of each request is
+        written after all requests are done, grouped per request and in the order of the given requests.
+        If some requests fail, the error of the first failed request in order is raised.
+
+        >>> with seekret.stage(method='GET', path='/api/items/{item_id}') as request:
+        >>>     responses = seekret.gather(
+        >>>         request.defer(path_params={'item_id': item_id}) for item_id in item_ids)
+
+        :param requests: Callables performing a single request each, such as the values returned from
+                         `request.defer(...)` in a stage.
+        :return: List of the responses, in the order of the given requests.
+        """
+
+        def run(request: Callable[[], ResponseWrapper]):
+            with buffered_output() as records:
+                try:
+                    return records, request(), None
+                except BaseException as e:
+                    return records, None, e
+
+        # Each request runs in a copy of the caller's context variables, so its records are attributed to the stage.
+        futures = [
+            self.session.executor.submit(contextvars.copy_context().run, run,
+                                         request) for request in requests
+        ]
+
+        responses = []
+        first_error = None
+        for future in futures:
+            records, response, error = future.result()
+            flush_output(records)
+            responses.append(response)
+            if first_error is None:
+                first_error = error
+
+        if first_error is not None:
+            raise first_error
+
+        return responses
+
+    async def async_request(self, *args, user: User = NOT_SET, **kwargs):
+        kwargs.setdefault('cache', self.use_response_cache)
+        return await self.session.async_session.request(
+            *args,
+            user=(self.default_user if user is NOT_SET else user),
+            **kwargs)
+
+
+class _Stage(object):
+    """
+    Context manager of a single test stage, supporting both `with` and `async with`.
+    """
+    def __init__(self, context: Context, method: str, path: str,
+                 policy: Optional[RequestPolicy]):
+        self._context = context
+
+        self.method = method
+        self.path = path
+        self.policy = policy
+
+        self._token: Optional[contextvars.Token] = None
+        self._span: Optional[Span] = None
+
+        # Responses to compact when the stage ends, or `None` if responses are not compacted.
+        self._responses: Optional[list[ResponseWrapper]] = None
+        if context.compact_responses and context.session.response_store is not None:
+            self._responses = []
+
+        # Requests sent to all the targets, compared when the stage ends, or `None` if requests are not fanned out.
+        self._fan_outs: Optional[list[PendingFanOut]] = None
+        if context.fan_out and context.session.run_profile.targets:
+            self._fan_outs = []
+
+    def __enter__(self):
+        self._token, self._span = self._context._begin_stage(
+            self.method, self.path)
+        return _StageWrapper(self._context, self.method, self.path,
+                             self.policy, self._responses, self._fan_outs)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._context._end_stage(self.method, self.path, exc_val, self._token,
+                                 self._span)
+        self._compare_fan_outs()
+        self._compact_responses()
+
+    async def __aenter__(self):
+        self._token, self._span = self._context._begin_stage(
+            self.method, self.path)
+        return _AsyncStageWrapper(self._context, self.method, self.path,
+                                  self.policy, self._responses,
+                                  self._fan_outs)
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self._context._end_stage(self.method, self.path, exc_val, self._token,
+                                 self._span)
+        self._compare_fan_outs()
+        self._compact_responses()
+
+    def _compare_fan_outs(self):
+        if not self._fan_outs:
+            return
+
+        session = self._context.session
+        for fan_out in self._fan_outs:
+            session._fan_out_finished(fan_out.result())
+        self._fan_outs = None
+
+    def _compact_responses(self):
+        if self._responses is None:
+            return
+
+        store = self._context.session.response_store
+        for response in self._responses:
+            response.compact(store)
+        self._responses = None
+
 
 class _StageWrapper(object):
-    def __init__(self, context: Context, method: str, path: str):
+    def __init__(self, context: Context, method: str, path: str,
+                 policy: Optional[RequestPolicy],
+                 responses: Optional[list[ResponseWrapper]],
+                 fan_outs: Optional[list[PendingFanOut]]):
         self._context = context
 
         self.method = method
         self.path = path
+        self.policy = policy
+
+        self._responses = responses
+        self._fan_outs = fan_outs
 
     def __call__(self, json: Optional[Any] = None, **kwargs):
-        return self._context.request(self.method,
-                                     self.path,
-                                     json=json,
-                                     **kwargs)
+        if self.policy is not None:
+            kwargs.setdefault('policy', self.policy)
+        if self._fan_outs is not None:
+            response = self._fan_out(json, kwargs)
+        else:
+            response = self._context.request(self.method,
+                                             self.path,
+                                             json=json,
+                                             **kwargs)
+        if self._responses is not None:
+            self._responses.append(response)
+        return response
+
+    def _fan_out(self, json: Optional[Any], kwargs: dict[str, Any]):
+        """
+        Send the request to all the targets concurrently, and return the response of the primary target server.
+        The log output of the other targets is written after the primary request is done.
+        """
+
+        session = self._context.session
+        fan_out = PendingFanOut(self.method, self.path, current_stage())
+
+        def send(target: str):
+            with buffered_output() as records:
+                start = time.perf_counter()
+                try:
+                    response = self._context.request(self.method,
+                                                     self.path,
+                                                     json=json,
+                                                     target=target,
+                                                     **kwargs)
+                except Exception as e:
+                    return records, None, e, time.perf_counter() - start
+                return records, response, None, time.perf_counter() - start
+
+        futures = {
+            target: session.fan_out_executor.submit(
+                contextvars.copy_context().run, send, target)
+            for target in session.run_profile.targets
+        }
+
+        start = time.perf_counter()
+        try:
+            response = self._context.request(self.method,
+                                             self.path,
+                                             json=json,
+                                             **kwargs)
+        except Exception as e:
+            fan_out.add(PRIMARY_TARGET, None, e, time.perf_counter() - start)
+            raise
+        else:
+            fan_out.add(PRIMARY_TARGET, response,
+                        None, time.perf_counter() - start)
+            # Record the expressions the test searches, to compare their values on the other targets.
+            response._searched = []
+            return response
+        finally:
+            for target, future in futures.items():
+                records, target_response, error, elapsed = future.result()
+                flush_output(records)
+                fan_out.add(target, target_response, error, elapsed)
+            self._fan_outs.append(fan_out)
+
+    def defer(self, json: Optional[Any] = None, **kwargs):
+        """
+        Create a callable performing the request with the given arguments when called.
+        Used for passing requests to `Context.gather`.
+        """
+
+        return functools.partial(self, json, **kwargs)
+
+
+class _AsyncStageWrapper(_StageWrapper):
+    async def __call__(self, json: Optional[Any] = None, **kwargs):
+        if self.policy is not None:
+            kwargs.setdefault('policy', self.policy)
+        if self._fan_outs is not None:
+            response = await self._fan_out_async(json, kwargs)
+        else:
+            response = await self._context.async_request(self.method,
+                                                         self.path,
+                                                         json=json,
+                                                         **kwargs)
+        if self._responses is not None:
+            self._responses.append(response)
+        return response
+
+    async def _fan_out_async(self, json: Optional[Any], kwargs: dict[str,
+                                                                     Any]):
+        fan_out = PendingFanOut(self.method, self.path, current_stage())
+
+        async def send(target: Optional[str]):
+            start = time.perf_counter()
+            try:
+                response = await self._context.async_request(self.method,
+                                                             self.path,
+                                                             json=json,
+                                                             target=target,
+                                                             **kwargs)
+            except Exception as e:
+                fan_out.add(target or PRIMARY_TARGET, None, e,
+                            time.perf_counter() - start)
+                raise
+            fan_out.add(target or PRIMARY_TARGET, response, None,
+                        time.perf_counter() - start)
+            return response
+
+        targets = [None, *self._context.session.run_profile.targets]
+        try:
+            response, *_ = await asyncio.gather(
+                *(send(target) for target in targets), return_exceptions=True)
+        finally:
+            self._fan_outs.append(fan_out)
+
+        if isinstance(response, BaseException):
+            raise response
+        # Record the expressions the test searches, to compare their values on the other targets.
+        response._searched = []
+        return response
@@ -0,0 +1,226 @@
+"""
+Structured event log of the stages and requests of a test session, written as newline-delimited JSON.
+
+Events are put on a bounded queue by the test threads and serialized and written by a background thread, so the
+tests never wait for the disk. When the queue is full, events are dropped rather than blocking the test, and the
+number of dropped events is written to the log as an `events_dropped` event.
+"""
+import dataclasses
+import gzip
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+from typing import Any, Optional
+
+from seekret.apitest.context.listener import SessionListener, RequestRecord, StageInfo, current_stage
+from seekret.apitest.context.warmup import WarmUpResult
+
+# Marks the end of the events in the queue.
+_STOP = object()
+
+
+class EventWriter(object):
+    """
+    Writes events to a newline-delimited JSON file from a background thread.
+
+    The file is rotated when it exceeds `max_bytes`: `events.ndjson` is renamed to `events.ndjson.1` (compressed to
+    `events.ndjson.1.gz` if `compress` is set), the older files are shifted, and the oldest file beyond `backups` is
+    removed.
+    """
+    def __init__(self,
+                 path: str,
+                 max_bytes: int = 64 * 1024 * 1024,
+                 backups: int = 5,
+                 compress: bool = False,
+                 queue_size: int = 10000,
+                 batch_size: int = 512,
+                 flush_interval: float = 0.5):
+        """
+        :param path: Path of the event log file. Events are appended to an existing file.
+        :param max_bytes: Size to rotate the file at, or 0 to never rotate it.
+        :param backups: Number of rotated files to keep.
+        :param compress: Compress the rotated files with gzip.
+        :param queue_size: Maximum number of events waiting to be written.
+        :param batch_size: Maximum number of events written at once.
+        :param flush_interval: Maximum time an event waits before being written, in seconds.
+        """
+
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.compress = compress
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        # Number of events dropped since the writer was started.
+        self.dropped = 0
+        self._reported_dropped = 0
+
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._file = None
+        self._size = 0
+
+        self._thread = threading.Thread(target=self._run,
+                                        name='seekret-event-writer',
+                                        daemon=True)
+        self._thread.start()
+
+    def emit(self, event: dict[str, Any]):
+        """
+        Queue an event for writing, without waiting. The event is dropped if the queue is full.
+
+        :param event: JSON-serializable event. Values which are not serializable are written as strings.
+        """
+
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        """
+        Write the queued events, and stop the writer thread.
+        """
+
+        if not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def _run(self):
+        try:
+            stopped = False
+            while not stopped:
+                try:
+                    batch = [self._queue.get(timeout=self.flush_interval)]
+                except queue.Empty:
+                    batch = []
+
+                while batch and len(batch) < self.batch_size:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+
+                if batch and batch[-1] is _STOP:
+                    batch.pop()
+                    stopped = True
+
+                dropped = self.dropped
+                if dropped > self._reported_dropped:
+                    batch.append({
+                        'event': 'events_dropped',
+                        'time': time.time(),
+                        'count': dropped - self._reported_dropped
+                    })
+                    self._reported_dropped = dropped
+
+                if batch:
+                    self._write(batch)
+        finally:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _write(self, batch: list[dict[str, Any]]):
+        data = ''.join(
+            json.dumps(event, default=str, separators=(',', ':')) + '\n'
+            for event in batch).encode()
+
+        if self._file is None:
+            self._file = open(self.path, 'ab')
+            self._size = self._file.tell()
+
+        if self.max_bytes and self._size and self._size + len(
+                data) > self.max_bytes:
+            self._rotate()
+
+        self._file.write(data)
+        self._file.flush()
+        self._size += len(data)
+
+    def _rotate(self):
+        self._file.close()
+
+        suffix = '.gz' if self.compress else ''
+        if self.backups > 0:
+            for index in range(self.backups - 1, 0, -1):
+                source = f'{self.path}.{index}{suffix}'
+                if os.path.exists(source):
+                    os.replace(source, f'{self.path}.{index + 1}{suffix}')
+
+            if self.compress:
+                with open(self.path, 'rb') as source, \
+                        gzip.open(f'{self.path}.1.gz', 'wb') as target:
+                    shutil.copyfileobj(source, target)
+                os.remove(self.path)
+            else:
+                os.replace(self.path, f'{self.path}.1')
+        else:
+            os.remove(self.path)
+
+        self._file = open(self.path, 'ab')
+        self._size = 0
+
+
+def _stage_fields(stage: Optional[StageInfo]) -> dict[str, Any]:
+    if stage is None:
+        return {'nodeid': None, 'stage': None}
+    return {'nodeid': stage.nodeid, 'stage': stage.index}
+
+
+class EventLogListener(SessionListener):
+    """
+    Session listener emitting an event for every stage and request to an event writer.
+
+    Events are correlated to their test by the `nodeid` and `stage` fields.
+    """
+    def __init__(self, writer: EventWriter):
+        self.writer = writer
+
+    def stage_started(self, context, method: str, path: str):
+        self.writer.emit({
+            'event': 'stage_started',
+            'time': time.time(),
+            **_stage_fields(current_stage()),
+            'method': method,
+            'path': path,
+        })
+
+    def stage_finished(self, context, method: str, path: str,
+                       error: Optional[BaseException]):
+        self.writer.emit({
+            'event': 'stage_finished',
+            'time': time.time(),
+            **_stage_fields(current_stage()),
+            'method': method,
+            'path': path,
+            'error': None if error is None else repr(error),
+        })
+
+    def request_finished(self, record: RequestRecord):
+        timings = record.timings
+        self.writer.emit({
+            'event': 'request',
+            'time': time.time(),
+            **_stage_fields(record.stage),
+            'method': record.method,
+            'path': record.path,
+            'url': record.url,
+            'user': record.user,
+            'status_code': record.status_code,
+            'elapsed': record.elapsed,
+            'cached': record.cached,
+            'error': None if record.error is None else repr(record.error),
+            'timings': None if timings is None else dataclasses.asdict(timings),
+        })
+
+    def warm_up_finished(self, result: WarmUpResult):
+        self.writer.emit({
+            'event': 'warm_up',
+            'time': time.time(),
+            **result.to_dict(),
+        })
@@ -0,0 +1,183 @@
+"""
+Fan-out of stage requests to the additional target servers of the run profile, and comparison of their responses.
+
+When the run profile has `targets`, every request of a stage is sent to the primary target server and to each of the
+targets concurrently. The test goes on with the response of the primary target server. When the stage ends, the
+responses of the targets are compared to it: their status codes, the values the test searched in the primary response,
+and their latencies. Values searched after the stage ended are not compared.
+"""
+import dataclasses
+import json
+from collections.abc import Callable
+from typing import Any, Optional
+
+from seekret.apitest.context.listener import StageInfo, SessionListener
+from seekret.apitest.context.stats import format_ms
+from seekret.apitest.runprofile import PRIMARY_TARGET
+
+# Latency differences smaller than this are never flagged, regardless of their ratio, in seconds.
+MIN_LATENCY_DIFFERENCE = 0.05
+
+
+@dataclasses.dataclass(frozen=True)
+class TargetResult(object):
+    """
+    Response of a single target server to a fanned-out request.
+    """
+
+    # Name of the target server, or `PRIMARY_TARGET` for the target server of the run profile.
+    target: str
+
+    # Status code of the response, or `None` if the request failed.
+    status_code: Optional[int]
+
+    # Time to complete the request, in seconds.
+    elapsed: float
+
+    # Values of the expressions the test searched in the primary response, evaluated on this response. Expressions
+    # resulting in null are mapped to `None`.
+    values: dict[str, Any] = dataclasses.field(default_factory=dict)
+
+    # Error raised by the request, if any.
+    error: Optional[str] = None
+
+
+@dataclasses.dataclass(frozen=True)
+class FanOutResult(object):
+    """
+    Responses of all the target servers to a single request of a stage.
+    """
+
+    method: str
+    path: str
+
+    # Stage the request was sent in.
+    stage: Optional[StageInfo]
+
+    # Result of each target server, starting with the primary target server.
+    results: tuple[TargetResult, ...]
+
+    @property
+    def endpoint(self) -> str:
+        return f'{self.method} {self.path}'
+
+    def differences(self, latency_ratio: float) -> list[tuple[str, str]]:
+        """
+        Describe how the responses of the targets differ from the response of the primary target server.
+
+        :param latency_ratio: Flag targets which are faster or slower than the primary target server by this ratio.
+        :return: Target name and description of each difference, or an empty list if all the targets responded the
+                 same.
+        """
+
+        primary, *others = self.results
+        differences = []
+        for result in others:
+            if (result.error is None) != (primary.error is None):
+                differences.append(
+                    (result.target,
+                     f'error {result.error}, {primary.target} error {primary.error}'))
+            if result.status_code != primary.status_code:
+                differences.append(
+                    (result.target,
+                     f'status {result.status_code}, {primary.target} status {primary.status_code}'))
+
+            for expression, value in primary.values.items():
+                other_value = result.values.get(expression)
+                if other_value != value:
+                    differences.append(
+                        (result.target,
+                         f'{expression} is {_format_value(other_value)}, '
+                         f'{primary.target} {_format_value(value)}'))
+
+            slower, faster = max(result.elapsed, primary.elapsed), min(
+                result.elapsed, primary.elapsed)
+            if (slower - faster >= MIN_LATENCY_DIFFERENCE
+                    and slower >= faster * latency_ratio):
+                differences.append(
+                    (result.target,
+                     f'latency {format_ms(result.elapsed)}, '
+                     f'{primary.target} latency {format_ms(primary.elapsed)}'))
+
+        return differences
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            'endpoint': self.endpoint,
+            'nodeid': self.stage and self.stage.nodeid,
+            'stage': self.stage and self.stage.index,
+            'results': [dataclasses.asdict(result) for result in self.results],
+        }
+
+
+def _format_value(value: Any) -> str:
+    return json.dumps(value, default=str)
+
+
+def _search_or_none(response, expression: str) -> Any:
+    try:
+        return response.search(expression)
+    except Exception:
+        # Null results, bodies which are not JSON, and expressions not available in streamed responses.
+        return None
+
+
+class PendingFanOut(object):
+    """
+    Responses of the targets to a single request of a stage, collected until the stage ends.
+    """
+    def __init__(self, method: str, path: str, stage: Optional[StageInfo]):
+        self.method = method
+        self.path = path
+        self.stage = stage
+
+        # Response, error and elapsed time of each target, by the target name.
+        self._responses: dict[str, tuple[Any, Optional[BaseException],
+                                         float]] = {}
+
+    def add(self, target: str, response, error: Optional[BaseException],
+            elapsed: float):
+        self._responses[target] = (response, error, elapsed)
+
+    def result(self) -> FanOutResult:
+        """
+        Compare the responses, using the expressions the test searched in the primary response since it was received.
+        Called when the stage ends, so later searches are not compared.
+        """
+
+        primary = self._responses[PRIMARY_TARGET][0]
+        searched = primary._searched if primary is not None else []
+        # Unique expressions, in the order they were first searched.
+        expressions = list(dict.fromkeys(searched))
+
+        results = []
+        for target in sorted(self._responses,
+                             key=lambda name: name != PRIMARY_TARGET):
+            response, error, elapsed = self._responses[target]
+            results.append(
+                TargetResult(
+                    target=target,
+                    status_code=None
+                    if response is None else response.status_code,
+                    elapsed=elapsed,
+                    values={} if response is None else {
+                        expression: _search_or_none(response, expression)
+                        for expression in expressions
+                    },
+                    error=None if error is None else repr(error)))
+
+        return FanOutResult(method=self.method,
+                            path=self.path,
+                            stage=self.stage,
+                            results=tuple(results))
+
+
+class FanOutListener(SessionListener):
+    """
+    Session listener passing the comparison of each fanned-out request to a callback.
+    """
+    def __init__(self, callback: Callable[[FanOutResult], None]):
+        self.callback = callback
+
+    def fan_out_finished(self, result: FanOutResult):
+        self.callback(result)
@@ -0,0 +1,220 @@
+"""
+JSON codec used for encoding request bodies, decoding response bodies and formatting the request log.
+
+By default, the codec uses `orjson` when installed (`pip install seekret.apitest[fast]`), and the `json` module of the
+standard library otherwise. Both decode valid JSON to the same values, and encode request bodies compactly, without
+whitespace, to the same bytes. Values `orjson` does not support or encodes differently, such as integers larger than 64
+bits, enums, UUIDs and floats formatted with an exponent, are handled by the standard library codec, which also raises
+the usual errors for invalid JSON and unsupported values.
+"""
+import abc
+import json
+from typing import Any, Optional, Union
+
+
+class JsonCodec(abc.ABC):
+    """
+    Interface of JSON codecs. Register a codec using `set_codec`.
+    """
+
+    # Name of the codec, used for selecting it.
+    name = ''
+
+    @abc.abstractmethod
+    def dumps(self, value: Any) -> bytes:
+        """
+        Encode the value as compact UTF-8 JSON.
+
+        :raises TypeError: The value is not serializable.
+        :raises ValueError: The value contains NaN or infinite floats.
+        """
+
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def loads(self, data: Union[bytes, str]) -> Any:
+        """
+        Decode JSON.
+
+        :raises json.JSONDecodeError: The data is not valid JSON.
+        """
+
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def pretty(self, value: Any) -> str:
+        """
+        Format the value as JSON indented by 2 spaces, for the request log.
+        """
+
+        raise NotImplementedError()
+
+
+class StdlibJsonCodec(JsonCodec):
+    name = 'stdlib'
+
+    def dumps(self, value: Any) -> bytes:
+        return json.dumps(value,
+                          separators=(',', ':'),
+                          ensure_ascii=False,
+                          allow_nan=False).encode()
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        try:
+            return json.loads(data)
+        except UnicodeDecodeError:
+            # Decode invalid UTF-8 as `requests` does, so the error is a `JSONDecodeError`.
+            return json.loads(data.decode('utf-8', errors='replace'))
+
+    def pretty(self, value: Any) -> str:
+        return json.dumps(value, indent=2, ensure_ascii=False)
+
+
+_STDLIB_CODEC = StdlibJsonCodec()
+
+
+# Types `orjson` encodes as the standard library codec does. Their subclasses, such as enums, are not included.
+_SCALAR_TYPES = frozenset((str, int, bool, type(None)))
+
+
+def _same_as_stdlib(value: Any) -> bool:
+    """
+    Check whether `orjson` encodes the value as the standard library codec does, instead of encoding values the
+    standard library codec rejects, such as UUIDs, or formatting them differently.
+    """
+
+    value_type = type(value)
+    if value_type in _SCALAR_TYPES:
+        return True
+    if value_type is float:
+        # The standard library codec rejects NaN and infinite floats, and writes the sign of exponents ("1e+16").
+        return value == 0 or 1e-4 <= abs(value) < 1e16
+    if value_type is dict:
+        return all(_same_as_stdlib(key) and _same_as_stdlib(item) for key, item in value.items())
+    if value_type is list or value_type is tuple:
+        return all(_same_as_stdlib(item) for item in value)
+    return False
+
+
+class OrjsonCodec(JsonCodec):
+    name = 'orjson'
+
+    def __init__(self):
+        import orjson
+
+        self._orjson = orjson
+        self._dumps_options = orjson.OPT_NON_STR_KEYS
+        self._pretty_options = self._dumps_options | orjson.OPT_INDENT_2
+
+    def dumps(self, value: Any) -> bytes:
+        if not _same_as_stdlib(value):
+            return _STDLIB_CODEC.dumps(value)
+
+        try:
+            return self._orjson.dumps(value, option=self._dumps_options)
+        except self._orjson.JSONEncodeError:
+            # Integers larger than 64 bits, and keys the standard library codec rejects.
+            return _STDLIB_CODEC.dumps(value)
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        try:
+            return self._orjson.loads(data)
+        except self._orjson.JSONDecodeError:
+            # Encodings other than UTF-8, large integers, and invalid JSON.
+            return _STDLIB_CODEC.loads(data)
+
+    def pretty(self, value: Any) -> str:
+        # Bodies decoded by the standard library codec may contain NaN, which it formats as is.
+        if not _same_as_stdlib(value):
+            return _STDLIB_CODEC.pretty(value)
+
+        try:
+            return self._orjson.dumps(value, option=self._pretty_options).decode()
+        except self._orjson.JSONEncodeError:
+            return _STDLIB_CODEC.pretty(value)
+
+
+_CODEC_CLASSES = {
+    codec_class.name: codec_class
+    for codec_class in (OrjsonCodec, StdlibJsonCodec)
+}
+
+_codec: Optional[JsonCodec] = None
+
+
+def available_codecs() -> list[str]:
+    """
+    :return: Names of the codecs whose backends are installed, fastest first.
+    """
+
+    names = []
+    for name, codec_class in _CODEC_CLASSES.items():
+        try:
+            codec_class()
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+def create_codec(name: str) -> JsonCodec:
+    """
+    Create a codec by its name, or the fastest installed codec for "auto".
+
+    :raises ValueError: The codec is unknown, or its backend is not installed.
+    """
+
+    if name == 'auto':
+        return _CODEC_CLASSES[available_codecs()[0]]()
+
+    try:
+        codec_class = _CODEC_CLASSES[name]
+    except KeyError:
+        raise ValueError(
+            f'unknown JSON codec {name}, expected one of: auto, {", ".join(_CODEC_CLASSES)}'
+        ) from None
+
+    try:
+        return codec_class()
+    except ImportError as e:
+        raise ValueError(
+            f'JSON codec {name} is not installed: {e}') from None
+
+
+def get_codec() -> JsonCodec:
+    """
+    Get the JSON codec in use, choosing the fastest installed codec on first use.
+    """
+
+    global _codec
+    if _codec is None:
+        _codec = create_codec('auto')
+    return _codec
+
+
+def set_codec(codec: Union[str, JsonCodec]):
+    """
+    Set the JSON codec in use.
+
+    :param codec: The codec, or the name of a built-in codec ("auto", "orjson" or "stdlib").
+    :raises ValueError: The codec is unknown, or its backend is not installed.
+    """
+
+    global _codec
+    _codec = create_codec(codec) if isinstance(codec, str) else codec
+
+
+def decode_response_json(response) -> Any:
+    """
+    Decode the JSON body of a response, as `response.json()` does.
+
+    UTF-8 bodies are decoded from the raw bytes. Bodies declaring another charset are decoded from their text.
+
+    :raises json.JSONDecodeError: The body is not valid JSON.
+    """
+
+    encoding = response.encoding
+    if encoding is None or encoding.lower().replace('_', '-') in ('utf-8',
+                                                                   'utf8'):
+        return get_codec().loads(response.content)
+    return get_codec().loads(response.text)
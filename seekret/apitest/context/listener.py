@@ -0,0 +1,160 @@
+import contextvars
+import dataclasses
+from typing import Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from seekret.apitest.context.context import Context
+    from seekret.apitest.context.fanout import FanOutResult
+    from seekret.apitest.context.warmup import WarmUpResult
+
+
+@dataclasses.dataclass(frozen=True)
+class RequestTimings(object):
+    """
+    Breakdown of the time spent in the phases of a single request, in seconds.
+    """
+
+    # Building the request, excluding the auth handler.
+    prepare: float
+
+    # Running the auth handler of the user.
+    auth: float
+
+    # Opening new connections, including the TLS handshake. Zero when a pooled connection is reused.
+    connect: float
+
+    # Sending the request and waiting for the response headers, excluding `connect`.
+    ttfb: float
+
+    # Downloading the response body.
+    download: float
+
+    # Logging the request and the response.
+    logging: float
+
+    # Total time of the request.
+    total: float
+
+    # Waiting for the client-side rate limit of the user, excluded from `ttfb`.
+    rate_limit: float = 0.0
+
+    @property
+    def overhead(self) -> float:
+        """
+        Time spent by the plugin itself, rather than on the network or the target server.
+        """
+
+        return self.prepare + self.auth + self.logging
+
+
+@dataclasses.dataclass(frozen=True)
+class StageInfo(object):
+    """
+    Test stage a request is sent in.
+    """
+
+    # Node ID of the test, or `None` if the context is not bound to a test.
+    nodeid: Optional[str]
+
+    # 1-based index of the stage in its context.
+    index: int
+
+    # Method and path template of the stage target endpoint.
+    method: str
+    path: str
+
+
+# Stage of the running test, set by `Context` while the stage is entered. Requests sent by the threads of
+# `Context.gather`, and by the tasks started in an async stage, inherit the stage of their caller.
+_current_stage: contextvars.ContextVar[Optional[StageInfo]] = \
+    contextvars.ContextVar('seekret_current_stage', default=None)
+
+
+def current_stage() -> Optional[StageInfo]:
+    """
+    :return: The test stage entered in the current thread or task, if any.
+    """
+
+    return _current_stage.get()
+
+
+@dataclasses.dataclass(frozen=True)
+class RequestRecord(object):
+    """
+    Summary of a single request sent by the session.
+    """
+
+    # Method of the request.
+    method: str
+
+    # Path template of the request, as given to `stage` or `request`, before resolving the path parameters.
+    path: str
+
+    # Name of the requesting user, or `None` for unauthenticated requests.
+    user: Optional[str]
+
+    # Resolved URL of the request, or `None` if the request could not be prepared.
+    url: Optional[str]
+
+    # Status code of the response, or `None` if no response was received.
+    status_code: Optional[int]
+
+    # Total time of the request, in seconds.
+    elapsed: float
+
+    # Error raised by the request, if any.
+    error: Optional[BaseException] = None
+
+    # Time breakdown of the request, or `None` if the request failed.
+    timings: Optional[RequestTimings] = None
+
+    # Whether the response was served from the response cache of the session, without sending the request.
+    cached: bool = False
+
+    # Test stage the request was sent in, if any.
+    stage: Optional[StageInfo] = None
+
+    # Name of the target server from the `targets` of the run profile, or `None` for the primary target server.
+    target: Optional[str] = None
+
+    @property
+    def endpoint(self) -> str:
+        """
+        Endpoint template of the request, in the format "METHOD /path/{param}".
+        """
+
+        return f'{self.method} {self.path}'
+
+
+class SessionListener(object):
+    """
+    Base class for objects observing the stages and requests of a session.
+    Register listeners using `Session.add_listener`. Listeners may be called concurrently from multiple threads.
+    """
+    def stage_started(self, context: 'Context', method: str, path: str):
+        """
+        Called when a test stage starts.
+        """
+
+    def stage_finished(self, context: 'Context', method: str, path: str,
+                       error: Optional[BaseException]):
+        """
+        Called when a test stage ends.
+
+        :param error: Exception raised in the stage, if any.
+        """
+
+    def request_finished(self, record: RequestRecord):
+        """
+        Called when a request completes, either successfully or with an error.
+        """
+
+    def fan_out_finished(self, result: 'FanOutResult'):
+        """
+        Called when a stage ends, for each of its requests which were sent to all the targets of the run profile.
+        """
+
+    def warm_up_finished(self, result: 'WarmUpResult'):
+        """
+        Called when the warm-up of the session ends.
+        """
@@ -0,0 +1,400 @@
+"""
+Hedged requests and retries, for controlling the latency tail of the target server.
+"""
+import asyncio
+import collections
+import concurrent.futures
+import math
+import random
+import threading
+import time
+from collections.abc import Callable, Awaitable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Any
+
+import requests
+
+from seekret.apitest.context.stats import format_ms
+from seekret.apitest.runprofile import RequestPolicy, PERCENTILE_PATTERN
+
+# Methods which are safe to send more than once, and are retried.
+IDEMPOTENT_METHODS = frozenset(
+    ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE', 'TRACE'))
+
+# Methods which are hedged. Unlike retries, a hedged duplicate may respond first, so only methods whose response
+# doesn't depend on an earlier request with the same effect are hedged: the duplicate of a DELETE would respond 404.
+HEDGED_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS'))
+
+# Response statuses which are retried.
+RETRY_STATUSES = frozenset((502, 503, 504))
+
+# Number of latency samples of an endpoint required before hedging by an observed percentile.
+MIN_HEDGE_SAMPLES = 20
+
+# Number of the most recent latency samples kept per endpoint.
+_LATENCY_WINDOW = 256
+
+# Number of samples added to a latency window before its percentiles are computed again.
+_RESORT_INTERVAL = 16
+
+# Retries and hedges the retry budget allows before any request was sent, and the most it accumulates.
+_BUDGET_RESERVE = 10
+_BUDGET_CAPACITY = 100
+
+# Errors which are retried, raised before a response was received.
+_RETRY_ERRORS = (requests.ConnectionError, )
+
+NoteCallback = Callable[[str], None]
+
+
+class RetryBudget(object):
+    """
+    Token bucket limiting the retries and hedges to a ratio of the sent requests.
+
+    Every request deposits `ratio` tokens, and every retry or hedged request withdraws a whole token. When the target
+    server fails, the budget runs out after a bounded number of retries, instead of multiplying the load on the server.
+    """
+    def __init__(self, ratio: float):
+        self.ratio = ratio
+
+        self._tokens = float(_BUDGET_RESERVE)
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(self._tokens + self.ratio, _BUDGET_CAPACITY)
+
+    def withdraw(self) -> bool:
+        """
+        Take a token for a retry or a hedged request.
+
+        :return: Whether the budget allows the retry.
+        """
+
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class _LatencyWindow(object):
+    """
+    Most recent latency samples of an endpoint, in seconds.
+    """
+    def __init__(self):
+        self._samples: collections.deque[float] = collections.deque(
+            maxlen=_LATENCY_WINDOW)
+        self._sorted: Optional[list[float]] = None
+        self._added = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._samples)
+
+    def add(self, value: float):
+        with self._lock:
+            self._samples.append(value)
+            self._added += 1
+
+    def percentile(self, percent: float) -> float:
+        """
+        Get the given percentile of the samples, using the nearest-rank method.
+        The percentile is up to `_RESORT_INTERVAL` samples behind, to avoid sorting the samples on every request.
+        """
+
+        with self._lock:
+            if self._sorted is None or self._added >= _RESORT_INTERVAL:
+                self._sorted = sorted(self._samples)
+                self._added = 0
+            ordered = self._sorted
+
+        if not ordered:
+            return 0.0
+        rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+        return ordered[rank - 1]
+
+
+def _close_response(future: concurrent.futures.Future):
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+class PolicyRunner(object):
+    """
+    Sends requests according to their request policy.
+
+    The retry budget and the observed latencies of the endpoints are shared by all the requests of the session.
+    """
+    def __init__(self, retry_budget: float, max_hedges: int):
+        """
+        :param retry_budget: Ratio of retries and hedges to requests allowed across the session.
+        :param max_hedges: Maximum number of requests sent concurrently for hedging.
+        """
+
+        self.budget = RetryBudget(retry_budget)
+
+        self._max_hedges = max_hedges
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._latencies: dict[str, _LatencyWindow] = {}
+        self._lock = threading.Lock()
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # Separate from the executor of the session, so requests sent using `gather` never wait for their own
+                # hedged requests.
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self._max_hedges,
+                    thread_name_prefix='seekret-hedge')
+            return self._executor
+
+    def _latency(self, endpoint: str) -> _LatencyWindow:
+        try:
+            return self._latencies[endpoint]
+        except KeyError:
+            with self._lock:
+                return self._latencies.setdefault(endpoint, _LatencyWindow())
+
+    def hedge_threshold(self, policy: RequestPolicy,
+                        endpoint: str) -> Optional[float]:
+        """
+        Time to wait for a response before sending a hedged request, or `None` to not hedge.
+        """
+
+        hedge_after = policy.hedge_after
+        if hedge_after is None:
+            return None
+
+        if isinstance(hedge_after, str):
+            latency = self._latencies.get(endpoint)
+            if latency is None or len(latency) < MIN_HEDGE_SAMPLES:
+                return None
+            return latency.percentile(
+                float(PERCENTILE_PATTERN.match(hedge_after).group('percent')))
+
+        return float(hedge_after)
+
+    def send(self,
+             send: Callable[[], requests.Response],
+             method: str,
+             endpoint: str,
+             policy: RequestPolicy,
+             note: NoteCallback,
+             read: Optional[Callable[[requests.Response], Any]] = None
+             ) -> requests.Response:
+        """
+        Send a request according to the policy.
+
+        :param send: Sends the request once. May be called concurrently for hedging.
+        :param method: Method of the request.
+        :param endpoint: Endpoint of the request for tracking its latency, in the format "METHOD /path/{param}".
+        :param policy: Request policy.
+        :param note: Called with a description of every retry and hedged request, for logging.
+        :param read: Reads the body of the response. Requests are hedged only when given, since the body of the first
+                     response must be read before it's used.
+        :return: The response. Its body was read if `read` was given.
+        """
+
+        self.budget.deposit()
+        idempotent = method in IDEMPOTENT_METHODS
+        threshold = self.hedge_threshold(
+            policy, endpoint) if method in HEDGED_METHODS and read is not None else None
+
+        def attempt() -> requests.Response:
+            start = time.perf_counter()
+            response = send()
+            self._latency(endpoint).add(time.perf_counter() - start)
+            if read is not None:
+                read(response)
+            return response
+
+        retries = 0
+        while True:
+            response = error = None
+            try:
+                if threshold is None:
+                    response = attempt()
+                else:
+                    response = self._send_hedged(attempt, threshold, note)
+            except _RETRY_ERRORS as e:
+                error = e
+
+            reason = self._retry_reason(response, error) if idempotent else None
+            delay = self._retry_delay(policy, retries, reason, note)
+            if delay is None:
+                if error is not None:
+                    raise error
+                return response
+
+            retries += 1
+            if response is not None:
+                response.close()
+            time.sleep(delay)
+
+    async def send_async(
+            self, send: Callable[[], Awaitable[requests.Response]],
+            method: str,
+            endpoint: str,
+            policy: RequestPolicy,
+            note: NoteCallback,
+            retry_errors: tuple[type[BaseException], ...] = _RETRY_ERRORS
+    ) -> requests.Response:
+        """
+        Send a request according to the policy without blocking the event loop.
+
+        The parameters are the same as the parameters of `send`, and `send` returns responses whose body was read.
+
+        :param retry_errors: Connection errors raised by `send` which are retried.
+        """
+
+        self.budget.deposit()
+        idempotent = method in IDEMPOTENT_METHODS
+        threshold = self.hedge_threshold(policy,
+                                         endpoint) if method in HEDGED_METHODS else None
+
+        async def attempt() -> requests.Response:
+            start = time.perf_counter()
+            response = await send()
+            self._latency(endpoint).add(time.perf_counter() - start)
+            return response
+
+        retries = 0
+        while True:
+            response = error = None
+            try:
+                if threshold is None:
+                    response = await attempt()
+                else:
+                    response = await self._send_hedged_async(
+                        attempt, threshold, note)
+            except retry_errors as e:
+                error = e
+
+            reason = self._retry_reason(response, error) if idempotent else None
+            delay = self._retry_delay(policy, retries, reason, note)
+            if delay is None:
+                if error is not None:
+                    raise error
+                return response
+
+            retries += 1
+            await asyncio.sleep(delay)
+
+    @staticmethod
+    def _retry_reason(response: Optional[requests.Response],
+                      error: Optional[BaseException]) -> Optional[str]:
+        if error is not None:
+            return f'{type(error).__name__}: {error}'
+        if response.status_code in RETRY_STATUSES:
+            return f'{response.status_code} {response.reason}'
+        return None
+
+    def _retry_delay(self, policy: RequestPolicy, retries: int,
+                     reason: Optional[str],
+                     note: NoteCallback) -> Optional[float]:
+        """
+        Decide whether to retry the request.
+
+        :param retries: Number of retries so far.
+        :param reason: Why the last attempt failed, or `None` if it succeeded.
+        :return: Time to wait before retrying, or `None` to not retry.
+        """
+
+        if reason is None or retries >= policy.max_retries:
+            return None
+
+        if not self.budget.withdraw():
+            note(f'not retrying after {reason}, the retry budget is exhausted')
+            return None
+
+        # Exponential backoff with full jitter, so concurrent retries are spread in time.
+        delay = random.uniform(0, policy.retry_backoff * 2**retries)
+        note(
+            f'retry {retries + 1}/{policy.max_retries} after {reason}, waiting {format_ms(delay)}'
+        )
+        return delay
+
+    def _send_hedged(self, attempt: Callable[[], requests.Response],
+                     threshold: float,
+                     note: NoteCallback) -> requests.Response:
+        executor = self._get_executor()
+        primary = executor.submit(attempt)
+        try:
+            return primary.result(timeout=threshold)
+        except concurrent.futures.TimeoutError:
+            pass
+
+        if not self.budget.withdraw():
+            note(
+                f'no response after {format_ms(threshold)}, not hedging since the retry budget is exhausted'
+            )
+            return primary.result()
+
+        note(
+            f'no response after {format_ms(threshold)}, sending a hedged request'
+        )
+        hedged = executor.submit(attempt)
+
+        winner = None
+        for future in concurrent.futures.as_completed((primary, hedged)):
+            if future.exception() is None:
+                winner = future
+                break
+        if winner is None:
+            # Both failed.
+            return primary.result()
+
+        # The slower request can't be cancelled once sent, so release its connection when it's done.
+        (hedged if winner is primary else primary).add_done_callback(
+            _close_response)
+        note('the hedged request responded first'
+             if winner is hedged else 'the original request responded first')
+        return winner.result()
+
+    async def _send_hedged_async(
+            self, attempt: Callable[[], Awaitable[requests.Response]],
+            threshold: float, note: NoteCallback) -> requests.Response:
+        primary = asyncio.ensure_future(attempt())
+        done, _ = await asyncio.wait((primary, ), timeout=threshold)
+        if done:
+            return primary.result()
+
+        if not self.budget.withdraw():
+            note(
+                f'no response after {format_ms(threshold)}, not hedging since the retry budget is exhausted'
+            )
+            return await primary
+
+        note(
+            f'no response after {format_ms(threshold)}, sending a hedged request'
+        )
+        hedged = asyncio.ensure_future(attempt())
+
+        pending = {primary, hedged}
+        winner = None
+        while pending and winner is None:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED)
+            winner = next((task for task in (primary, hedged)
+                           if task in done and task.exception() is None),
+                          None)
+
+        for task in pending:
+            task.cancel()
+        for task in done:
+            # Retrieve the errors of failed requests, so they are not reported as unhandled.
+            task.exception()
+        if winner is None:
+            # Both failed.
+            return primary.result()
+
+        note('the hedged request responded first'
+             if winner is hedged else 'the original request responded first')
+        return winner.result()
@@ -0,0 +1,249 @@
+"""
+Client-side rate limiting of the requests of a user, shared by all the processes on the host.
+
+The state of each limiter is kept in small files in the temporary directory, locked using `fcntl`, so all the
+`pytest-xdist` workers (and concurrent test runs) using the same account stay under its rate limit together:
+
+* `<name>.bucket` - the token bucket: the number of available tokens and the time they were counted at.
+* `<name>.slot-<i>` - a lock file per concurrent request allowed. A request holds the lock of a slot while it's sent.
+
+On platforms without `fcntl`, the state is kept in memory and shared by the threads of the process only.
+"""
+import asyncio
+import contextlib
+import hashlib
+import json
+import os
+import struct
+import tempfile
+import threading
+import time
+from typing import Optional, Any
+
+from seekret.apitest.runprofile import RateLimit
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+# Token count and the time it was counted at, as two doubles.
+_BUCKET_FORMAT = struct.Struct('=dd')
+
+# Delays between attempts to take a concurrency slot, in seconds.
+_MIN_SLOT_POLL = 0.001
+_MAX_SLOT_POLL = 0.02
+
+
+def _state_prefix(key: Any) -> str:
+    digest = hashlib.sha256(
+        json.dumps(key, sort_keys=True, default=str).encode()).hexdigest()
+    user = os.getuid() if hasattr(os, 'getuid') else os.getlogin()
+    return os.path.join(tempfile.gettempdir(),
+                        f'seekret-ratelimit-{user}-{digest[:16]}')
+
+
+class RateLimiter(object):
+    """
+    Token bucket limiting the rate of requests, and a semaphore limiting their concurrency.
+
+    The bucket holds up to `burst` tokens and refills at `requests_per_second`. Every request takes a token. When the
+    bucket is empty, the token is reserved ahead of time, and the request waits until it would have been refilled, so
+    waiting requests are served in order without polling.
+    """
+    def __init__(self, rate_limit: RateLimit, key: Any):
+        """
+        :param rate_limit: Limits to enforce.
+        :param key: Identifies the limited account. Limiters with the same key and limits share their state across
+                    processes.
+        """
+
+        self.rate_limit = rate_limit
+        self._prefix = _state_prefix([key, rate_limit])
+
+        # Separate locks for the bucket and the slots, so taking a free slot never waits for the bucket file lock.
+        self._bucket_lock = threading.Lock()
+        self._bucket_fd: Optional[int] = None
+        self._bucket = (float(self._burst), time.time())
+
+        self._lock = threading.Lock()
+        self._slot_fds: dict[int, int] = {}
+        self._held_slots: set[int] = set()
+
+    @property
+    def _burst(self) -> int:
+        return self.rate_limit.burst or max(
+            int(self.rate_limit.requests_per_second or 1), 1)
+
+    def close(self):
+        with self._bucket_lock, self._lock:
+            for fd in [self._bucket_fd, *self._slot_fds.values()]:
+                if fd is not None:
+                    os.close(fd)
+            self._bucket_fd = None
+            self._slot_fds = {}
+
+    def reserve(self) -> float:
+        """
+        Take a token from the bucket.
+
+        :return: Time to wait before sending the request, in seconds.
+        """
+
+        rate = self.rate_limit.requests_per_second
+        if not rate:
+            return 0.0
+
+        with self._bucket_lock:
+            fd = self._get_bucket_fd()
+            if fd is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                tokens, counted_at = self._read_bucket(fd)
+                now = time.time()
+                # The clock may go back, such as when the state outlived a reboot.
+                elapsed = max(now - counted_at, 0.0)
+                tokens = min(tokens + elapsed * rate, self._burst) - 1
+                self._write_bucket(fd, tokens, now)
+            finally:
+                if fd is not None:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+
+        return -tokens / rate if tokens < 0 else 0.0
+
+    def wait(self) -> float:
+        """
+        Take a token from the bucket, waiting until the request is allowed.
+
+        :return: Time waited, in seconds.
+        """
+
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    async def wait_async(self) -> float:
+        if not self.rate_limit.requests_per_second:
+            return 0.0
+
+        # Taking the token locks the state file shared by the processes, which may block, so it's taken outside of
+        # the event loop.
+        delay = await asyncio.get_running_loop().run_in_executor(None, self.reserve)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
+
+    def try_acquire_slot(self) -> Optional[int]:
+        """
+        Take a free concurrency slot without waiting.
+
+        :return: The slot, to pass to `release_slot`, or `None` if all the slots are taken.
+        """
+
+        with self._lock:
+            for slot in range(self.rate_limit.max_concurrency):
+                if slot in self._held_slots:
+                    continue
+
+                fd = self._get_slot_fd(slot)
+                if fd is not None:
+                    try:
+                        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        continue
+
+                self._held_slots.add(slot)
+                return slot
+
+        return None
+
+    def release_slot(self, slot: int):
+        with self._lock:
+            fd = self._slot_fds.get(slot)
+            if fd is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            self._held_slots.discard(slot)
+
+    @contextlib.contextmanager
+    def slot(self):
+        """
+        Hold a concurrency slot while the context is entered, waiting for a free slot if needed.
+
+        :return: Time waited for the slot, in seconds.
+        """
+
+        if not self.rate_limit.max_concurrency:
+            yield 0.0
+            return
+
+        waited = 0.0
+        slot = self.try_acquire_slot()
+        if slot is None:
+            start = time.perf_counter()
+            poll = _MIN_SLOT_POLL
+            while slot is None:
+                time.sleep(poll)
+                poll = min(poll * 2, _MAX_SLOT_POLL)
+                slot = self.try_acquire_slot()
+            waited = time.perf_counter() - start
+
+        try:
+            yield waited
+        finally:
+            self.release_slot(slot)
+
+    @contextlib.asynccontextmanager
+    async def slot_async(self):
+        if not self.rate_limit.max_concurrency:
+            yield 0.0
+            return
+
+        waited = 0.0
+        slot = self.try_acquire_slot()
+        if slot is None:
+            start = time.perf_counter()
+            poll = _MIN_SLOT_POLL
+            while slot is None:
+                await asyncio.sleep(poll)
+                poll = min(poll * 2, _MAX_SLOT_POLL)
+                slot = self.try_acquire_slot()
+            waited = time.perf_counter() - start
+
+        try:
+            yield waited
+        finally:
+            self.release_slot(slot)
+
+    def _get_bucket_fd(self) -> Optional[int]:
+        if fcntl is None:
+            return None
+        if self._bucket_fd is None:
+            self._bucket_fd = os.open(f'{self._prefix}.bucket',
+                                      os.O_RDWR | os.O_CREAT, 0o600)
+        return self._bucket_fd
+
+    def _get_slot_fd(self, slot: int) -> Optional[int]:
+        if fcntl is None:
+            return None
+        if slot not in self._slot_fds:
+            self._slot_fds[slot] = os.open(f'{self._prefix}.slot-{slot}',
+                                           os.O_RDWR | os.O_CREAT, 0o600)
+        return self._slot_fds[slot]
+
+    def _read_bucket(self, fd: Optional[int]) -> tuple[float, float]:
+        if fd is None:
+            return self._bucket
+
+        data = os.pread(fd, _BUCKET_FORMAT.size, 0)
+        if len(data) < _BUCKET_FORMAT.size:
+            # First use of the limiter on the host.
+            return float(self._burst), time.time()
+        return _BUCKET_FORMAT.unpack(data)
+
+    def _write_bucket(self, fd: Optional[int], tokens: float,
+                      counted_at: float):
+        if fd is None:
+            self._bucket = (tokens, counted_at)
+        else:
+            os.pwrite(fd, _BUCKET_FORMAT.pack(tokens, counted_at), 0)
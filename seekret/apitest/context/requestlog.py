@@ -0,0 +1,296 @@
+import contextlib
+import logging
+import threading
+from typing import Optional, Any
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from seekret.apitest.context.jsoncodec import get_codec, decode_response_json
+from seekret.apitest.context.streaming import StreamedBody
+
+logger = logging.getLogger(__name__)
+
+LOG_MODE_LAZY = 'lazy'
+LOG_MODE_EAGER = 'eager'
+LOG_MODE_NONE = 'none'
+LOG_MODES = (LOG_MODE_LAZY, LOG_MODE_EAGER, LOG_MODE_NONE)
+
+DEFAULT_MAX_BODY_BYTES = 64 * 1024
+
+_buffered_output = threading.local()
+
+
+def _write(level: Optional[int], message: str, printed: bool):
+    records = getattr(_buffered_output, 'records', None)
+    if records is not None:
+        records.append((level, message, printed))
+        return
+
+    if level is not None:
+        logger.log(level, message)
+    if printed:
+        print(message)
+
+
+def _log_and_print(level: int, message: str):
+    _write(level, message, printed=True)
+
+
+def _print(message: str):
+    _write(None, message, printed=True)
+
+
+def _log(level: int, message: str):
+    _write(level, message, printed=False)
+
+
+@contextlib.contextmanager
+def buffered_output():
+    """
+    Buffer the log output of the requests sent in the current thread, instead of writing it immediately.
+    Used for keeping the output of concurrent requests grouped per request.
+
+    :return: List of the buffered records, to be passed to `flush_output`.
+    """
+
+    records = []
+    _buffered_output.records = records
+    try:
+        yield records
+    finally:
+        del _buffered_output.records
+
+
+def flush_output(records: list[tuple[Optional[int], str, bool]]):
+    """
+    Write the records buffered by `buffered_output`.
+    """
+
+    for level, message, printed in records:
+        _write(level, message, printed)
+
+
+def _prettify(v):
+    if isinstance(v, CaseInsensitiveDict):
+        v = dict(v.items())  # Use `v.items()` to preserve case.
+
+    indentation = ' ' * 6  # Match indentation of titles.
+    return indentation.join(
+        get_codec().pretty(v).splitlines(keepends=True))
+
+
+def _truncate(data: bytes,
+              max_bytes: int,
+              encoding: Optional[str],
+              size: Optional[int] = None) -> str:
+    size = len(data) if size is None else size
+    return (data[:max_bytes].decode(encoding or 'utf-8', errors='replace') +
+            f'... [truncated {size - max_bytes} bytes]')
+
+
+class _Exchange(object):
+    """
+    Raw data of a single request and its response, rendered to text only on demand.
+    """
+    def __init__(self, method: str, prepared_request: requests.PreparedRequest,
+                 json: Any):
+        self.method = method
+        self.prepared_request = prepared_request
+        self.json = json
+        self.response: Optional[requests.Response] = None
+
+        # Start of the response body, if the response was streamed.
+        self.streamed: Optional[StreamedBody] = None
+
+        # Notes on how the request was sent, such as retries and hedged requests.
+        self.notes: list[str] = []
+
+    def request_line(self) -> str:
+        return f'--> {self.method} {self.prepared_request.url}'
+
+    @staticmethod
+    def note_line(note: str) -> str:
+        return f'--- {note}'
+
+    def response_line(self) -> str:
+        return (f'<-- {self.response.status_code} {self.response.reason} '
+                f'from {self.method} {self.response.url}')
+
+    def render_request(self, max_body_bytes: int) -> list[str]:
+        body = self.prepared_request.body
+        if max_body_bytes and body is not None and len(
+                body) > max_body_bytes:
+            if isinstance(body, str):
+                body = body.encode()
+            json = _truncate(body, max_body_bytes, 'utf-8')
+        else:
+            json = _prettify(self.json)
+
+        return [
+            f'      headers: {_prettify(self.prepared_request.headers)}',
+            f'      json: {json}'
+        ]
+
+    def render_response(self, max_body_bytes: int) -> list[str]:
+        if self.streamed is not None:
+            body = self._render_streamed_body(max_body_bytes)
+        else:
+            content = self.response.content
+            if max_body_bytes and len(content) > max_body_bytes:
+                body = _truncate(content, max_body_bytes,
+                                 self.response.encoding)
+            else:
+                try:
+                    body = _prettify(decode_response_json(self.response))
+                except ValueError:
+                    body = self.response.text
+
+        return [
+            f'      headers: {_prettify(self.response.headers)}',
+            f'      body: {body}'
+        ]
+
+
+    def _render_streamed_body(self, max_body_bytes: int) -> str:
+        preview, size = self.streamed.preview, self.streamed.size
+        shown = min(max_body_bytes or len(preview), len(preview))
+        if shown < size:
+            return _truncate(preview, shown, self.response.encoding, size)
+
+        try:
+            return _prettify(get_codec().loads(preview))
+        except ValueError:
+            return preview.decode(self.response.encoding or 'utf-8',
+                                  errors='replace')
+
+
+class RequestLog(object):
+    """
+    Log of the requests sent in the current test.
+
+    In lazy mode (the default), only the request and response lines are logged when a request is sent. The raw
+    request and response objects are kept, and their headers and bodies are serialized only when the log is
+    rendered (e.g. when the test fails), or when the DEBUG log level is enabled.
+    In eager mode, the headers and bodies are serialized and printed immediately.
+    In "none" mode, only the request and response lines are logged in the DEBUG level, and nothing is kept.
+
+    Bodies larger than `max_body_bytes` are truncated in the output, without parsing them.
+    """
+    def __init__(self,
+                 mode: str = LOG_MODE_LAZY,
+                 max_body_bytes: int = DEFAULT_MAX_BODY_BYTES):
+        """
+        :param mode: Log mode, either "lazy", "eager" or "none".
+        :param max_body_bytes: Maximum number of body bytes to show in the output. Use 0 for no limit.
+        """
+
+        if mode not in LOG_MODES:
+            raise ValueError(f'unsupported log mode "{mode}"')
+
+        self.mode = mode
+        self.max_body_bytes = max_body_bytes
+
+        self._exchanges: list[_Exchange] = []
+        self._lock = threading.Lock()
+
+    def log_request(self, method: str,
+                    prepared_request: requests.PreparedRequest,
+                    json: Any) -> _Exchange:
+        """
+        Log an outgoing request.
+
+        :return: Exchange object to pass to `log_response` when the response arrives.
+        """
+
+        exchange = _Exchange(method, prepared_request, json)
+
+        if self.mode == LOG_MODE_NONE:
+            _log(logging.DEBUG, exchange.request_line())
+            return exchange
+
+        if self.mode == LOG_MODE_EAGER:
+            _log_and_print(logging.INFO, exchange.request_line())
+            for line in exchange.render_request(self.max_body_bytes):
+                _print(line)
+            return exchange
+
+        _log(logging.INFO, exchange.request_line())
+        if logger.isEnabledFor(logging.DEBUG):
+            _log(logging.DEBUG,
+                 '\n'.join(exchange.render_request(self.max_body_bytes)))
+
+        with self._lock:
+            self._exchanges.append(exchange)
+        return exchange
+
+    def log_response(self,
+                     exchange: _Exchange,
+                     response: requests.Response,
+                     streamed: Optional[StreamedBody] = None):
+        """
+        Log the response of a request logged by `log_request`.
+
+        :param streamed: Summary of the response body, if the response was read in streaming mode. Only the start of
+                         the body is shown in that case.
+        """
+
+        exchange.response = response
+        exchange.streamed = streamed
+
+        if self.mode == LOG_MODE_NONE:
+            _log(logging.DEBUG, exchange.response_line())
+            return
+
+        if self.mode == LOG_MODE_EAGER:
+            _log_and_print(logging.INFO, exchange.response_line())
+            for line in exchange.render_response(self.max_body_bytes):
+                _print(line)
+            return
+
+        _log(logging.INFO, exchange.response_line())
+        if logger.isEnabledFor(logging.DEBUG):
+            _log(logging.DEBUG,
+                 '\n'.join(exchange.render_response(self.max_body_bytes)))
+
+    def log_note(self, exchange: _Exchange, note: str):
+        """
+        Log a note on how the request of the exchange is sent, such as a retry.
+        """
+
+        exchange.notes.append(note)
+        line = exchange.note_line(note)
+
+        if self.mode == LOG_MODE_NONE:
+            _log(logging.DEBUG, line)
+        elif self.mode == LOG_MODE_EAGER:
+            _log_and_print(logging.INFO, line)
+        else:
+            _log(logging.INFO, line)
+
+    def render(self) -> str:
+        """
+        Render the logged requests and responses as text.
+        """
+
+        with self._lock:
+            exchanges = list(self._exchanges)
+
+        lines = []
+        for exchange in exchanges:
+            lines.append(exchange.request_line())
+            lines.extend(exchange.render_request(self.max_body_bytes))
+            lines.extend(exchange.note_line(note) for note in exchange.notes)
+            if exchange.response is not None:
+                lines.append(exchange.response_line())
+                lines.extend(exchange.render_response(self.max_body_bytes))
+
+        return '\n'.join(lines)
+
+    def clear(self):
+        """
+        Drop the logged requests and responses.
+        """
+
+        with self._lock:
+            self._exchanges.clear()
@@ -1,10 +1,18 @@
+import functools
 import io
 import json
+from collections.abc import Mapping
+from typing import Any, Optional
 
 import jmespath
+import pykwalify
 import pykwalify.core
+import pykwalify.rule
 import requests
 
+from seekret.apitest.context.compact import ResponseStore, CompactResponse, _NOT_KEPT
+from seekret.apitest.context.jsoncodec import decode_response_json
+
 
 class NullResultError(RuntimeError):
     """
@@ -14,20 +22,143 @@ class NullResultError(RuntimeError):
     pass
 
 
+# Compiled JMESPath expressions, shared by all responses.
+# Generated tests use the same expressions over and over, so compiling each expression once saves most of the search
+# time.
+_compile_expression = functools.lru_cache(maxsize=1024)(jmespath.compile)
+
+_NOT_PARSED = object()
+
+
+class _CompiledSchema(object):
+    """
+    PyKwalify schema which is parsed and compiled to rules once, and can be used to validate many values.
+    """
+    def __init__(self, schema: str):
+        # Parse using the YAML loader of PyKwalify, as done when the schema is passed to `Core` directly.
+        schema_data = pykwalify.core.Core(
+            source_data={}, schema_file_obj=io.StringIO(schema)).schema
+
+        self.partial_schemas = {}
+        self.schema = {}
+        for key, value in schema_data.items():
+            if key.startswith('schema;'):
+                self.partial_schemas[key.split(';', 1)[1]] = pykwalify.rule.Rule(
+                    schema=value)
+            else:
+                self.schema[key] = value
+
+        self.root_rule = pykwalify.rule.Rule(schema=self.schema)
+
+    def validate(self, value: Any):
+        """
+        Validate the value against the schema.
+
+        :raises pykwalify.core.SchemaError: Validation failed.
+        """
+
+        _CompiledSchemaCore(self, value).validate()
+
+
+class _CompiledSchemaCore(pykwalify.core.Core):
+    """
+    PyKwalify validator using the rules of a compiled schema, instead of building the rules on every validation.
+    """
+    def __init__(self, compiled_schema: _CompiledSchema, source_data: Any):
+        super().__init__(source_data=source_data,
+                         schema_data=compiled_schema.schema)
+        self._compiled_schema = compiled_schema
+
+    def _start_validate(self, value=None):
+        self.errors = []
+        pykwalify.partial_schemas.update(self._compiled_schema.partial_schemas)
+        self.root_rule = self._compiled_schema.root_rule
+        self._validate(value, self.root_rule, '', [])
+
+
+# Compiled schemas, shared by all responses and keyed by the schema content.
+_compile_schema = functools.lru_cache(maxsize=256)(_CompiledSchema)
+
+
 class ResponseWrapper(object):
     """
     Wrapper for `requests.Response` that extends the response with extra functionality.
     """
-    def __init__(self, response: requests.Response):
+    def __init__(self, response: requests.Response, exchange=None):
         """
         Wrap the given response.
+
+        :param exchange: Request log entry of the response, which is updated when the response is compacted.
         """
 
         self._response = response
+        self._exchange = exchange
+
+        self._search_data = None
+        self._json = _NOT_PARSED
+
+        # Expressions searched in the response, if recorded for comparing the responses of several targets.
+        self._searched: Optional[list[str]] = None
 
     def __getattr__(self, item):
         return getattr(self._response, item)
 
+    @property
+    def compacted(self) -> bool:
+        return isinstance(self._response, CompactResponse)
+
+    def compact(self, store: ResponseStore):
+        """
+        Drop the raw response, keeping only the status, the headers and the body. See `CompactResponse`.
+
+        :param store: Response store accounting for the memory of the compacted response.
+        """
+
+        if self.compacted:
+            return
+
+        response = self._response
+        self._response = self._compact_response(store)
+        if self._exchange is not None and self._exchange.response is response:
+            self._exchange.response = self._response
+
+        if self._response.spilled:
+            # Drop the parsed body, it's parsed again from the spilled file when searched.
+            self._json = _NOT_PARSED
+            self._search_data = None
+
+    def _compact_response(self, store: ResponseStore) -> CompactResponse:
+        return store.compact(self._response,
+                             _NOT_KEPT if self._json is _NOT_PARSED else self._json)
+
+    def _parsed_json(self) -> Any:
+        """
+        Get the JSON body of the response. The body is parsed only once per response.
+
+        :raises json.JSONDecodeError: The response body is not valid JSON.
+        """
+
+        if self._json is _NOT_PARSED:
+            if isinstance(self._response, CompactResponse):
+                self._json = self._response.json()
+            else:
+                self._json = decode_response_json(self._response)
+
+        return self._json
+
+    def _get_search_data(self) -> dict[str, Any]:
+        if self._search_data is None:
+            search_data = {'headers': self.headers}
+
+            try:
+                search_data['json'] = self._parsed_json()
+            except json.JSONDecodeError:
+                pass
+
+            self._search_data = search_data
+
+        return self._search_data
+
     def search(self, expression: str):
         """
         Search the response using the given JMESPath expression.
@@ -44,14 +175,11 @@ class ResponseWrapper(object):
                            Available root keys are "json" or "headers".
         """
 
-        search_data = {'headers': self.headers}
+        if self._searched is not None:
+            self._searched.append(expression)
 
-        try:
-            search_data['json'] = self.json()
-        except json.JSONDecodeError:
-            pass
-
-        value = jmespath.search(expression, search_data)
+        value = _compile_expression(expression).search(
+            self._get_search_data())
         if value is None:
             raise NullResultError(
                 f'searching response for expression {expression} resulted in null'
@@ -59,17 +187,102 @@ class ResponseWrapper(object):
 
         return value
 
+    def search_many(self, expressions: Mapping[str, str]) -> dict[str, Any]:
+        """
+        Search the response using multiple JMESPath expressions at once.
+
+        >>> response.search_many({
+        >>>     'channel_id': 'json.data.channel.id',
+        >>>     'request_id': "headers.'X-Request-Id'"
+        >>> })  # {'channel_id': ..., 'request_id': ...}
+
+        :param expressions: Dictionary mapping names to JMESPath expressions, as in `search`.
+        :return: Dictionary mapping the given names to the search results.
+        :raises NullResultError: One of the expressions resulted in null.
+        """
+
+        return {
+            name: self.search(expression)
+            for name, expression in expressions.items()
+        }
+
     def assert_schema(self, schema: str):
         """
         Assert that the schema of the response body matches the given PyKwalify schema.
+        Each schema is parsed and compiled once, and reused by all the responses validated against it.
 
         :param schema: YAML representation of the PyKwalify schema.
         :raises AssertionError: Schema validation failed.
         """
         try:
-            pykwalify.core.Core(
-                source_data=self.json(),
-                schema_file_obj=io.StringIO(schema)).validate()
+            _compile_schema(schema).validate(self._parsed_json())
         except pykwalify.core.SchemaError as e:
             raise AssertionError(
                 f'response schema verification error: {e.msg}') from e
+
+
+class StreamedResponseWrapper(ResponseWrapper):
+    """
+    Wrapper of a response whose body was read in streaming mode, and is not kept.
+
+    The status and headers are available as usual. Only the JSON expressions given when sending the request can be
+    searched, and the body itself (`content`, `json()`, `assert_schema`) is not available.
+    """
+    def __init__(self,
+                 response: requests.Response,
+                 values: Optional[dict[str, Any]],
+                 exchange=None):
+        """
+        :param values: Dictionary mapping the searched JSON expressions to their values, or `None` if the body is
+                       not valid JSON.
+        """
+
+        super().__init__(response, exchange)
+        self._stream_values = values
+
+    def _compact_response(self, store: ResponseStore) -> CompactResponse:
+        return store.compact(self._response, keep_body=False)
+
+    def _parsed_json(self) -> Any:
+        raise RuntimeError(
+            'the body of a streamed response is not kept, search it using the expressions given in `stream`'
+        )
+
+    def _get_search_data(self) -> dict[str, Any]:
+        if self._search_data is None:
+            self._search_data = {'headers': self.headers}
+
+        return self._search_data
+
+    def search(self, expression: str):
+        """
+        Search the response using the given JMESPath expression.
+
+        Expressions starting with "json" must be one of the expressions given in `stream` when sending the request.
+        Expressions starting with "headers" are supported as in non-streamed responses.
+
+        :raises ValueError: The JSON expression was not given when sending the request.
+        """
+
+        if not expression.startswith('json'):
+            return super().search(expression)
+
+        if self._searched is not None:
+            self._searched.append(expression)
+
+        if self._stream_values is None:
+            # The body is not JSON.
+            value = None
+        elif expression in self._stream_values:
+            value = self._stream_values[expression]
+        else:
+            raise ValueError(
+                f'expression {expression} was not given in `stream` when sending the request'
+            )
+
+        if value is None:
+            raise NullResultError(
+                f'searching response for expression {expression} resulted in null'
+            )
+
+        return value
@@ -1,25 +1,145 @@
-import json as _json
+import contextlib
+import dataclasses
+import functools
 import logging
+import os
 import re
+import threading
+import time
 import urllib.parse
-from collections.abc import Mapping
+from collections.abc import Mapping, Iterable
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, Any
 
 import requests
-from requests.structures import CaseInsensitiveDict
+from requests.auth import AuthBase
 
 from seekret.apitest.auth import create_auth
-from seekret.apitest.context.response import ResponseWrapper
-from seekret.apitest.runprofile import RunProfile
+from seekret.apitest.context.cache import ResponseCache, CACHED_METHODS
+from seekret.apitest.context.cassette import Cassette
+from seekret.apitest.context.compact import ResponseStore
+from seekret.apitest.context.fanout import FanOutResult
+from seekret.apitest.context.jsoncodec import get_codec
+from seekret.apitest.context.listener import SessionListener, RequestRecord, RequestTimings, current_stage
+from seekret.apitest.context.policy import PolicyRunner
+from seekret.apitest.context.ratelimit import RateLimiter
+from seekret.apitest.context.requestlog import RequestLog, DEFAULT_MAX_BODY_BYTES
+from seekret.apitest.context.response import ResponseWrapper, StreamedResponseWrapper
+from seekret.apitest.context.stats import format_ms
+from seekret.apitest.context.streaming import parse_stream_expression, read_streamed_json
+from seekret.apitest.context.tracing import Tracer, Span, SPAN_KIND_CLIENT, current_span
+from seekret.apitest.context.transport import create_transport, reset_phase_timings, add_phase_timing, \
+    get_phase_timing
+from seekret.apitest.context.warmup import WarmUpResult, warm_up
+from seekret.apitest.runprofile import RunProfile, RequestPolicy
 
 PATH_PARAMETER_PLACEHOLDER_PATTERN = re.compile(r'{(?P<param_name>[^{}]+)}')
 
 logger = logging.getLogger(__name__)
 
+# Waits for the rate limit shorter than this are not shown in the request output, in seconds.
+_RATE_LIMIT_NOTE_THRESHOLD = 0.001
 
-def _log_and_print(level: int, message: str):
-    logger.log(level, message)
-    print(message)
+
+class _PathTemplate(object):
+    """
+    Path template compiled once into its literal parts and placeholder names, and rendered for each request.
+    """
+    def __init__(self, path: str):
+        self.path = path
+
+        parts = PATH_PARAMETER_PLACEHOLDER_PATTERN.split(path)
+        self.literals: list[str] = parts[0::2]
+        self.param_names: list[str] = parts[1::2]
+        self.param_name_set = frozenset(self.param_names)
+
+        # URL prefix to prepend to the rendered path, per target server. `None` if the URL must be joined using
+        # `urllib.parse.urljoin` for every request.
+        self._url_prefixes: dict[str, Optional[str]] = {}
+
+    def render(self, path_params: Mapping[str, Any]) -> str:
+        """
+        Render the path with the given path parameters, as described in `resolve_path_params`.
+        """
+
+        return self._render(path_params)[0]
+
+    def _render(self, path_params: Mapping[str, Any]) -> tuple[str, bool]:
+        """
+        :return: The rendered path, and whether one of the values is a path segment that `urllib.parse.urljoin`
+                 normalizes ("", "." or "..").
+        """
+
+        literals = self.literals
+        if not self.param_names:
+            if path_params:
+                self._raise_unused(path_params)
+            return literals[0], False
+
+        pieces = [literals[0]]
+        special_segment = False
+        for name, literal in zip(self.param_names, literals[1:]):
+            try:
+                value = path_params[name]
+            except KeyError as e:
+                raise ValueError(
+                    f'expected path param {e} was not given') from e
+
+            # safe defaults to the "/" character, which we need to escape.
+            value = urllib.parse.quote(str(value), safe='')
+            if value in ('', '.', '..'):
+                special_segment = True
+            pieces.append(value)
+            pieces.append(literal)
+
+        if len(path_params) > len(self.param_name_set):
+            self._raise_unused(path_params)
+
+        return ''.join(pieces), special_segment
+
+    def _raise_unused(self, path_params: Mapping[str, Any]):
+        unused_params = path_params.keys() - self.param_name_set
+        raise ValueError(
+            f'path params given but do not appear in path: {", ".join(unused_params)}'
+        )
+
+    def url(self, target_server: str, path_params: Mapping[str, Any]) -> str:
+        """
+        Render the full URL of the path in the target server.
+        """
+
+        path, special_segment = self._render(path_params)
+        # Strip "/" at the start of the path to avoid "//" replacing the host part.
+        path = path.lstrip('/')
+
+        try:
+            prefix = self._url_prefixes[target_server]
+        except KeyError:
+            prefix = self._url_prefixes[target_server] = self._url_prefix(
+                target_server)
+
+        if prefix is None or special_segment or not path:
+            return urllib.parse.urljoin(target_server, path)
+        return prefix + path
+
+    def _url_prefix(self, target_server: str) -> Optional[str]:
+        """
+        Find the prefix that joining the rendered path to the target server adds, if it's the same for every value of
+        the path parameters.
+        """
+
+        # Values are quoted, so values other than special segments join like a plain path segment.
+        sample = 'x'.join(self.literals).lstrip('/')
+        prefix = urllib.parse.urljoin(target_server, 'x')[:-1]
+        if urllib.parse.urljoin(target_server, sample) != prefix + sample:
+            # The literal parts contain a scheme, query or dot segments.
+            return None
+
+        return prefix
+
+
+# Compiled path templates, shared by all sessions. Tests use a small fixed set of path templates.
+compile_path_template = functools.lru_cache(maxsize=1024)(_PathTemplate)
 
 
 def resolve_path_params(path: str, path_params: dict[str, Any]):
@@ -39,35 +159,326 @@ def resolve_path_params(path: str, path_params: dict[str, Any]):
     :raises ValueError: Some keys of the given path parameters do not appear as placeholders in the path.
     """
 
-    consumed_params = set()
+    return compile_path_template(path).render(path_params)
+
+
+class _RequestTimer(object):
+    """
+    Measures the time spent in the phases of a single request.
+    """
+    def __init__(self):
+        reset_phase_timings()
+        self.start = self._last = time.perf_counter()
+        self._phases: dict[str, float] = {}
+        self._auth = self._connect = self._rate_limit = 0.0
+
+    def mark(self, phase: str):
+        """
+        Attribute the time since the previous mark to the given phase.
+        """
 
-    def substitute_handler(match: re.Match):
-        param_name = match.group('param_name')
-        consumed_params.add(param_name)
+        now = time.perf_counter()
+        self._phases[phase] = self._phases.get(phase, 0.0) + now - self._last
+        self._last = now
+
+        # Take the phases measured inside `requests` right away, since hedged and retried attempts may add to them later.
+        if phase == 'prepare':
+            self._auth = get_phase_timing('auth')
+        elif phase == 'ttfb':
+            self._connect = get_phase_timing('connect')
+            self._rate_limit = get_phase_timing('rate_limit')
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+    def timings(self) -> RequestTimings:
+        auth = self._auth
+        connect = self._connect
+        rate_limit = self._rate_limit
+        return RequestTimings(
+            prepare=max(self._phases.get('prepare', 0.0) - auth, 0.0),
+            auth=auth,
+            connect=connect,
+            ttfb=max(self._phases.get('ttfb', 0.0) - connect - rate_limit,
+                     0.0),
+            download=self._phases.get('download', 0.0),
+            logging=self._phases.get('logging', 0.0),
+            total=self._last - self.start,
+            rate_limit=rate_limit)
+
+
+class _TimedAuth(AuthBase):
+    """
+    Auth handler wrapper measuring the time spent in the wrapped handler.
+    """
+    def __init__(self, auth):
+        self.auth = auth
 
-        # safe defaults to the "/" character, which we need to escape.
-        return urllib.parse.quote(str(path_params[param_name]), safe='')
+    def __call__(self, request: requests.PreparedRequest):
+        start = time.perf_counter()
+        try:
+            return self.auth(request)
+        finally:
+            add_phase_timing('auth', time.perf_counter() - start)
 
-    try:
-        resolved = PATH_PARAMETER_PLACEHOLDER_PATTERN.sub(
-            substitute_handler, path)
-    except KeyError as e:
-        raise ValueError(f'expected path param {e} was not given') from e
+    def close(self):
+        """
+        Close the wrapped handler, if it holds resources such as background token refreshes.
+        """
 
-    unused_params = path_params.keys() - consumed_params
-    if unused_params:
-        raise ValueError(
-            f'path params given but do not appear in path: {", ".join(unused_params)}'
-        )
+        close = getattr(self.auth, 'close', None)
+        if close is not None:
+            close()
+
+
+def _read_content(response: requests.Response):
+    _ = response.content
+
+
+def _make_record(method: str,
+                 path: str,
+                 user: Optional[str],
+                 prepared_request: Optional[requests.PreparedRequest],
+                 response: Optional[requests.Response],
+                 timer: _RequestTimer,
+                 error: Optional[BaseException] = None,
+                 cached: bool = False,
+                 target: Optional[str] = None) -> RequestRecord:
+    return RequestRecord(
+        method=method,
+        path=path,
+        user=user,
+        url=prepared_request and prepared_request.url,
+        status_code=response.status_code if response is not None else None,
+        elapsed=timer.elapsed(),
+        error=error,
+        timings=timer.timings() if error is None else None,
+        cached=cached,
+        stage=current_stage(),
+        target=target)
+
+
+def _policy_endpoint(method: str, path: str, target: Optional[str]) -> str:
+    """
+    Key of the endpoint latencies used for hedging, which are kept per target server.
+    """
 
-    return resolved
+    if target is None:
+        return f'{method} {path}'
+    return f'{method} {path} @{target}'
 
 
 class Session(object):
-    def __init__(self, run_profile: RunProfile):
+    def __init__(self,
+                 run_profile: RunProfile,
+                 request_log: Optional[RequestLog] = None,
+                 cassette: Optional[Cassette] = None,
+                 response_cache: Optional[ResponseCache] = None,
+                 response_store: Optional[ResponseStore] = None,
+                 tracer: Optional[Tracer] = None):
+        """
+        Initialize the session.
+
+        :param run_profile: Run profile of the test session.
+        :param request_log: Log of the sent requests. Defaults to a lazy request log.
+        :param cassette: Cassette to record the responses to, or to replay them from instead of sending the requests.
+        :param response_cache: Cache of GET and HEAD responses, shared by the tests of the session. Responses are not
+                               cached by default.
+        :param response_store: Store to compact the responses of each stage to when the stage ends. Responses are
+                               not compacted by default.
+        :param tracer: Tracer to create the spans of the stages and requests with. Spans are not created by default.
+        """
+
         self.run_profile = run_profile
+        self.request_log = request_log or RequestLog()
+        self.cassette = cassette
+        self.response_cache = response_cache
+        self.response_store = response_store
+        self.tracer = tracer
 
         self._auths = {}
+        self._rate_limiters: dict[tuple[str, Optional[str]],
+                                  Optional[RateLimiter]] = {}
+
+        self._transport: Optional[requests.Session] = None
+        self._transport_pid: Optional[int] = None
+        self._transport_lock = threading.Lock()
+
+        self._async_session = None
+
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._fan_out_executor: Optional[ThreadPoolExecutor] = None
+
+        # Two requests per connection, for hedging requests sent concurrently using `gather`.
+        self.policy_runner = PolicyRunner(
+            retry_budget=run_profile.request_policy.retry_budget,
+            max_hedges=2 * run_profile.connection_pool.max_connections_per_host)
+
+        self.listeners: tuple[SessionListener, ...] = ()
+
+    def add_listener(self, listener: SessionListener):
+        """
+        Register a listener to the stages and requests of the session.
+        """
+
+        self.listeners = self.listeners + (listener, )
+
+    def remove_listener(self, listener: SessionListener):
+        """
+        Unregister a listener registered using `add_listener`.
+        """
+
+        self.listeners = tuple(l for l in self.listeners if l is not listener)
+
+    def _start_request_span(self, method: str, path: str,
+                            user: Optional[str],
+                            target: Optional[str]) -> Optional[Span]:
+        if self.tracer is None:
+            return None
+
+        return self.tracer.start_span(f'{method} {path}',
+                                      SPAN_KIND_CLIENT,
+                                      attributes={
+                                          'http.request.method': method,
+                                          'url.template': path,
+                                          'seekret.user': user,
+                                          'seekret.target': target,
+                                      })
+
+    def _request_finished(self,
+                          record: RequestRecord,
+                          span: Optional[Span] = None):
+        if span is not None:
+            span.attributes.update({
+                'url.full': record.url,
+                'http.response.status_code': record.status_code,
+                'seekret.cached': record.cached,
+            })
+            if record.timings is not None:
+                span.attributes.update({
+                    f'seekret.timings.{phase}': seconds
+                    for phase, seconds in dataclasses.asdict(
+                        record.timings).items()
+                })
+            self.tracer.end_span(span, record.error)
+
+        for listener in self.listeners:
+            listener.request_finished(record)
+
+    def _fan_out_finished(self, result: FanOutResult):
+        for listener in self.listeners:
+            listener.fan_out_finished(result)
+
+    def warm_up(self, connections: int = 1) -> WarmUpResult:
+        """
+        Resolve the target servers, open pooled connections to them and authenticate the users of the run profile,
+        so the first requests don't pay for them. See `seekret.apitest.context.warmup`.
+
+        :param connections: Number of connections to open to each target server.
+        """
+
+        result = warm_up(self, connections)
+        for listener in self.listeners:
+            listener.warm_up_finished(result)
+        return result
+
+    def _get_transport(self) -> requests.Session:
+        """
+        Get the pooled HTTP transport of the session, creating it on first use.
+
+        The transport is recreated when used from a different process than the one that created it,
+        so pooled connections are never shared between forked processes.
+        """
+
+        with self._transport_lock:
+            if self._transport is None or self._transport_pid != os.getpid():
+                self._transport = create_transport(
+                    self.run_profile.connection_pool, self.cassette)
+                self._transport_pid = os.getpid()
+
+            return self._transport
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """
+        Thread pool for sending concurrent requests.
+        The pool is bounded by the maximum number of connections per host, so concurrent requests never wait for a
+        pooled connection.
+        """
+
+        with self._transport_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.run_profile.connection_pool.
+                    max_connections_per_host,
+                    thread_name_prefix='seekret')
+
+            return self._executor
+
+    @property
+    def fan_out_executor(self) -> ThreadPoolExecutor:
+        """
+        Thread pool for sending stage requests to the additional targets of the run profile.
+        The pool is separate from `executor`, so requests sent by `executor` threads never wait for its threads.
+        """
+
+        with self._transport_lock:
+            if self._fan_out_executor is None:
+                self._fan_out_executor = ThreadPoolExecutor(
+                    max_workers=len(self.run_profile.targets) *
+                    self.run_profile.connection_pool.max_connections_per_host,
+                    thread_name_prefix='seekret-fan-out')
+
+            return self._fan_out_executor
+
+    @property
+    def async_session(self):
+        """
+        asyncio counterpart of this session, sharing its run profile and auth handlers.
+
+        :rtype: seekret.apitest.context.async_session.AsyncSession
+        """
+
+        if self._async_session is None:
+            from seekret.apitest.context.async_session import AsyncSession
+            self._async_session = AsyncSession(self)
+
+        return self._async_session
+
+    def close(self):
+        """
+        Close the pooled connections of the session, and stop refreshing the OAuth2 tokens of its users in the
+        background.
+        The session remains usable, and will open new connections on the next request.
+        """
+
+        if self._async_session is not None:
+            self._async_session.close()
+
+        with self._transport_lock:
+            executors = (self._executor, self._fan_out_executor)
+            self._executor = self._fan_out_executor = None
+        for executor in executors:
+            if executor is not None:
+                executor.shutdown()
+        self.policy_runner.close()
+        for rate_limiter in self._rate_limiters.values():
+            if rate_limiter is not None:
+                rate_limiter.close()
+        if self.response_store is not None:
+            self.response_store.close()
+        if self.tracer is not None:
+            self.tracer.shutdown()
+        for auth in self._auths.values():
+            auth.close()
+
+        with self._transport_lock:
+            transport, self._transport = self._transport, None
+            if transport is not None and self._transport_pid == os.getpid():
+                transport.close()
+
+        if self.cassette is not None:
+            self.cassette.close()
 
     def _auth_handler(self, user_name: str):
         """
@@ -78,11 +489,81 @@ class Session(object):
             return self._auths[user_name]
         except KeyError:
             user = self.run_profile.users[user_name]
-            auth = create_auth(user.auth.type, user.auth.data)
+            auth = _TimedAuth(create_auth(user.auth.type, user.auth.data))
             self._auths[user_name] = auth
 
             return auth
 
+    def _target_server(self, target: Optional[str]) -> str:
+        """
+        Get the URL of a target server by its name in the run profile, or the primary target server for `None`.
+
+        :raises ValueError: The target is not defined in the run profile.
+        """
+
+        if target is None:
+            return self.run_profile.target_server
+
+        try:
+            return self.run_profile.targets[target]
+        except KeyError:
+            raise ValueError(
+                f'target {target} is not defined in the run profile') from None
+
+    def _rate_limiter(self,
+                      user_name: Optional[str],
+                      target: Optional[str] = None) -> Optional[RateLimiter]:
+        """
+        Get the rate limiter of the requesting user on the target server, or `None` if the user is not rate limited.
+        """
+
+        if user_name is None:
+            return None
+
+        try:
+            return self._rate_limiters[user_name, target]
+        except KeyError:
+            user = self.run_profile.users[user_name]
+            rate_limiter = None
+            if user.rate_limit is not None:
+                # Users with the same credentials share the rate limit of the account.
+                rate_limiter = RateLimiter(user.rate_limit,
+                                           key=[
+                                               self._target_server(target),
+                                               user.auth.type, user.auth.data
+                                           ])
+            self._rate_limiters[user_name, target] = rate_limiter
+            return rate_limiter
+
+    def _rate_limit_waited(self, exchange, user: str, limit: str,
+                           waited: float):
+        """
+        Report time spent waiting for the rate limit of the user.
+        """
+
+        add_phase_timing('rate_limit', waited)
+        if waited >= _RATE_LIMIT_NOTE_THRESHOLD:
+            self.request_log.log_note(
+                exchange,
+                f'waited {format_ms(waited)} for the {limit} of user {user}')
+
+    @contextlib.contextmanager
+    def _concurrency_slot(self, user: Optional[str], exchange,
+                          target: Optional[str]):
+        """
+        Hold a concurrency slot of the user while the context is entered, if the user's concurrency is limited.
+        """
+
+        rate_limiter = self._rate_limiter(user, target)
+        if rate_limiter is None:
+            yield
+            return
+
+        with rate_limiter.slot() as waited:
+            self._rate_limit_waited(exchange, user, 'concurrency limit',
+                                    waited)
+            yield
+
     def request(self,
                 method: str,
                 path: str,
@@ -92,7 +573,11 @@ class Session(object):
                 query: Optional[dict[str, Any]] = None,
                 headers: Optional[Mapping[str, Any]] = None,
                 cookies: Optional[dict[str, Any]] = None,
-                user: Optional[str] = None):
+                user: Optional[str] = None,
+                stream: Optional[Iterable[str]] = None,
+                cache: bool = True,
+                policy: Optional[RequestPolicy] = None,
+                target: Optional[str] = None):
         """
         Perform an HTTP request.
 
@@ -106,45 +591,164 @@ class Session(object):
         :param cookies: Cookies to send in the request.
         :param user: The requesting user. The available users are defined in the run profile.
                      Use `None` to send an unauthenticated request.
+        :param stream: Read the response body in streaming mode, without keeping it in memory. The given JSON
+                       expressions (such as `json.data.items[0].id`) are evaluated while the body is read, and are
+                       the only body values available in the response. See `StreamedResponseWrapper`.
+        :param cache: Serve the response from the response cache of the session, if enabled. Streamed responses are
+                      never cached.
+        :param policy: Hedging and retry policy of the request. Defaults to the request policy of the run profile.
+        :param target: Name of the target server to send the request to, from the `targets` of the run profile.
+                       Defaults to the `target_server` of the run profile.
         :return: Wrapped response object.
+        :raises ValueError: One of the `stream` expressions is not supported in streaming mode.
+        """
+
+        stream_paths = None
+        if stream is not None:
+            stream_paths = {
+                expression: parse_stream_expression(expression)
+                for expression in stream
+            }
+
+        timer = _RequestTimer()
+        span = self._start_request_span(method, path, user, target)
+        prepared_request = response = None
+        try:
+            prepared_request = self._prepare_request(method,
+                                                     path,
+                                                     json=json,
+                                                     path_params=path_params,
+                                                     query=query,
+                                                     headers=headers,
+                                                     cookies=cookies,
+                                                     user=user,
+                                                     target=target)
+            if not self.run_profile.connection_pool.keep_alive:
+                prepared_request.headers['Connection'] = 'close'
+            timer.mark('prepare')
+
+            exchange = self.request_log.log_request(method, prepared_request,
+                                                    json)
+            timer.mark('logging')
+
+            response = self._cached_response(
+                prepared_request, user, cache and stream_paths is None)
+            cached = response is not None
+            streamed = None
+            if not cached:
+                with self._concurrency_slot(user, exchange, target):
+                    response = self._send(method, path, user,
+                                          prepared_request, exchange, policy,
+                                          stream_paths is None, target)
+                    timer.mark('ttfb')
+
+                    if stream_paths is None:
+                        _ = response.content
+                        self._cache_response(prepared_request, user, response)
+                    else:
+                        streamed = read_streamed_json(
+                            response, stream_paths,
+                            self.request_log.max_body_bytes
+                            or DEFAULT_MAX_BODY_BYTES)
+                    timer.mark('download')
+
+            self.request_log.log_response(exchange, response, streamed)
+            timer.mark('logging')
+        except BaseException as e:
+            self._request_finished(
+                _make_record(method,
+                             path,
+                             user,
+                             prepared_request,
+                             response,
+                             timer,
+                             e,
+                             target=target), span)
+            raise
+
+        self._request_finished(
+            _make_record(method,
+                         path,
+                         user,
+                         prepared_request,
+                         response,
+                         timer,
+                         cached=cached,
+                         target=target), span)
+
+        if streamed is not None:
+            return StreamedResponseWrapper(response, streamed.values,
+                                           exchange)
+        return ResponseWrapper(response, exchange)
+
+    def _send(self, method: str, path: str, user: Optional[str],
+              prepared_request: requests.PreparedRequest, exchange,
+              policy: Optional[RequestPolicy],
+              hedge: bool,
+              target: Optional[str] = None) -> requests.Response:
         """
+        Send the request according to the request policy and the rate limit of the user.
 
-        prepared_request = self._prepare_request(method,
-                                                 path,
-                                                 json=json,
-                                                 path_params=path_params,
-                                                 query=query,
-                                                 headers=headers,
-                                                 cookies=cookies,
-                                                 user=user)
+        :param hedge: Allow hedging the request. The body of hedged requests is read before returning.
+        :param target: Name of the target server, for keeping the latencies of each target separately.
+        """
 
-        def _prettify(v):
-            if isinstance(v, CaseInsensitiveDict):
-                v = dict(v.items())  # Use `v.items()` to preserve case.
+        transport = self._get_transport()
+        rate_limiter = self._rate_limiter(user, target)
+
+        def send():
+            if rate_limiter is not None:
+                # Every attempt takes a token, including retries and hedged requests.
+                self._rate_limit_waited(exchange, user, 'rate limit',
+                                        rate_limiter.wait())
+            return transport.send(prepared_request, stream=True)
+
+        policy = policy or self.run_profile.request_policy
+        if policy.max_retries <= 0 and policy.hedge_after is None:
+            return send()
+
+        # Replayed responses have no latency, and recording hedged requests would record them twice.
+        read = None
+        if hedge and policy.hedge_after is not None and self.cassette is None:
+            read = _read_content
+
+        return self.policy_runner.send(
+            send,
+            method,
+            _policy_endpoint(method, path, target),
+            policy,
+            note=lambda note: self.request_log.log_note(exchange, note),
+            read=read)
+
+    def _cached_response(self, prepared_request: requests.PreparedRequest,
+                         user: Optional[str],
+                         use_cache: bool) -> Optional[requests.Response]:
+        """
+        Get the cached response of the request, if the response cache is enabled.
+        Requests with methods which are not cached invalidate the cached responses of their path instead.
+        """
 
-            indentation = ' ' * 6  # Match indentation of titles.
-            return indentation.join(
-                _json.dumps(v, indent=2).splitlines(keepends=True))
+        response_cache = self.response_cache
+        if response_cache is None:
+            return None
 
-        _log_and_print(logging.INFO, f'--> {method} {prepared_request.url}')
-        print(f'      headers: {_prettify(prepared_request.headers)}')
-        print(f'      json: {_prettify(json)}')
+        if prepared_request.method not in CACHED_METHODS:
+            response_cache.invalidate(prepared_request.url)
+            return None
 
-        with requests.Session() as session:
-            response = session.send(prepared_request)
+        return response_cache.get(prepared_request, user) if use_cache else None
 
-        _log_and_print(
-            logging.INFO,
-            f'<-- {response.status_code} {response.reason} from {method} {response.url}'
-        )
-        print(f'      headers: {_prettify(response.headers)}')
-        try:
-            body = _prettify(response.json())
-        except ValueError:
-            body = response.text
-        print(f'      body: {body}')
+    def _cache_response(self, prepared_request: requests.PreparedRequest,
+                        user: Optional[str], response: requests.Response):
+        response_cache = self.response_cache
+        if response_cache is None:
+            return
 
-        return ResponseWrapper(response)
+        if prepared_request.method in CACHED_METHODS:
+            response_cache.put(prepared_request, user, response)
+        else:
+            # Invalidate again, in case a concurrent request cached a response while this request was sent.
+            response_cache.invalidate(prepared_request.url)
 
     def _prepare_request(self,
                          method: str,
@@ -155,17 +759,31 @@ class Session(object):
                          query: Optional[dict[str, Any]] = None,
                          headers: Optional[Mapping[str, Any]] = None,
                          cookies: Optional[dict[str, Any]] = None,
-                         user: Optional[str] = None):
-        path = resolve_path_params(path, path_params or {})
-        # Strip "/" at the start of the path to avoid "//" replacing the host part.
-        url = urllib.parse.urljoin(self.run_profile.target_server,
-                                   path.lstrip('/'))
-        headers = headers or dict()
+                         user: Optional[str] = None,
+                         target: Optional[str] = None):
+        url = compile_path_template(path).url(self._target_server(target),
+                                              path_params or {})
+        # Copied, so headers added to the request are not kept in a dict the test reuses.
+        headers = dict(headers or {})
         headers["X-Seekret-Test"] = "1"
+
+        # Propagate the span of the request, so the spans of the target server join the trace of the test.
+        span = current_span()
+        if span is not None and not any(
+                name.lower() == 'traceparent' for name in headers):
+            headers['traceparent'] = span.traceparent
+
+        # Encode the JSON body using the JSON codec, rather than letting `requests` encode it.
+        data = None
+        if json is not None:
+            data = get_codec().dumps(json)
+            if not any(name.lower() == 'content-type' for name in headers):
+                headers['Content-Type'] = 'application/json'
+
         return requests.Request(method=method,
                                 url=url,
                                 headers=headers,
-                                json=json,
+                                data=data,
                                 params=query,
                                 cookies=cookies,
                                 auth=user
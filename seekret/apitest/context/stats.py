@@ -0,0 +1,99 @@
+import math
+import threading
+from collections.abc import Sequence
+
+
+class LatencySamples(object):
+    """
+    Thread-safe collection of latency samples, in seconds.
+    """
+    def __init__(self):
+        self._samples: list[float] = []
+        self._sorted = True
+        self._lock = threading.Lock()
+
+    def add(self, value: float):
+        with self._lock:
+            if self._samples and value < self._samples[-1]:
+                self._sorted = False
+            self._samples.append(value)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def samples(self) -> list[float]:
+        """
+        Get a copy of the samples, in the order they were added.
+        """
+
+        with self._lock:
+            return list(self._samples)
+
+    def percentile(self, percent: float) -> float:
+        """
+        Get the given percentile of the samples, using the nearest-rank method.
+
+        :param percent: Requested percentile, between 0 and 100.
+        :return: The percentile value, or 0 when there are no samples.
+        """
+
+        with self._lock:
+            if not self._samples:
+                return 0.0
+
+            ordered = self._samples if self._sorted else sorted(self._samples)
+            rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+            return ordered[rank - 1]
+
+    def max(self) -> float:
+        with self._lock:
+            return max(self._samples, default=0.0)
+
+
+def format_ms(seconds: float) -> str:
+    return f'{seconds * 1000:.1f}ms'
+
+
+def format_bytes(value: float) -> str:
+    for unit in ('B', 'KiB', 'MiB'):
+        if abs(value) < 1024:
+            return f'{value:.1f}{unit}' if unit != 'B' else f'{value:.0f}B'
+        value /= 1024
+    return f'{value:.1f}GiB'
+
+
+def linear_slope(xs: Sequence[float], ys: Sequence[float]) -> float:
+    """
+    Get the slope of the least-squares line through the given points.
+
+    :return: The slope, or 0 when there are less than two distinct x values.
+    """
+
+    if len(xs) < 2:
+        return 0.0
+
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+    variance = sum((x - mean_x)**2 for x in xs)
+    if not variance:
+        return 0.0
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / variance
+
+
+def render_table(headers: Sequence[str], rows: Sequence[Sequence[str]]) -> str:
+    """
+    Render the given rows as a text table with aligned columns.
+    The first column is aligned to the left, and the other columns are aligned to the right.
+    """
+
+    widths = [
+        max(len(str(row[i])) for row in [headers, *rows])
+        for i in range(len(headers))
+    ]
+
+    def render_row(row):
+        return '  '.join(
+            str(cell).ljust(width) if i == 0 else str(cell).rjust(width)
+            for i, (cell, width) in enumerate(zip(row, widths)))
+
+    return '\n'.join(render_row(row) for row in [headers, *rows])
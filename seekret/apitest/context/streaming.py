@@ -0,0 +1,429 @@
+"""
+Incremental search of JSON response bodies, for responses too large to be kept in memory.
+"""
+import codecs
+import json
+import re
+from collections.abc import Iterable, Mapping
+from typing import Any, Optional, Union
+
+import requests
+
+# Size of the chunks read from streamed response bodies.
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Path into a JSON value: object keys and array indices.
+JsonPath = tuple[Union[str, int], ...]
+
+_STREAM_EXPRESSION_PATTERN = re.compile(
+    r'^json(?P<path>(?:\.[A-Za-z_][A-Za-z0-9_]*|\."(?:[^"\\]|\\.)*"|\[[0-9]+\])*)$'
+)
+_PATH_ELEMENT_PATTERN = re.compile(
+    r'\.(?P<key>[A-Za-z_][A-Za-z0-9_]*)|\.(?P<quoted_key>"(?:[^"\\]|\\.)*")|\[(?P<index>[0-9]+)\]'
+)
+
+_WHITESPACE_PATTERN = re.compile(r'[ \t\n\r]*')
+# Characters and complete escapes of a string, up to its closing quote or to a backslash ending the chunk.
+_STRING_CONTENT_PATTERN = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*', re.DOTALL)
+_SCALAR_PATTERN = re.compile(r'-?[0-9][0-9.eE+-]*|true|false|null')
+_STRUCTURAL_PATTERN = re.compile(r'["\[\]{}]')
+_LITERALS = ('true', 'false', 'null')
+
+# Longest escaped form of a single character in a JSON string, a surrogate pair of \u escapes.
+_MAX_ESCAPED_CHAR_LENGTH = 12
+
+
+def parse_stream_expression(expression: str) -> JsonPath:
+    """
+    Parse a search expression supported in streaming mode: "json" followed by keys and non-negative array indices.
+
+    >>> parse_stream_expression('json.data.items[0]."item-id"')  # ('data', 'items', 0, 'item-id')
+
+    :raises ValueError: The expression is not supported in streaming mode.
+    """
+
+    match = _STREAM_EXPRESSION_PATTERN.match(expression)
+    if not match:
+        raise ValueError(
+            f'expression {expression} is not supported in streaming mode, only "json" followed by keys and '
+            f'non-negative array indices is supported (for example json.data.items[0].id)'
+        )
+
+    path = []
+    for element in _PATH_ELEMENT_PATTERN.finditer(match.group('path')):
+        if element.group('key') is not None:
+            path.append(element.group('key'))
+        elif element.group('quoted_key') is not None:
+            path.append(json.loads(element.group('quoted_key')))
+        else:
+            path.append(int(element.group('index')))
+
+    return tuple(path)
+
+
+class _Frame(object):
+    """
+    JSON container being parsed, on the path to a searched value.
+    """
+    def __init__(self, kind: str, key: Union[str, int, None], state: str):
+        self.kind = kind
+        self.key = key
+        self.state = state
+
+
+class StreamingJsonSearch(object):
+    """
+    Incremental JSON parser extracting the values at the given paths, without keeping the whole document in memory.
+
+    Only the containers on the way to the searched paths are parsed. Other values are skipped by scanning for
+    brackets and strings, and the parsing stops once all the paths were found. Strings split between chunks are
+    scanned from where the previous chunk ended. The memory used is bounded by the size of the fed chunks and of the
+    found values.
+    """
+    def __init__(self, paths: Iterable[JsonPath]):
+        self.results: dict[JsonPath, Any] = {}
+
+        self._targets = set(paths)
+        self._prefixes = {
+            path[:i]
+            for path in self._targets for i in range(len(path))
+        }
+
+        self._buffer = ''
+        self._pos = 0
+        # Number of characters dropped from the start of the buffer.
+        self._dropped = 0
+        self._stack = [_Frame('root', None, 'value')]
+
+        # Depth of the container being skipped, or 0 if not skipping.
+        self._skip_depth = 0
+        # Whether the position is inside a string, after its opening quote.
+        self._in_string = False
+        # Start position of the object key being read, or `None` if not reading a key or the key is dropped.
+        self._key_start: Optional[int] = None
+        # Keys whose escaped form is longer than this can't be a searched key, and are dropped while read.
+        self._max_key_length = _MAX_ESCAPED_CHAR_LENGTH * max(
+            (len(key) for path in self._targets for key in path if isinstance(key, str)), default=0)
+        # Start position and path of the container being captured as a searched value.
+        self._capture_start: Optional[int] = None
+        self._capture_path: Optional[JsonPath] = None
+
+        self.done = not self._targets
+
+    def feed(self, data: str):
+        """
+        Parse the next chunk of the document.
+
+        :raises ValueError: The document is not valid JSON.
+        """
+
+        if self.done:
+            return
+
+        self._buffer += data
+        self._parse(final=False)
+
+        # Drop the parsed data, except for the value being captured and the object key being read.
+        keep = min(start for start in (self._pos, self._capture_start, self._key_start) if start is not None)
+        self._buffer = self._buffer[keep:]
+        self._pos -= keep
+        self._dropped += keep
+        if self._capture_start is not None:
+            self._capture_start -= keep
+        if self._key_start is not None:
+            self._key_start -= keep
+
+    def close(self):
+        """
+        Parse the rest of the document.
+
+        :raises ValueError: The document is not valid JSON.
+        """
+
+        if not self.done:
+            self._parse(final=True)
+        if not self.done:
+            raise ValueError('unexpected end of JSON document')
+
+    def _error(self, message: str) -> ValueError:
+        return ValueError(f'{message} at offset {self._dropped + self._pos}')
+
+    def _path(self) -> JsonPath:
+        return tuple(frame.key for frame in self._stack[1:])
+
+    def _parse(self, final: bool):
+        while not self.done:
+            if self._skip_depth:
+                if not self._skip_container(final):
+                    return
+                self._value_finished()
+                continue
+
+            if self._in_string:
+                if not self._skip_string(final):
+                    # Positions after the opening quote of the key.
+                    if self._key_start is not None and self._pos - self._key_start - 1 > self._max_key_length:
+                        self._key_start = None
+                    return
+                self._string_finished()
+                continue
+
+            self._pos = _WHITESPACE_PATTERN.match(self._buffer,
+                                                  self._pos).end()
+            if self._pos >= len(self._buffer):
+                return
+
+            frame = self._stack[-1]
+            char = self._buffer[self._pos]
+
+            if frame.state == 'value':
+                if not self._start_value(final):
+                    return
+            elif frame.state == 'key_or_end':
+                if char == '}':
+                    self._end_container()
+                    continue
+                if char != '"':
+                    raise self._error('expected object key')
+                self._key_start = self._pos
+                self._in_string = True
+                self._pos += 1
+            elif frame.state == 'colon':
+                if char != ':':
+                    raise self._error('expected ":"')
+                frame.state = 'value'
+                self._pos += 1
+            elif frame.state == 'value_or_end':
+                if char == ']':
+                    self._end_container()
+                else:
+                    frame.state = 'value'
+            elif frame.state == 'comma_or_end':
+                if char == ',':
+                    self._pos += 1
+                    if frame.kind == 'object':
+                        frame.state = 'key_or_end'
+                    else:
+                        frame.key += 1
+                        frame.state = 'value'
+                elif char == ('}' if frame.kind == 'object' else ']'):
+                    self._end_container()
+                else:
+                    raise self._error(f'unexpected character {char!r}')
+            else:
+                raise self._error('unexpected data')
+
+    def _start_value(self, final: bool) -> bool:
+        path = self._path()
+        char = self._buffer[self._pos]
+
+        if char in '{[':
+            if path in self._targets:
+                self._capture_start = self._pos
+                self._capture_path = path
+                self._skip_depth = 1
+            elif path in self._prefixes:
+                self._stack[-1].state = 'comma_or_end'
+                if char == '{':
+                    self._stack.append(_Frame('object', None, 'key_or_end'))
+                else:
+                    self._stack.append(_Frame('array', 0, 'value_or_end'))
+            else:
+                self._skip_depth = 1
+            self._pos += 1
+            return True
+
+        if char == '"':
+            # Searched strings are captured, other strings are skipped.
+            if path in self._targets:
+                self._capture_start = self._pos
+                self._capture_path = path
+            self._in_string = True
+            self._pos += 1
+            return True
+
+        match = _SCALAR_PATTERN.match(self._buffer, self._pos)
+        if match is None:
+            # Wait for more data if the chunk ends inside a literal or before the digits of a number.
+            rest = self._buffer[self._pos:self._pos + 5]
+            if not final and self._pos + len(rest) == len(self._buffer) and (
+                    rest == '-' or any(literal.startswith(rest) for literal in _LITERALS)):
+                return False
+            raise self._error('expected value')
+
+        # Wait for more data if the number may continue in the next chunk.
+        if match.end() == len(self._buffer) and not final:
+            return False
+
+        if path in self._targets:
+            self._found(path, json.loads(match.group()))
+        self._pos = match.end()
+        self._value_finished()
+        return True
+
+    def _skip_container(self, final: bool) -> bool:
+        """
+        Skip to the end of the current container.
+
+        :return: Whether the end of the container was reached.
+        """
+
+        while True:
+            if self._in_string:
+                if not self._skip_string(final):
+                    return False
+                continue
+
+            match = _STRUCTURAL_PATTERN.search(self._buffer, self._pos)
+            if match is None:
+                self._pos = len(self._buffer)
+                return False
+
+            char = match.group()
+            if char == '"':
+                self._in_string = True
+                self._pos = match.end()
+                continue
+
+            self._skip_depth += 1 if char in '[{' else -1
+            self._pos = match.end()
+            if not self._skip_depth:
+                return True
+
+    def _skip_string(self, final: bool) -> bool:
+        """
+        Skip to the end of the current string.
+
+        :return: Whether the end of the string was reached. Otherwise, the string is scanned from the current position
+                 once more data arrives.
+        """
+
+        end = _STRING_CONTENT_PATTERN.match(self._buffer, self._pos).end()
+        if end < len(self._buffer) and self._buffer[end] == '"':
+            self._pos = end + 1
+            self._in_string = False
+            return True
+
+        # A backslash ending the chunk is kept, since the character it escapes is in the next chunk.
+        self._pos = end
+        if final:
+            raise self._error('unterminated string')
+        return False
+
+    def _string_finished(self):
+        frame = self._stack[-1]
+        if frame.state != 'key_or_end':
+            self._value_finished()
+            return
+
+        # Dropped keys are kept as `None`, which matches no path.
+        if self._key_start is not None:
+            frame.key = json.loads(self._buffer[self._key_start:self._pos])
+        else:
+            frame.key = None
+        self._key_start = None
+        frame.state = 'colon'
+
+    def _end_container(self):
+        self._pos += 1
+        self._stack.pop()
+        self._value_finished()
+
+    def _value_finished(self):
+        if self._capture_start is not None:
+            self._found(
+                self._capture_path,
+                json.loads(self._buffer[self._capture_start:self._pos]))
+            self._capture_start = self._capture_path = None
+
+        frame = self._stack[-1]
+        if frame.kind == 'root':
+            frame.state = 'done'
+            self.done = True
+        else:
+            frame.state = 'comma_or_end'
+
+    def _found(self, path: JsonPath, value: Any):
+        # Searched paths inside a captured value are taken from the captured value.
+        for target in self._targets:
+            if target[:len(path)] == path:
+                self.results[target] = _lookup(value, target[len(path):])
+
+        if len(self.results) == len(self._targets):
+            self.done = True
+
+
+def _lookup(value: Any, path: JsonPath) -> Any:
+    for key in path:
+        if isinstance(key, int) and isinstance(value, list):
+            value = value[key] if key < len(value) else None
+        elif isinstance(key, str) and isinstance(value, dict):
+            value = value.get(key)
+        else:
+            return None
+
+    return value
+
+
+class StreamedBody(object):
+    """
+    Summary of a response body read in streaming mode.
+    """
+    def __init__(self, values: Optional[dict[str, Any]], preview: bytes,
+                 size: int):
+        # Values of the searched expressions, or `None` if the body is not valid JSON.
+        self.values = values
+
+        # First bytes of the body, kept for the request log.
+        self.preview = preview
+
+        # Total size of the body in bytes.
+        self.size = size
+
+
+def read_streamed_json(response: requests.Response,
+                       expressions: Mapping[str, JsonPath],
+                       preview_bytes: int) -> StreamedBody:
+    """
+    Read the body of a streamed response chunk by chunk, extracting the values of the given expressions.
+
+    The whole body is read even after all the values were found, so the connection can be reused.
+
+    :param response: Response sent with `stream=True`, whose body was not read yet.
+    :param expressions: Dictionary mapping expressions to their parsed paths.
+    :param preview_bytes: Number of bytes to keep from the start of the body.
+    """
+
+    search = StreamingJsonSearch(expressions.values())
+    decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')(
+        errors='replace')
+
+    preview = bytearray()
+    size = 0
+    valid = True
+    for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+        if len(preview) < preview_bytes:
+            preview += chunk[:preview_bytes - len(preview)]
+        size += len(chunk)
+
+        if valid and not search.done:
+            try:
+                search.feed(decoder.decode(chunk))
+            except ValueError:
+                valid = False
+
+    if valid:
+        try:
+            search.feed(decoder.decode(b'', final=True))
+            search.close()
+        except ValueError:
+            valid = False
+
+    values = None
+    if valid:
+        values = {
+            expression: search.results.get(path)
+            for expression, path in expressions.items()
+        }
+
+    return StreamedBody(values, bytes(preview), size)
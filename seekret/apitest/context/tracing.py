@@ -0,0 +1,344 @@
+"""
+Tracing spans of the tests, their stages and their requests, for connecting slow stages to the traces of the target
+server.
+
+Each test is the root span of a trace, with a span for each of its stages, and a span for each request of a stage. The
+requests carry the W3C `traceparent` header of their span, so the spans the target server creates for them join the
+trace. Finished spans are exported in batches by a background thread, so exporting never blocks the tests.
+"""
+import abc
+import contextlib
+import contextvars
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections.abc import Iterable, Iterator
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Span kinds, as numbered by OTLP.
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_CLIENT = 3
+
+# Span status codes, as numbered by OTLP.
+STATUS_UNSET = 0
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+# Name of the instrumentation scope and default service name of the exported spans.
+SCOPE_NAME = 'seekret.apitest'
+
+# Marks the end of the spans in the queue.
+_STOP = object()
+
+
+class Span(object):
+    """
+    Timed operation of a test, with the IDs identifying it in its trace.
+    """
+    def __init__(self,
+                 name: str,
+                 kind: int = SPAN_KIND_INTERNAL,
+                 parent: Optional['Span'] = None,
+                 attributes: Optional[dict[str, Any]] = None):
+        """
+        :param name: Name of the span.
+        :param kind: Kind of the span, `SPAN_KIND_INTERNAL` or `SPAN_KIND_CLIENT`.
+        :param parent: Parent span. A span without a parent starts a new trace.
+        :param attributes: Attributes of the span. Attributes with `None` values are not exported.
+        """
+
+        self.name = name
+        self.kind = kind
+        self.trace_id = parent.trace_id if parent is not None else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_span_id = parent.span_id if parent is not None else None
+        self.attributes: dict[str, Any] = dict(attributes or {})
+
+        self.start_time_ns = time.time_ns()
+        self.end_time_ns: Optional[int] = None
+        self.status = STATUS_UNSET
+        self.status_message: Optional[str] = None
+
+        self._token: Optional[contextvars.Token] = None
+
+    @property
+    def traceparent(self) -> str:
+        """
+        Value of the W3C `traceparent` header propagating the span to the target server.
+        """
+
+        return f'00-{self.trace_id}-{self.span_id}-01'
+
+    @property
+    def duration(self) -> Optional[float]:
+        """
+        Duration of the span in seconds, or `None` if the span didn't end.
+        """
+
+        if self.end_time_ns is None:
+            return None
+        return (self.end_time_ns - self.start_time_ns) / 1e9
+
+    def set_status(self, status: int, message: Optional[str] = None):
+        """
+        :param status: `STATUS_OK` or `STATUS_ERROR`.
+        :param message: Description of the error.
+        """
+
+        self.status = status
+        self.status_message = message
+
+    def set_error(self, error: BaseException):
+        self.set_status(STATUS_ERROR, repr(error))
+
+    def to_otlp(self) -> dict[str, Any]:
+        """
+        Format the span as an OTLP/JSON span.
+        """
+
+        otlp: dict[str, Any] = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': self.kind,
+            'startTimeUnixNano': str(self.start_time_ns),
+            'endTimeUnixNano': str(self.end_time_ns or self.start_time_ns),
+            'attributes': _otlp_attributes(self.attributes),
+            'status': {'code': self.status},
+        }
+        if self.parent_span_id is not None:
+            otlp['parentSpanId'] = self.parent_span_id
+        if self.status_message is not None:
+            otlp['status']['message'] = self.status_message
+        return otlp
+
+
+def _otlp_value(value: Any) -> dict[str, Any]:
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def _otlp_attributes(attributes: dict[str, Any]) -> list[dict[str, Any]]:
+    return [{
+        'key': key,
+        'value': _otlp_value(value)
+    } for key, value in attributes.items() if value is not None]
+
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar(
+    'seekret_current_span', default=None)
+
+
+def current_span() -> Optional[Span]:
+    """
+    :return: The span entered in the current thread or task, if any.
+    """
+
+    return _current_span.get()
+
+
+class SpanExporter(abc.ABC):
+    """
+    Interface of span exporters. Exporters are called from the background thread of the tracer only, one batch at a
+    time.
+    """
+    @abc.abstractmethod
+    def export(self, spans: list[Span]):
+        """
+        Export a batch of finished spans.
+        """
+
+    def shutdown(self):
+        """
+        Called after the last batch was exported.
+        """
+
+
+class OtlpJsonFileExporter(SpanExporter):
+    """
+    Exports spans to a file in the OTLP/JSON file format: every batch is written as a line holding an OTLP
+    `ExportTraceServiceRequest`, which OpenTelemetry collectors can import.
+    """
+    def __init__(self, path: str, service_name: str = SCOPE_NAME):
+        """
+        :param path: Path of the file. Spans are appended to an existing file.
+        :param service_name: Value of the `service.name` resource attribute of the spans.
+        """
+
+        self.path = path
+        self.service_name = service_name
+        self._file = None
+
+    def export(self, spans: list[Span]):
+        request = {
+            'resourceSpans': [{
+                'resource': {
+                    'attributes':
+                    _otlp_attributes({'service.name': self.service_name})
+                },
+                'scopeSpans': [{
+                    'scope': {
+                        'name': SCOPE_NAME
+                    },
+                    'spans': [span.to_otlp() for span in spans],
+                }],
+            }]
+        }
+
+        if self._file is None:
+            self._file = open(self.path, 'a')
+        self._file.write(json.dumps(request, separators=(',', ':')) + '\n')
+        self._file.flush()
+
+    def shutdown(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class Tracer(object):
+    """
+    Creates the spans of a session, and exports the finished spans to the exporters in batches from a background
+    thread.
+
+    Ending a span only queues it, and never waits for the exporters. If the exporters fall behind, spans are dropped,
+    and counted by `dropped`.
+    """
+    def __init__(self,
+                 exporters: Iterable[SpanExporter],
+                 queue_size: int = 10000,
+                 batch_size: int = 512,
+                 flush_interval: float = 1.0):
+        """
+        :param exporters: Exporters to export the finished spans to.
+        :param queue_size: Maximum number of finished spans waiting to be exported.
+        :param batch_size: Maximum number of spans exported at once.
+        :param flush_interval: Maximum time a span waits before being exported, in seconds.
+        """
+
+        self.exporters = tuple(exporters)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        # Number of spans dropped since the tracer was started.
+        self.dropped = 0
+
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._run,
+                                        name='seekret-span-exporter',
+                                        daemon=True)
+        self._thread.start()
+
+    def start_span(self,
+                   name: str,
+                   kind: int = SPAN_KIND_INTERNAL,
+                   attributes: Optional[dict[str, Any]] = None) -> Span:
+        """
+        Start a span, child of the current span, and make it the current span until it ends.
+        """
+
+        span = Span(name, kind, current_span(), attributes)
+        span._token = _current_span.set(span)
+        return span
+
+    def end_span(self, span: Span, error: Optional[BaseException] = None):
+        """
+        End the span, restore the current span from before it started, and queue the span for exporting.
+
+        :param error: Exception which ended the span, if any.
+        """
+
+        span.end_time_ns = time.time_ns()
+        if error is not None:
+            span.set_error(error)
+
+        if span._token is not None:
+            try:
+                _current_span.reset(span._token)
+            except ValueError:
+                # Ended in a different context than it started in, such as another task.
+                pass
+            span._token = None
+
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    @contextlib.contextmanager
+    def span(self,
+             name: str,
+             kind: int = SPAN_KIND_INTERNAL,
+             attributes: Optional[dict[str, Any]] = None) -> Iterator[Span]:
+        """
+        Context manager of a span, ended with the exception raised in the context, if any.
+        """
+
+        span = self.start_span(name, kind, attributes)
+        try:
+            yield span
+        except BaseException as e:
+            self.end_span(span, e)
+            raise
+        self.end_span(span)
+
+    def shutdown(self):
+        """
+        Export the queued spans, stop the exporter thread, and shut the exporters down.
+        """
+
+        if not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join()
+
+        if self.dropped:
+            logger.warning(f'{self.dropped} tracing spans were dropped since the exporters fell behind')
+
+    def _run(self):
+        try:
+            stopped = False
+            while not stopped:
+                try:
+                    item = self._queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    continue
+
+                batch = []
+                while True:
+                    if item is _STOP:
+                        stopped = True
+                        break
+                    batch.append(item)
+                    if len(batch) >= self.batch_size:
+                        break
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+
+                if batch:
+                    self._export(batch)
+        finally:
+            for exporter in self.exporters:
+                try:
+                    exporter.shutdown()
+                except Exception:
+                    logger.exception(f'failed shutting down span exporter {exporter!r}')
+
+    def _export(self, batch: list[Span]):
+        for exporter in self.exporters:
+            try:
+                exporter.export(batch)
+            except Exception:
+                logger.exception(f'failed exporting spans to {exporter!r}')
@@ -0,0 +1,363 @@
+import contextvars
+import functools
+import ssl
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import DefaultCookiePolicy
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import HTTPError
+from urllib3.util.ssl_ import resolve_cert_reqs
+
+from seekret.apitest.context.cassette import Cassette, CASSETTE_MODE_REPLAY
+from seekret.apitest.runprofile import ConnectionPool
+
+# Time spent in request phases that are not visible from the outside of `requests`. A context variable rather than a
+# thread-local, so the concurrent requests of the asyncio tasks sharing a thread are timed separately.
+_phase_timings: contextvars.ContextVar[Optional[dict[str, float]]] = contextvars.ContextVar('seekret_phase_timings',
+                                                                                           default=None)
+
+
+def reset_phase_timings():
+    """
+    Reset the phase timings of the current thread or asyncio task.
+    """
+
+    _phase_timings.set({})
+
+
+def add_phase_timing(phase: str, seconds: float):
+    """
+    Add time spent in the given phase by the current thread or asyncio task.
+    """
+
+    values = _phase_timings.get()
+    if values is not None:
+        values[phase] = values.get(phase, 0.0) + seconds
+
+
+def get_phase_timing(phase: str) -> float:
+    """
+    Get the time spent in the given phase by the current thread or asyncio task since the last reset.
+    """
+
+    values = _phase_timings.get()
+    return 0.0 if values is None else values.get(phase, 0.0)
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            add_phase_timing('connect', time.perf_counter() - start)
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            add_phase_timing('connect', time.perf_counter() - start)
+
+    def close(self):
+        if isinstance(self.ssl_context, _ResumingSSLContext) and self.sock is not None:
+            # TLS 1.3 session tickets arrive after the handshake, so the session is taken again when closing.
+            self.ssl_context.remember(self.sock)
+        super().close()
+
+
+class _ResumingSSLContext(ssl.SSLContext):
+    """
+    TLS context resuming the TLS session of an earlier connection to the same host when opening a new connection, so
+    the new connection skips the full handshake.
+
+    The session of a connection is available once the server sends its session ticket, which for TLS 1.3 is after the
+    handshake. Sessions are taken from the open connections of the context when opening a new connection, and from
+    each connection when it's closed.
+    """
+    def __init__(self, protocol: int = ssl.PROTOCOL_TLS_CLIENT):
+        super().__init__()
+
+        # Number of handshakes, and of handshakes which resumed an earlier session.
+        self.handshakes = 0
+        self.resumed = 0
+
+        self._sessions: dict[Optional[str], ssl.SSLSession] = {}
+        self._sockets: dict[Optional[str], weakref.WeakSet] = {}
+        self._lock = threading.Lock()
+
+    def wrap_socket(self, sock, *args, server_hostname=None, session=None, **kwargs):
+        if session is None:
+            session = self._session_for(server_hostname)
+
+        ssl_sock = super().wrap_socket(sock,
+                                       *args,
+                                       server_hostname=server_hostname,
+                                       session=session,
+                                       **kwargs)
+
+        with self._lock:
+            self.handshakes += 1
+            self.resumed += ssl_sock.session_reused
+            self._sockets.setdefault(server_hostname, weakref.WeakSet()).add(ssl_sock)
+        return ssl_sock
+
+    def remember(self, ssl_sock: ssl.SSLSocket):
+        """
+        Keep the TLS session of the connection, if the server issued a ticket for it.
+        """
+
+        session = _resumable_session(ssl_sock)
+        if session is not None:
+            with self._lock:
+                self._sessions[ssl_sock.server_hostname] = session
+
+    def _session_for(self, server_hostname: Optional[str]) -> Optional[ssl.SSLSession]:
+        with self._lock:
+            sockets = list(self._sockets.get(server_hostname, ()))
+            session = self._sessions.get(server_hostname)
+
+        for ssl_sock in sockets:
+            session = _resumable_session(ssl_sock) or session
+
+        if session is not None and session.time + session.timeout <= time.time():
+            return None
+        return session
+
+
+def _resumable_session(ssl_sock: ssl.SSLSocket) -> Optional[ssl.SSLSession]:
+    try:
+        session = ssl_sock.session
+    except (AttributeError, OSError, ValueError):
+        # Connections tunneled through TLS proxies have no session.
+        return None
+    if session is None or not session.has_ticket:
+        return None
+    return session
+
+
+class _TlsSessions(object):
+    """
+    TLS contexts of the HTTPS connection pools of a transport, one for each host and TLS configuration.
+
+    Without a context of its own, `urllib3` creates a new TLS context for every connection, and TLS sessions can only
+    be resumed by connections of the same context.
+    """
+    def __init__(self):
+        self._contexts: dict[tuple, _ResumingSSLContext] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def handshakes(self) -> int:
+        return sum(context.handshakes for context in self._contexts.values())
+
+    @property
+    def resumed(self) -> int:
+        return sum(context.resumed for context in self._contexts.values())
+
+    def context(self, pool: HTTPSConnectionPool) -> _ResumingSSLContext:
+        # The TLS configuration of a pool may be changed by `requests` between requests.
+        key = (pool.host, pool.port, pool.cert_reqs, pool.ca_certs,
+               pool.ca_cert_dir, pool.cert_file, pool.key_file,
+               _tls_versions(pool))
+        with self._lock:
+            context = self._contexts.get(key)
+            if context is None:
+                context = self._contexts[key] = _create_resuming_context(pool)
+            return context
+
+
+def _tls_versions(pool: HTTPSConnectionPool) -> tuple:
+    # The TLS version range of pools, available since urllib3 2.
+    return (getattr(pool, 'ssl_minimum_version', None),
+            getattr(pool, 'ssl_maximum_version', None))
+
+
+def _create_resuming_context(pool: HTTPSConnectionPool) -> _ResumingSSLContext:
+    """
+    Create a TLS context configured as `urllib3` configures the TLS contexts it creates, except that session tickets
+    are requested from TLS 1.2 servers too.
+    """
+
+    minimum_version, maximum_version = _tls_versions(pool)
+    context = _ResumingSSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    context.minimum_version = minimum_version or ssl.TLSVersion.TLSv1_2
+    if maximum_version is not None:
+        context.maximum_version = maximum_version
+    context.options |= ssl.OP_NO_COMPRESSION
+    if getattr(context, 'post_handshake_auth', None) is not None:
+        context.post_handshake_auth = True
+
+    cert_reqs = resolve_cert_reqs(pool.cert_reqs)
+    if cert_reqs == ssl.CERT_REQUIRED:
+        context.verify_mode = cert_reqs
+        context.check_hostname = True
+    else:
+        context.check_hostname = False
+        context.verify_mode = cert_reqs
+    context.hostname_checks_common_name = False
+
+    # `urllib3` loads the given CA certificates on every connection, and the default ones only into its own contexts.
+    if not (pool.ca_certs or pool.ca_cert_dir):
+        context.load_default_certs()
+
+    return context
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+    def __init__(self, *args, tls_sessions: Optional[_TlsSessions] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.tls_sessions = tls_sessions
+
+    def _new_conn(self):
+        conn = super()._new_conn()
+        # Connections given a TLS context or a fixed TLS version by the caller are left as is.
+        if (self.tls_sessions is not None and conn.ssl_context is None
+                and self.ssl_version is None):
+            conn.ssl_context = self.tls_sessions.context(self)
+        return conn
+
+
+class _TimedHTTPAdapter(HTTPAdapter):
+    """
+    HTTP adapter measuring the time spent opening new connections (including the TLS handshake), and resuming TLS
+    sessions when opening new connections to a host.
+    """
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.tls_sessions = _TlsSessions()
+        self.poolmanager.pool_classes_by_scheme = {
+            'http':
+            _TimedHTTPConnectionPool,
+            'https':
+            functools.partial(_TimedHTTPSConnectionPool,
+                              tls_sessions=self.tls_sessions),
+        }
+
+
+class _CassetteHTTPAdapter(_TimedHTTPAdapter):
+    """
+    HTTP adapter recording the responses to a cassette, or serving them from the cassette without any network access.
+    """
+    def __init__(self, cassette: Cassette, **kwargs):
+        super().__init__(**kwargs)
+        self.cassette = cassette
+
+    def send(self, request: requests.PreparedRequest, *args, **kwargs):
+        if self.cassette.mode == CASSETTE_MODE_REPLAY:
+            response = self.cassette.replay(request)
+            response.connection = self
+            return response
+
+        response = super().send(request, *args, **kwargs)
+        self.cassette.record(request, response)
+        return response
+
+
+def create_transport(config: ConnectionPool,
+                     cassette: Optional[Cassette] = None) -> requests.Session:
+    """
+    Create a long-lived HTTP transport with a connection pool configured according to the given configuration.
+
+    The transport only sends prepared requests, and never stores cookies from responses, so requests
+    sent through it behave the same as requests sent through a fresh `requests.Session`.
+
+    :param config: Connection pool configuration from the run profile.
+    :param cassette: Cassette to record the responses to, or to replay them from.
+    :return: Session object to send prepared requests with.
+    """
+
+    transport = requests.Session()
+
+    # Block all cookies, so cookies set by one response are not sent in following requests.
+    transport.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+
+    if cassette is None:
+        adapter = _TimedHTTPAdapter(
+            pool_connections=config.pool_size,
+            pool_maxsize=config.max_connections_per_host)
+    else:
+        adapter = _CassetteHTTPAdapter(
+            cassette,
+            pool_connections=config.pool_size,
+            pool_maxsize=config.max_connections_per_host)
+    transport.mount('http://', adapter)
+    transport.mount('https://', adapter)
+
+    return transport
+
+
+def open_connections(transport: requests.Session, url: str, count: int) -> int:
+    """
+    Open connections to the host of the URL in the connection pool of the transport, including their TLS handshake,
+    so the following requests to the host reuse them.
+
+    The connections are opened concurrently. Connections already open in the pool are counted, and are not opened
+    again.
+
+    :param transport: Transport created by `create_transport`.
+    :param url: URL of the host to connect to.
+    :param count: Number of connections to open, up to the maximum number of connections per host of the pool.
+    :return: Number of connections newly opened.
+    :raises requests.ConnectionError: A connection failed.
+    """
+
+    request = requests.Request('GET', url).prepare()
+    adapter = transport.get_adapter(url)
+    proxies = transport.rebuild_proxies(request, transport.proxies)
+    if hasattr(adapter, 'get_connection_with_tls_context'):
+        pool = adapter.get_connection_with_tls_context(request,
+                                                       transport.verify,
+                                                       proxies,
+                                                       transport.cert)
+    else:
+        pool = adapter.get_connection(url, proxies)
+    # Configure the pool as `send` does, before opening its connections.
+    adapter.cert_verify(pool, url, transport.verify, transport.cert)
+
+    connections = []
+    try:
+        for _ in range(min(count, adapter._pool_maxsize)):
+            connections.append(pool._get_conn())
+
+        closed = [conn for conn in connections if conn.sock is None]
+        if closed:
+            with ThreadPoolExecutor(max_workers=len(closed),
+                                    thread_name_prefix='seekret-connect') as executor:
+                for future in [executor.submit(conn.connect) for conn in closed]:
+                    try:
+                        future.result()
+                    except (OSError, HTTPError) as e:
+                        raise requests.ConnectionError(e, request=request)
+        return len(closed)
+    finally:
+        for conn in connections:
+            pool._put_conn(conn)
+
+
+def tls_handshakes(transport: requests.Session) -> tuple[int, int]:
+    """
+    :return: Number of TLS handshakes of the connections of the transport, and the number of them which resumed an
+             earlier TLS session.
+    """
+
+    adapter = transport.get_adapter('https://')
+    tls_sessions = getattr(adapter, 'tls_sessions', None)
+    if tls_sessions is None:
+        return 0, 0
+    return tls_sessions.handshakes, tls_sessions.resumed
@@ -0,0 +1,122 @@
+"""
+Warm-up of a session before its first test: resolving the target servers, opening pooled connections to them and
+creating the auth handlers of the users, so the first stage of each module doesn't pay for them inline.
+"""
+import dataclasses
+import logging
+import socket
+import time
+from typing import Any, TYPE_CHECKING
+from urllib.parse import urlsplit
+
+import requests
+
+from seekret.apitest.context.cassette import CASSETTE_MODE_REPLAY
+from seekret.apitest.context.transport import open_connections, tls_handshakes
+
+if TYPE_CHECKING:
+    from seekret.apitest.context.session import Session
+
+logger = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass(frozen=True)
+class WarmUpResult(object):
+    """
+    Time spent warming up a session, reported apart from the latency of the tests.
+    """
+
+    # Time resolving the host names of the target servers, in seconds.
+    dns: float
+
+    # Time opening connections to the target servers, including TLS handshakes, in seconds.
+    connect: float
+
+    # Time creating the auth handlers of the users and authenticating them, in seconds.
+    auth: float
+
+    # Total time of the warm-up, in seconds.
+    total: float
+
+    # Number of connections opened.
+    connections: int
+
+    # Number of TLS handshakes of the opened connections, and of them, handshakes which resumed an earlier TLS session.
+    tls_handshakes: int = 0
+    tls_resumed: int = 0
+
+    # Errors of the warm-up steps that failed. The failed steps are retried inline by the first requests.
+    errors: tuple[str, ...] = ()
+
+    def to_dict(self) -> dict[str, Any]:
+        return dataclasses.asdict(self)
+
+
+def _target_urls(session: 'Session') -> list[str]:
+    return [session.run_profile.target_server,
+            *session.run_profile.targets.values()]
+
+
+def warm_up(session: 'Session', connections: int = 1) -> WarmUpResult:
+    """
+    Warm up the session. Errors are logged and reported in the result, instead of failing the test session.
+
+    :param session: Session to warm up.
+    :param connections: Number of connections to open to each target server.
+    """
+
+    start = time.perf_counter()
+    errors = []
+    dns = connect = auth = 0.0
+    opened = 0
+
+    transport = session._get_transport()
+    handshakes_before, resumed_before = tls_handshakes(transport)
+
+    # Cassettes in replay mode never connect to the target servers.
+    replay = session.cassette is not None and session.cassette.mode == CASSETTE_MODE_REPLAY
+    urls = [] if replay else _target_urls(session)
+
+    for url in urls:
+        parts = urlsplit(url)
+        step_start = time.perf_counter()
+        try:
+            socket.getaddrinfo(parts.hostname,
+                               parts.port or (443 if parts.scheme == 'https' else 80),
+                               type=socket.SOCK_STREAM)
+        except OSError as e:
+            errors.append(f'resolving {parts.hostname}: {e}')
+            continue
+        finally:
+            dns += time.perf_counter() - step_start
+
+        step_start = time.perf_counter()
+        try:
+            opened += open_connections(transport, url, connections)
+        except requests.RequestException as e:
+            errors.append(f'connecting to {url}: {e}')
+        finally:
+            connect += time.perf_counter() - step_start
+
+    step_start = time.perf_counter()
+    for user_name in session.run_profile.users:
+        try:
+            # Auth handlers fetch their credentials, such as OAuth2 tokens, when first applied to a request.
+            session._auth_handler(user_name)(
+                requests.Request('GET', session.run_profile.target_server).prepare())
+        except Exception as e:
+            errors.append(f'authenticating user {user_name}: {e!r}')
+    auth = time.perf_counter() - step_start
+
+    for error in errors:
+        logger.warning(f'seekret warm-up: {error}')
+
+    handshakes_after, resumed_after = tls_handshakes(transport)
+    return WarmUpResult(dns=dns,
+                        connect=connect,
+                        auth=auth,
+                        total=time.perf_counter() - start,
+                        connections=opened,
+                        tls_handshakes=handshakes_after - handshakes_before,
+                        tls_resumed=resumed_after - resumed_before,
+                        errors=tuple(errors))
@@ -2,10 +2,12 @@
 The `seekret.apitest.pytest_plugin` package contains the hooks and fixtures exposed
 by the `seekret.apitest` pytest plugin.
 """
+import pytest
 from _pytest.config import Config
 
 from seekret.apitest.pytest_plugin.fixtures import seekret, _seekret_run_profile, seekret_session, seekret_module
 from seekret.apitest.pytest_plugin.options import pytest_addoption
+from seekret.apitest.pytest_plugin.report import pytest_runtest_makereport
 
 
 def pytest_addhooks(pluginmanager):
@@ -21,6 +23,44 @@ def pytest_configure(config: Config):
         'markers',
         'default_user(user): modify the default user seerket uses for the test'
     )
+    config.addinivalue_line(
+        'markers',
+        'no_response_cache: send the requests of the test even if their responses are in the seekret response cache'
+    )
+
+    # The plugins are imported only when used, since their modules import `requests`.
+    if config.getoption('seekret_load_users'):
+        from seekret.apitest.pytest_plugin import load
+        config.pluginmanager.register(load, 'seekret-load')
+
+    if config.getoption('seekret_soak_duration'):
+        if config.getoption('seekret_load_users'):
+            raise pytest.UsageError('--seekret-soak-duration and --seekret-load-users cannot be used together')
+        from seekret.apitest.pytest_plugin import soak
+        config.pluginmanager.register(soak, 'seekret-soak')
+
+    from seekret.apitest.pytest_plugin.runprofile import RunProfilePlugin
+    config.pluginmanager.register(RunProfilePlugin(), 'seekret-run-profile')
+
+    from seekret.apitest.pytest_plugin.fanout import FanOutReport
+    config.pluginmanager.register(FanOutReport(config), 'seekret-fan-out')
+
+    show_latency_summary = config.getoption('seekret_latency_report')
+    latency_json_path = config.getoption('seekret_latency_json')
+    if show_latency_summary or latency_json_path:
+        from seekret.apitest.pytest_plugin.latency import LatencyReport
+        config.pluginmanager.register(
+            LatencyReport(config, show_latency_summary, latency_json_path),
+            'seekret-latency')
+
+    if config.getoption('seekret_event_log'):
+        from seekret.apitest.pytest_plugin.eventlog import EventLogPlugin
+        config.pluginmanager.register(EventLogPlugin(config),
+                                      'seekret-event-log')
+
+    if config.getoption('seekret_warm_up'):
+        from seekret.apitest.pytest_plugin.warmup import WarmUpPlugin
+        config.pluginmanager.register(WarmUpPlugin(config), 'seekret-warm-up')
 
 
 __all__ = [
@@ -30,5 +70,6 @@ __all__ = [
     'seekret_module',
     'pytest_addhooks',
     'pytest_configure',
-    'pytest_addoption'
+    'pytest_addoption',
+    'pytest_runtest_makereport'
 ]
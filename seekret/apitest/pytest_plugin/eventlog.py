@@ -0,0 +1,48 @@
+"""
+Structured event log of the test session, see `seekret.apitest.context.events`.
+"""
+import os
+from typing import Optional
+
+from _pytest.config import Config
+from _pytest.main import Session as PytestSession
+
+from seekret.apitest.context.events import EventWriter, EventLogListener
+from seekret.apitest.context.session import Session
+
+
+def worker_path(path: str, worker_id: Optional[str]) -> str:
+    """
+    Path of the event log of a `pytest-xdist` worker, so the workers don't rotate each other's files.
+
+    >>> worker_path('events.ndjson', 'gw1')
+    'events.gw1.ndjson'
+    """
+
+    if worker_id is None:
+        return path
+    root, ext = os.path.splitext(path)
+    return f'{root}.{worker_id}{ext}'
+
+
+class EventLogPlugin(object):
+    """
+    Plugin writing the stages and requests of the test session to a newline-delimited JSON file.
+    """
+    def __init__(self, config: Config):
+        workerinput = getattr(config, 'workerinput', None)
+        path = worker_path(
+            config.getoption('seekret_event_log'),
+            workerinput['workerid'] if workerinput is not None else None)
+
+        self.writer = EventWriter(
+            path,
+            max_bytes=config.getoption('seekret_event_log_max_bytes'),
+            backups=config.getoption('seekret_event_log_backups'),
+            compress=config.getoption('seekret_event_log_compress'))
+
+    def pytest_seekret_session_initialized(self, session: Session):
+        session.add_listener(EventLogListener(self.writer))
+
+    def pytest_sessionfinish(self, session: PytestSession):
+        self.writer.close()
@@ -0,0 +1,131 @@
+"""
+Comparison report of the target servers, when the run profile has several targets.
+
+This plugin is registered on every run, since the targets are known only when the run profile is loaded. The modules of
+the Seekret context import `requests`, so they are imported only when the Seekret session is initialized and when the
+report is rendered.
+"""
+import json
+import threading
+from typing import Any, TYPE_CHECKING
+
+import pytest
+from _pytest.config import Config
+from _pytest.main import Session as PytestSession
+from _pytest.terminal import TerminalReporter
+
+if TYPE_CHECKING:
+    from seekret.apitest.context.fanout import FanOutResult
+    from seekret.apitest.context.session import Session
+
+_WORKER_OUTPUT_KEY = 'seekret_fan_out_results'
+
+# Maximum number of differences listed in the report, the rest are counted.
+MAX_LISTED_DIFFERENCES = 50
+
+
+class FanOutReport(object):
+    """
+    Plugin collecting the comparisons of the requests sent to all the target servers, and reporting the targets and
+    requests whose responses differ from the primary target server at the end of the test session.
+
+    When running with `pytest-xdist`, the results of the workers are sent to the controller, which reports on all of
+    them.
+    """
+    def __init__(self, config: Config):
+        self.config = config
+        self.latency_ratio = config.getoption('seekret_fan_out_latency_ratio')
+        self.json_path = config.getoption('seekret_fan_out_json')
+
+        self.results: list[dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def pytest_seekret_session_initialized(self, session: 'Session'):
+        if not session.run_profile.targets:
+            return
+
+        from seekret.apitest.context.fanout import FanOutListener
+        session.add_listener(FanOutListener(self.add))
+
+    def add(self, result: 'FanOutResult'):
+        data = result.to_dict()
+        data['differences'] = result.differences(self.latency_ratio)
+        with self._lock:
+            self.results.append(data)
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_testnodedown(self, node, error):
+        results = node.workeroutput.get(_WORKER_OUTPUT_KEY)
+        if results:
+            with self._lock:
+                self.results.extend(json.loads(results))
+
+    def pytest_sessionfinish(self, session: PytestSession):
+        workeroutput = getattr(session.config, 'workeroutput', None)
+        if workeroutput is not None:
+            workeroutput[_WORKER_OUTPUT_KEY] = json.dumps(self.results,
+                                                          default=str)
+            return
+
+        if self.json_path and self.results:
+            with open(self.json_path, 'w') as f:
+                json.dump(self.results, f, default=str)
+
+    def pytest_terminal_summary(self, terminalreporter: TerminalReporter):
+        if not self.results:
+            return
+
+        terminalreporter.write_sep('=', 'seekret target comparison')
+        terminalreporter.write_line(self.render())
+
+    def render(self) -> str:
+        """
+        Render the latency and the number of differing responses of each endpoint template and target as a text
+        table, followed by the differences.
+        """
+
+        from seekret.apitest.context.stats import LatencySamples, format_ms, render_table
+
+        rows: dict[tuple[str, str], dict[str, Any]] = {}
+        for result in self.results:
+            differing = {target for target, _ in result['differences']}
+            for target_result in result['results']:
+                target = target_result['target']
+                row = rows.setdefault((result['endpoint'], target), {
+                    'latency': LatencySamples(),
+                    'errors': 0,
+                    'differing': 0
+                })
+                row['latency'].add(target_result['elapsed'])
+                row['errors'] += target_result['error'] is not None
+                row['differing'] += target in differing
+
+        # Rows are grouped by endpoint, starting with the primary target.
+        rendered = render_table(
+            ('endpoint', 'target', 'count', 'errors', 'differing', 'p50',
+             'p95'),
+            [(endpoint, target, len(row['latency']), row['errors'],
+              row['differing'], format_ms(row['latency'].percentile(50)),
+              format_ms(row['latency'].percentile(95)))
+             for (endpoint, target), row in sorted(
+                 rows.items(), key=lambda item: item[0][0])])
+
+        differences = [(result, target, description)
+                       for result in self.results
+                       for target, description in result['differences']]
+        if not differences:
+            return rendered + '\n\nAll targets responded the same'
+
+        lines = [
+            rendered, '',
+            f'{len(differences)} differences from the primary target:'
+        ]
+        for result, target, description in differences[:MAX_LISTED_DIFFERENCES]:
+            location = result['endpoint']
+            if result['nodeid'] is not None:
+                location = f'{result["nodeid"]} stage #{result["stage"]} {location}'
+            lines.append(f'  {location}: {target}: {description}')
+        if len(differences) > MAX_LISTED_DIFFERENCES:
+            lines.append(
+                f'  ... and {len(differences) - MAX_LISTED_DIFFERENCES} more')
+        return '\n'.join(lines)
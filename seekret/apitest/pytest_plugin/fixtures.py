@@ -1,49 +1,149 @@
+"""
+Fixtures of the Seekret plugin.
+
+This module is imported on every pytest run, including runs without Seekret tests. The context, session and run
+profile modules import `requests`, `jmespath`, `pykwalify` and `yaml`, so they are imported by the fixtures when first
+requested, and not at the top of the module.
+"""
+from typing import Iterator, TYPE_CHECKING
+
 import pytest
 from _pytest.mark import Mark
 
-from seekret.apitest.context import Context
-from seekret.apitest.context.session import Session
-from seekret.apitest.runprofile import RunProfile
+from seekret.apitest.pytest_plugin.runprofile import load_run_profile
+
+if TYPE_CHECKING:
+    from seekret.apitest.context import Context
+    from seekret.apitest.context.session import Session
+    from seekret.apitest.runprofile import RunProfile
 
 
 @pytest.fixture(scope='session')
-def _seekret_run_profile(pytestconfig) -> RunProfile:
-    run_profile_path = pytestconfig.getoption(
-        'run_profile',
-        default=None) or pytestconfig.rootpath / 'run-profile.yaml'
-    return RunProfile.load(run_profile_path)
+def _seekret_run_profile(pytestconfig) -> 'RunProfile':
+    return load_run_profile(pytestconfig)
 
 
 @pytest.fixture(scope='session')
-def seekret_session(_seekret_run_profile, pytestconfig) -> Session:
+def seekret_session(_seekret_run_profile,
+                    pytestconfig) -> Iterator['Session']:
     """
     Seekret test session object.
+
+    The session owns the connection pool to the target server, which is closed at the end of the test session.
     """
 
-    session = Session(_seekret_run_profile)
+    from seekret.apitest.context.cache import ResponseCache
+    from seekret.apitest.context.cassette import Cassette, MatchRules
+    from seekret.apitest.context.compact import ResponseStore
+    from seekret.apitest.context.jsoncodec import set_codec
+    from seekret.apitest.context.requestlog import RequestLog
+    from seekret.apitest.context.session import Session
+    from seekret.apitest.context.tracing import Tracer, OtlpJsonFileExporter
+    from seekret.apitest.pytest_plugin.eventlog import worker_path
+
+    set_codec(pytestconfig.getoption('seekret_json_codec'))
+
+    request_log = RequestLog(
+        mode=pytestconfig.getoption('seekret_log_mode'),
+        max_body_bytes=pytestconfig.getoption('seekret_log_max_body_bytes'))
+
+    cassette = None
+    cassette_path = pytestconfig.getoption('seekret_cassette')
+    if cassette_path:
+        cassette = Cassette(
+            cassette_path,
+            mode=pytestconfig.getoption('seekret_cassette_mode'),
+            rules=MatchRules(
+                match_headers=tuple(
+                    pytestconfig.getoption('seekret_cassette_match_headers')),
+                ignore_query_params=tuple(
+                    pytestconfig.getoption(
+                        'seekret_cassette_ignore_query_params'))))
+
+    response_cache = None
+    if pytestconfig.getoption('seekret_response_cache'):
+        response_cache = ResponseCache(
+            ttl=pytestconfig.getoption('seekret_response_cache_ttl'),
+            max_entries=pytestconfig.getoption('seekret_response_cache_size'))
+
+    response_store = None
+    if pytestconfig.getoption('seekret_compact_responses'):
+        response_store = ResponseStore(
+            max_bytes=pytestconfig.getoption('seekret_response_memory_cap'))
+
+    exporters = [
+        exporter for exporter in pytestconfig.hook.pytest_seekret_span_exporter(
+            config=pytestconfig) if exporter is not None
+    ]
+    trace_path = pytestconfig.getoption('seekret_trace_file')
+    if trace_path:
+        workerinput = getattr(pytestconfig, 'workerinput', None)
+        exporters.append(
+            OtlpJsonFileExporter(
+                worker_path(
+                    trace_path, workerinput['workerid']
+                    if workerinput is not None else None)))
+    tracer = Tracer(exporters) if exporters else None
+
+    session = Session(_seekret_run_profile,
+                      request_log=request_log,
+                      cassette=cassette,
+                      response_cache=response_cache,
+                      response_store=response_store,
+                      tracer=tracer)
     pytestconfig.hook.pytest_seekret_session_initialized(session=session)
-    return session
+
+    # Make the session available to the reporting hooks.
+    pytestconfig._seekret_session = session
+    try:
+        yield session
+    finally:
+        pytestconfig._seekret_session = None
+        session.close()
 
 
 @pytest.fixture(scope='module')
-def seekret_module(seekret_session, request) -> Context:
+def seekret_module(seekret_session, request) -> 'Context':
     """
     Seekret test module object.
     """
 
-    return Context(session=seekret_session, scope=request.scope)
+    from seekret.apitest.context import Context
+
+    return Context(session=seekret_session,
+                   scope=request.scope,
+                   nodeid=request.node.nodeid)
 
 
 @pytest.fixture
-def seekret(seekret_session, request) -> Context:
+def seekret(seekret_session, request) -> Iterator['Context']:
     """
     Seekret context and functions.
     """
 
-    context = Context(session=seekret_session, scope=request.scope)
+    from seekret.apitest.context import Context
+
+    context = Context(session=seekret_session,
+                      scope=request.scope,
+                      nodeid=request.node.nodeid)
 
     default_user: Mark = request.node.get_closest_marker('default_user')
     if default_user is not None:
         context.default_user = default_user.args[0]
 
-    return context
+    if request.node.get_closest_marker('no_response_cache') is not None:
+        context.use_response_cache = False
+
+    tracer = seekret_session.tracer
+    if tracer is None:
+        yield context
+        return
+
+    # The span of the test is the root span of the stages of the test, including stages of its fixtures.
+    span = tracer.start_span(request.node.nodeid,
+                             attributes={'seekret.nodeid': request.node.nodeid})
+    request.node._seekret_span = span
+    try:
+        yield context
+    finally:
+        tracer.end_span(span)
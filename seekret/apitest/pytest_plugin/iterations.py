@@ -0,0 +1,109 @@
+"""
+Shared parts of the modes which run the test functions repeatedly: load generation and soak tests.
+"""
+import inspect
+from collections.abc import Callable
+from typing import Optional, Any
+
+import pytest
+from _pytest.python import Function
+from _pytest.terminal import TerminalReporter
+
+from seekret.apitest.context.context import Context
+
+
+class IterationResults(object):
+    """
+    Results of the iterations of a test function.
+    """
+    def __init__(self):
+        self.iterations = 0
+        self.failed_iterations = 0
+        self.first_error: Optional[BaseException] = None
+
+    def iteration_finished(self, error: Optional[BaseException]):
+        self.iterations += 1
+        if error is not None:
+            self.failed_iterations += 1
+            if self.first_error is None:
+                self.first_error = error
+
+    @property
+    def error_rate(self) -> float:
+        return self.failed_iterations / self.iterations if self.iterations else 0.0
+
+    def check(self, max_error_rate: float):
+        """
+        Fail the test if more iterations failed than allowed. If all the iterations failed, the error of the first
+        iteration is raised.
+
+        :param max_error_rate: Ratio of failed iterations allowed, between 0 and 1.
+        """
+
+        if self.first_error is None or self.error_rate <= max_error_rate:
+            return
+        if self.failed_iterations == self.iterations:
+            raise self.first_error
+
+        pytest.fail(
+            f'{self.failed_iterations} of {self.iterations} iterations failed ({self.error_rate:.1%}), more than the '
+            f'allowed error rate of {max_error_rate:.1%}. The first error was {self.first_error!r}',
+            pytrace=False)
+
+
+def iteration_arguments(pyfuncitem: Function, mode: str) -> Optional[dict[str, Any]]:
+    """
+    Get the arguments to call the test function with in every iteration.
+
+    Asynchronous tests are not run repeatedly, since the asynchronous session is bound to a single event loop. They
+    run once as usual, with a warning.
+
+    :param mode: Name of the mode, for the warning.
+    :return: Arguments of the test function, or `None` if the test should run once as usual.
+    """
+
+    if 'seekret' not in pyfuncitem._fixtureinfo.argnames:
+        return None
+    if inspect.iscoroutinefunction(pyfuncitem.obj):
+        pyfuncitem.warn(
+            pytest.PytestWarning(f'{mode} does not support async tests, {pyfuncitem.nodeid} runs once'))
+        return None
+
+    return {
+        arg: pyfuncitem.funcargs[arg]
+        for arg in pyfuncitem._fixtureinfo.argnames
+    }
+
+
+def run_iteration(function: Callable[..., Any], kwargs: dict[str, Any], context: Context,
+                  results: IterationResults):
+    """
+    Call the test function with the given context as its `seekret` argument, and record the result.
+    """
+
+    try:
+        function(**dict(kwargs, seekret=context))
+    except Exception as e:
+        results.iteration_finished(e)
+    else:
+        results.iteration_finished(None)
+
+
+def write_reports(terminalreporter: TerminalReporter, user_property: str, title: str):
+    """
+    Show the reports the tests stored in the given user property.
+    """
+
+    reports = [
+        value for key in ('passed', 'failed')
+        for report in terminalreporter.stats.get(key, [])
+        if report.when == 'call'
+        for name, value in report.user_properties if name == user_property
+    ]
+    if not reports:
+        return
+
+    terminalreporter.write_sep('=', title)
+    for report in reports:
+        terminalreporter.write_line(report)
+        terminalreporter.write_line('')
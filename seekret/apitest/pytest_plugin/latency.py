@@ -0,0 +1,125 @@
+"""
+Latency report of the requests sent during the test session, grouped by endpoint template.
+"""
+import dataclasses
+import json
+import threading
+from typing import Optional, Any
+
+import pytest
+from _pytest.config import Config
+from _pytest.main import Session as PytestSession
+from _pytest.terminal import TerminalReporter
+
+from seekret.apitest.context.listener import SessionListener, RequestRecord
+from seekret.apitest.context.session import Session
+from seekret.apitest.context.stats import LatencySamples, format_ms, render_table
+
+_WORKER_OUTPUT_KEY = 'seekret_latency_samples'
+
+
+class LatencyReport(SessionListener):
+    """
+    Plugin collecting the timing breakdown of every request, and reporting latency percentiles per endpoint template
+    at the end of the test session.
+
+    When running with `pytest-xdist`, the samples of the workers are sent to the controller, which reports on all of
+    them.
+    """
+    def __init__(self, config: Config, show_summary: bool,
+                 json_path: Optional[str]):
+        self.config = config
+        self.show_summary = show_summary
+        self.json_path = json_path
+
+        self.samples: list[dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def pytest_seekret_session_initialized(self, session: Session):
+        session.add_listener(self)
+
+    def request_finished(self, record: RequestRecord):
+        if record.timings is None or record.cached:
+            return
+
+        # The latencies of each target server are reported separately.
+        endpoint = record.endpoint
+        if record.target is not None:
+            endpoint = f'{endpoint} @{record.target}'
+
+        sample = {
+            'endpoint': endpoint,
+            'target': record.target,
+            'method': record.method,
+            'path': record.path,
+            'user': record.user,
+            'status_code': record.status_code,
+            **dataclasses.asdict(record.timings),
+        }
+        with self._lock:
+            self.samples.append(sample)
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_testnodedown(self, node, error):
+        samples = node.workeroutput.get(_WORKER_OUTPUT_KEY)
+        if samples:
+            with self._lock:
+                self.samples.extend(json.loads(samples))
+
+    def pytest_sessionfinish(self, session: PytestSession):
+        workeroutput = getattr(session.config, 'workeroutput', None)
+        if workeroutput is not None:
+            workeroutput[_WORKER_OUTPUT_KEY] = json.dumps(self.samples)
+            return
+
+        if self.json_path:
+            with open(self.json_path, 'w') as f:
+                json.dump(self.samples, f)
+
+    def pytest_terminal_summary(self, terminalreporter: TerminalReporter):
+        if not self.show_summary or not self.samples:
+            return
+
+        terminalreporter.write_sep('=', 'seekret latency summary')
+        terminalreporter.write_line(self.render())
+
+    def render(self) -> str:
+        """
+        Render the latency percentiles of each endpoint template as a text table.
+        """
+
+        # The rate limit is shown only if requests waited for the client-side rate limit.
+        rate_limited = [
+            sample['rate_limit'] for sample in self.samples
+            if sample['rate_limit'] > 0
+        ]
+        phases = ('total', 'connect', 'ttfb', 'download',
+                  *(('rate_limit', ) if rate_limited else ()), 'overhead')
+        endpoints: dict[str, dict[str, LatencySamples]] = {}
+        for sample in self.samples:
+            endpoint = endpoints.setdefault(
+                sample['endpoint'], {phase: LatencySamples()
+                                     for phase in phases})
+            for phase in phases[:-1]:
+                endpoint[phase].add(sample[phase])
+            endpoint['overhead'].add(sample['prepare'] + sample['auth'] +
+                                     sample['logging'])
+
+        rows = []
+        for name, samples in sorted(endpoints.items()):
+            total = samples['total']
+            rows.append((name, len(total), format_ms(total.percentile(50)),
+                         format_ms(total.percentile(95)),
+                         format_ms(total.percentile(99)),
+                         format_ms(total.max()),
+                         *(format_ms(samples[phase].percentile(50))
+                           for phase in phases[1:])))
+
+        headers = ('endpoint', 'count', 'p50', 'p95', 'p99', 'max',
+                   *(f'{phase.replace("_", " ")} p50' for phase in phases[1:]))
+        rendered = render_table(headers, rows)
+        if rate_limited:
+            rendered += (
+                f'\n\n{len(rate_limited)} requests waited {format_ms(sum(rate_limited))} in total '
+                f'for the client-side rate limit')
+        return rendered
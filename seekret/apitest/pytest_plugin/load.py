@@ -0,0 +1,279 @@
+"""
+Load generation mode, which replays the selected tests as load scenarios of concurrent virtual users.
+
+Each virtual user repeatedly calls the test function with a fresh `seekret` context, while the other fixtures of the
+test are set up once and shared by all the virtual users.
+"""
+import dataclasses
+import threading
+import time
+from collections.abc import Callable
+from typing import Optional, Any
+
+import pytest
+from _pytest.config import Config
+from _pytest.python import Function
+from _pytest.terminal import TerminalReporter
+
+from seekret.apitest.context.context import Context
+from seekret.apitest.context.listener import SessionListener, RequestRecord
+from seekret.apitest.context.requestlog import RequestLog, LOG_MODE_NONE
+from seekret.apitest.context.session import Session
+from seekret.apitest.context.stats import LatencySamples, format_ms, render_table
+from seekret.apitest.pytest_plugin.iterations import IterationResults, iteration_arguments, run_iteration, \
+    write_reports
+
+_USER_PROPERTY = 'seekret_load'
+
+
+@dataclasses.dataclass(frozen=True)
+class LoadOptions(object):
+    """
+    Options of the load scenario.
+    """
+
+    # Number of concurrent virtual users.
+    users: int
+
+    # Duration of the scenario in seconds, or `None` to run a fixed number of iterations.
+    duration: Optional[float] = None
+
+    # Number of iterations of each virtual user, or `None` to run until the duration ends.
+    iterations: Optional[int] = None
+
+    # Target rate of requests per second across all virtual users, or `None` for no limit.
+    rps: Optional[float] = None
+
+    # Time to start all the virtual users over, in seconds.
+    ramp_up: float = 0
+
+    # Time each virtual user waits between iterations, in seconds.
+    think_time: float = 0
+
+    # Ratio of failed iterations allowed before the test fails, between 0 and 1.
+    max_error_rate: float = 0
+
+    @classmethod
+    def from_config(cls, config: Config) -> Optional['LoadOptions']:
+        """
+        Read the load options from the command line options.
+
+        :return: Load options, or `None` if the load generation mode is disabled.
+        """
+
+        users = config.getoption('seekret_load_users')
+        if not users or users <= 0:
+            return None
+
+        duration = config.getoption('seekret_load_duration')
+        iterations = config.getoption('seekret_load_iterations')
+        if duration is None and iterations is None:
+            iterations = 1
+
+        return cls(users=users,
+                   duration=duration,
+                   iterations=iterations,
+                   rps=config.getoption('seekret_load_rps'),
+                   ramp_up=config.getoption('seekret_load_ramp_up'),
+                   think_time=config.getoption('seekret_load_think_time'),
+                   max_error_rate=config.getoption('seekret_load_max_error_rate'))
+
+
+class _Pacer(object):
+    """
+    Spreads requests evenly in time to keep the target rate.
+    """
+    def __init__(self, rate: Optional[float]):
+        self._interval = 1 / rate if rate else 0
+        self._next = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self._interval:
+            return
+
+        with self._lock:
+            now = time.perf_counter()
+            slot = max(now, self._next)
+            self._next = slot + self._interval
+
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class _LoadContext(Context):
+    """
+    Context of a single virtual user iteration, pacing the requests to the target rate.
+    """
+    def __init__(self, session: Session, pacer: _Pacer, default_user):
+        super().__init__(session, scope='function')
+        self.default_user = default_user
+        self._pacer = pacer
+
+    def request(self, *args, **kwargs):
+        self._pacer.wait()
+        return super().request(*args, **kwargs)
+
+
+class _EndpointStats(object):
+    def __init__(self):
+        self.latencies = LatencySamples()
+        self.stages = 0
+        self.errors = 0
+
+
+class LoadStats(SessionListener, IterationResults):
+    """
+    Statistics of a load scenario, grouped by the stage template ("METHOD /path/{param}").
+    """
+    def __init__(self):
+        super().__init__()
+        self.endpoints: dict[str, _EndpointStats] = {}
+        self.start = self.end = time.perf_counter()
+
+        self._lock = threading.Lock()
+
+    def _endpoint(self, endpoint: str) -> _EndpointStats:
+        with self._lock:
+            return self.endpoints.setdefault(endpoint, _EndpointStats())
+
+    def stage_finished(self, context: Context, method: str, path: str,
+                       error: Optional[BaseException]):
+        stats = self._endpoint(f'{method} {path}')
+        with self._lock:
+            stats.stages += 1
+            if error is not None:
+                stats.errors += 1
+
+    def request_finished(self, record: RequestRecord):
+        self._endpoint(record.endpoint).latencies.add(record.elapsed)
+
+    def iteration_finished(self, error: Optional[BaseException]):
+        # Called by the threads of all the virtual users.
+        with self._lock:
+            super().iteration_finished(error)
+
+    def render(self, title: str, options: LoadOptions) -> str:
+        """
+        Render the statistics as a text report.
+        """
+
+        elapsed = max(self.end - self.start, 1e-9)
+        rows = []
+        for endpoint, stats in sorted(self.endpoints.items()):
+            requests = len(stats.latencies)
+            error_rate = stats.errors / stats.stages if stats.stages else 0
+            rows.append((endpoint, requests, f'{requests / elapsed:.1f}',
+                         f'{error_rate:.1%}',
+                         format_ms(stats.latencies.percentile(50)),
+                         format_ms(stats.latencies.percentile(95)),
+                         format_ms(stats.latencies.percentile(99)),
+                         format_ms(stats.latencies.max())))
+
+        header = (
+            f'{title}: {options.users} users, {self.iterations} iterations '
+            f'({self.failed_iterations} failed) in {elapsed:.1f}s')
+        table = render_table(('stage', 'requests', 'rps', 'errors', 'p50',
+                              'p95', 'p99', 'max'), rows)
+        return f'{header}\n{table}'
+
+
+class LoadRunner(object):
+    """
+    Runs a test function as a load scenario of concurrent virtual users.
+    """
+    def __init__(self, options: LoadOptions, session: Session):
+        self.options = options
+        self.session = session
+
+    def run(self, function: Callable[..., Any], kwargs: dict[str, Any],
+            default_user) -> LoadStats:
+        """
+        Run the load scenario.
+
+        :param function: Test function to run in each iteration.
+        :param kwargs: Arguments of the test function. The `seekret` argument is replaced by a new context in every
+                       iteration.
+        :param default_user: Default user of the contexts of the iterations.
+        :return: Statistics of the scenario.
+        """
+
+        stats = LoadStats()
+        pacer = _Pacer(self.options.rps)
+        stop = threading.Event()
+
+        def run_virtual_user(index: int):
+            if stop.wait(self.options.ramp_up * index / self.options.users):
+                return
+
+            iteration = 0
+            while not stop.is_set() and (self.options.iterations is None or
+                                         iteration < self.options.iterations):
+                run_iteration(function, kwargs, _LoadContext(self.session, pacer, default_user), stats)
+
+                iteration += 1
+                if self.options.think_time:
+                    stop.wait(self.options.think_time)
+
+        threads = [
+            threading.Thread(target=run_virtual_user,
+                             args=(i, ),
+                             name=f'seekret-vu-{i}',
+                             daemon=True) for i in range(self.options.users)
+        ]
+
+        # Requests are counted by the statistics instead of being logged.
+        request_log = self.session.request_log
+        self.session.request_log = RequestLog(mode=LOG_MODE_NONE)
+        self.session.add_listener(stats)
+        timer = None
+        if self.options.duration is not None:
+            timer = threading.Timer(self.options.duration, stop.set)
+        try:
+            stats.start = time.perf_counter()
+            if timer is not None:
+                timer.start()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            stop.set()
+            if timer is not None:
+                timer.cancel()
+            stats.end = time.perf_counter()
+            self.session.remove_listener(stats)
+            self.session.request_log = request_log
+
+        return stats
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_pyfunc_call(pyfuncitem: Function):
+    """
+    Run tests using the `seekret` fixture as load scenarios when the load generation mode is enabled.
+    """
+
+    options = LoadOptions.from_config(pyfuncitem.config)
+    if options is None:
+        return None
+    kwargs = iteration_arguments(pyfuncitem, 'load generation')
+    if kwargs is None:
+        return None
+
+    context: Context = pyfuncitem.funcargs['seekret']
+    stats = LoadRunner(options, context.session).run(pyfuncitem.obj, kwargs,
+                                                    context.default_user)
+    pyfuncitem.user_properties.append(
+        (_USER_PROPERTY, stats.render(pyfuncitem.nodeid, options)))
+
+    stats.check(options.max_error_rate)
+    return True
+
+
+def pytest_terminal_summary(terminalreporter: TerminalReporter):
+    """
+    Show the reports of the load scenarios.
+    """
+
+    write_reports(terminalreporter, _USER_PROPERTY, 'seekret load test summary')
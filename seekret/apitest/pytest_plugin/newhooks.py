@@ -1,12 +1,26 @@
 """
 This module contains the hooks specifications to hooks added by the Seekret plugin.
 """
+from typing import Optional, TYPE_CHECKING
 
-from seekret.apitest.context.session import Session
+if TYPE_CHECKING:
+    from _pytest.config import Config
 
+    from seekret.apitest.context.session import Session
+    from seekret.apitest.context.tracing import SpanExporter
 
-def pytest_seekret_session_initialized(session: Session):
+
+def pytest_seekret_session_initialized(session: 'Session'):
     """
     Called when a run profile is loaded.
     Can be used to register auth methods that rely on information from the run profile.
     """
+
+
+def pytest_seekret_span_exporter(config: 'Config') -> Optional['SpanExporter']:
+    """
+    Called when the Seekret session is created, to add an exporter of the tracing spans of the tests, their stages and
+    their requests. Return `None` to add no exporter.
+
+    Tracing is enabled when any implementation returns an exporter, or when `--seekret-trace-file` is given.
+    """
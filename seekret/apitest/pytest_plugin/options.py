@@ -14,3 +14,238 @@ def pytest_addoption(parser: Parser, pluginmanager):
                     type=str,
                     default=None,
                     help='Run profile YAML file to use for the test session')
+    group.addoption(
+        '--seekret-compile-run-profile',
+        dest='seekret_compile_run_profile',
+        action='store_true',
+        default=False,
+        help='Compile the run profile to the pytest cache directory, so later runs load it until the file changes '
+        'instead of parsing the YAML again. The compiled profile holds the credentials of the users')
+    group.addoption(
+        '--seekret-log-mode',
+        dest='seekret_log_mode',
+        choices=('lazy', 'eager', 'none'),
+        default='lazy',
+        help='When to serialize the headers and bodies of requests and responses. "lazy" (default) serializes '
+        'them only for failed tests or when the DEBUG log level is enabled, "eager" prints them for every '
+        'request, "none" never shows them')
+    group.addoption(
+        '--seekret-log-max-body-bytes',
+        dest='seekret_log_max_body_bytes',
+        type=int,
+        default=64 * 1024,
+        help='Truncate request and response bodies larger than this size in the output '
+        '(0 for no limit)')
+    group.addoption(
+        '--seekret-latency-report',
+        dest='seekret_latency_report',
+        action='store_true',
+        default=False,
+        help='Show latency percentiles and timing breakdown per endpoint at the end of the test session')
+    group.addoption(
+        '--seekret-latency-json',
+        dest='seekret_latency_json',
+        type=str,
+        default=None,
+        help='Export the timing breakdown of every request to the given JSON file')
+    group.addoption(
+        '--seekret-event-log',
+        dest='seekret_event_log',
+        type=str,
+        default=None,
+        help='Write an event for every test stage and request to the given newline-delimited JSON file, from a '
+        'background thread. With pytest-xdist, each worker writes its own file, named after the worker')
+    group.addoption(
+        '--seekret-event-log-max-bytes',
+        dest='seekret_event_log_max_bytes',
+        type=int,
+        default=64 * 1024 * 1024,
+        help='Rotate the event log file when it exceeds this size (0 to never rotate, default: 64MiB)')
+    group.addoption(
+        '--seekret-event-log-backups',
+        dest='seekret_event_log_backups',
+        type=int,
+        default=5,
+        help='Number of rotated event log files to keep (default: 5)')
+    group.addoption(
+        '--seekret-event-log-compress',
+        dest='seekret_event_log_compress',
+        action='store_true',
+        default=False,
+        help='Compress the rotated event log files with gzip')
+    group.addoption(
+        '--seekret-trace-file',
+        dest='seekret_trace_file',
+        type=str,
+        default=None,
+        help='Create tracing spans of the tests, their stages and their requests, propagate them to the target server '
+        'using the traceparent header, and export them to this file in the OTLP/JSON file format')
+    group.addoption(
+        '--seekret-warm-up',
+        dest='seekret_warm_up',
+        action='store_true',
+        default=False,
+        help='When the seekret session is created, resolve the target servers, open connections to them and '
+        'authenticate the users of the run profile, and report the time spent apart from the tests')
+    group.addoption(
+        '--seekret-warm-up-connections',
+        dest='seekret_warm_up_connections',
+        type=int,
+        default=1,
+        help='Number of connections to open to each target server during the warm-up (default: 1)')
+    group.addoption(
+        '--seekret-fan-out-latency-ratio',
+        dest='seekret_fan_out_latency_ratio',
+        type=float,
+        default=2.0,
+        help='When the run profile has several targets, flag targets which are slower or faster than the primary '
+        'target server by this ratio (default: 2.0)')
+    group.addoption(
+        '--seekret-fan-out-json',
+        dest='seekret_fan_out_json',
+        type=str,
+        default=None,
+        help='Export the responses of all the targets to every fanned-out request to the given JSON file')
+    group.addoption(
+        '--seekret-cassette',
+        dest='seekret_cassette',
+        type=str,
+        default=None,
+        help='Cassette directory to record the responses to, or to replay them from (see --seekret-cassette-mode)')
+    group.addoption(
+        '--seekret-cassette-mode',
+        dest='seekret_cassette_mode',
+        choices=('record', 'replay'),
+        default='replay',
+        help='"replay" (default) serves the responses from the cassette without sending the requests, "record" '
+        'sends the requests and appends the responses to the cassette')
+    group.addoption(
+        '--seekret-cassette-match-header',
+        dest='seekret_cassette_match_headers',
+        action='append',
+        default=[],
+        help='Request header whose value must match when replaying from the cassette (can be repeated). '
+        'By default, only the method, URL and body are matched')
+    group.addoption(
+        '--seekret-cassette-ignore-query-param',
+        dest='seekret_cassette_ignore_query_params',
+        action='append',
+        default=[],
+        help='Query parameter to ignore when replaying from the cassette (can be repeated)')
+    group.addoption(
+        '--seekret-response-cache',
+        dest='seekret_response_cache',
+        action='store_true',
+        default=False,
+        help='Cache GET and HEAD responses across the tests of the session, keyed by the URL, user and headers. '
+        'Other methods invalidate the cached responses of their path. Disable for a test using the '
+        '"no_response_cache" marker')
+    group.addoption(
+        '--seekret-response-cache-ttl',
+        dest='seekret_response_cache_ttl',
+        type=float,
+        default=60.0,
+        help='Time to serve a response from the response cache, in seconds (default: 60)')
+    group.addoption(
+        '--seekret-response-cache-size',
+        dest='seekret_response_cache_size',
+        type=int,
+        default=1024,
+        help='Maximum number of responses in the response cache, least recently used responses are evicted first '
+        '(default: 1024)')
+
+    group.addoption(
+        '--seekret-compact-responses',
+        dest='seekret_compact_responses',
+        action='store_true',
+        default=False,
+        help='When a stage ends, drop the raw responses of its requests, keeping only the status, the headers and '
+        'the body. Bodies beyond --seekret-response-memory-cap are spilled to disk')
+    group.addoption(
+        '--seekret-response-memory-cap',
+        dest='seekret_response_memory_cap',
+        type=int,
+        default=64 * 1024 * 1024,
+        help='Maximum size of the bodies of compacted responses kept in memory, larger bodies are spilled to disk '
+        '(default: 64MiB)')
+    group.addoption(
+        '--seekret-json-codec',
+        dest='seekret_json_codec',
+        choices=('auto', 'orjson', 'stdlib'),
+        default='auto',
+        help='JSON codec for request and response bodies. "auto" uses orjson when installed, and the standard '
+        'library otherwise (default: auto)')
+
+    group = parser.getgroup('seekret-load', 'seekret load generation')
+    group.addoption(
+        '--seekret-load-users',
+        dest='seekret_load_users',
+        type=int,
+        default=0,
+        help='Run each selected test as a load scenario with this number of concurrent virtual users')
+    group.addoption(
+        '--seekret-load-duration',
+        dest='seekret_load_duration',
+        type=float,
+        default=None,
+        help='Duration of the load scenario of each test, in seconds')
+    group.addoption(
+        '--seekret-load-iterations',
+        dest='seekret_load_iterations',
+        type=int,
+        default=None,
+        help='Number of iterations each virtual user runs the test (default: 1 when no duration is given)')
+    group.addoption(
+        '--seekret-load-rps',
+        dest='seekret_load_rps',
+        type=float,
+        default=None,
+        help='Target rate of requests per second, across all virtual users')
+    group.addoption(
+        '--seekret-load-ramp-up',
+        dest='seekret_load_ramp_up',
+        type=float,
+        default=0,
+        help='Time to start all virtual users over, in seconds')
+    group.addoption(
+        '--seekret-load-think-time',
+        dest='seekret_load_think_time',
+        type=float,
+        default=0,
+        help='Time each virtual user waits between iterations, in seconds')
+    group.addoption(
+        '--seekret-load-max-error-rate',
+        dest='seekret_load_max_error_rate',
+        type=float,
+        default=0,
+        help='Ratio of failed iterations allowed before the test fails, between 0 and 1 (default: 0, any failed '
+        'iteration fails the test)')
+
+    group = parser.getgroup('seekret-soak', 'seekret soak tests')
+    group.addoption(
+        '--seekret-soak-duration',
+        dest='seekret_soak_duration',
+        type=float,
+        default=None,
+        help='Run each selected test in a loop for this duration, in seconds, tracking the trends of the client memory '
+        'and of the latency of each stage')
+    group.addoption(
+        '--seekret-soak-sample-every',
+        dest='seekret_soak_sample_every',
+        type=int,
+        default=100,
+        help='Number of iterations between samples of the client memory and the latency (default: 100)')
+    group.addoption(
+        '--seekret-soak-max-memory-growth',
+        dest='seekret_soak_max_memory_growth',
+        type=int,
+        default=16 * 1024 * 1024,
+        help='Fail a soak test if the client memory grows by more than this number of bytes during it (0 for no '
+        'limit, default: 16MiB)')
+    group.addoption(
+        '--seekret-soak-max-error-rate',
+        dest='seekret_soak_max_error_rate',
+        type=float,
+        default=0,
+        help='Ratio of failed iterations allowed before the test fails, between 0 and 1 (default: 0, any failed '
+        'iteration fails the test)')
@@ -0,0 +1,32 @@
+import pytest
+from _pytest.nodes import Item
+from _pytest.runner import CallInfo
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_makereport(item: Item, call: CallInfo):
+    """
+    Add the requests and responses of failed tests to the test report, mark the tracing span of failed tests as
+    failed, and reset the request log of the session after each test.
+    """
+
+    outcome = yield
+    report = outcome.get_result()
+
+    session = getattr(item.config, '_seekret_session', None)
+    if session is None:
+        return
+
+    if report.failed:
+        rendered = session.request_log.render()
+        if rendered:
+            report.sections.append(
+                (f'Captured seekret requests {call.when}', rendered))
+
+    span = getattr(item, '_seekret_span', None)
+    if span is not None and report.failed:
+        from seekret.apitest.context.tracing import STATUS_ERROR
+        span.set_status(STATUS_ERROR, f'test failed in {call.when}')
+
+    if call.when == 'teardown':
+        session.request_log.clear()
@@ -0,0 +1,71 @@
+"""
+Loading of the run profile, once per test run.
+
+With `--seekret-compile-run-profile`, the run profile is compiled to a cache in the pytest cache directory, so later
+runs don't parse the YAML again. When running with `pytest-xdist`, the controller loads the run profile and passes it
+to the workers, so the workers don't load it at all.
+"""
+import json
+from typing import Optional, TYPE_CHECKING
+
+import pytest
+from _pytest.config import Config
+
+if TYPE_CHECKING:
+    from seekret.apitest.runprofile import RunProfile
+
+_WORKER_INPUT_KEY = 'seekret_run_profile'
+
+
+def _run_profile_path(config: Config):
+    return config.getoption('run_profile',
+                            default=None) or config.rootpath / 'run-profile.yaml'
+
+
+def _cache_dir(config: Config) -> Optional[str]:
+    cache = getattr(config, 'cache', None)
+    # Opt-in, since the compiled run profile holds the credentials of the users.
+    if cache is None or not config.getoption('seekret_compile_run_profile', default=False):
+        return None
+
+    return str(cache.mkdir('seekret'))
+
+
+def load_run_profile(config: Config) -> 'RunProfile':
+    """
+    Load the run profile of the test run.
+
+    :raises RunProfileError: The run profile is malformed.
+    """
+
+    # Imported here, since this module is imported on every pytest run and the run profile module imports `yaml`.
+    from seekret.apitest.runprofile import RunProfile
+
+    workerinput = getattr(config, 'workerinput', None)
+    if workerinput is not None and _WORKER_INPUT_KEY in workerinput:
+        return RunProfile.from_dict(json.loads(workerinput[_WORKER_INPUT_KEY]))
+
+    return RunProfile.load(_run_profile_path(config), cache_dir=_cache_dir(config))
+
+
+class RunProfilePlugin(object):
+    """
+    Plugin passing the run profile from the `pytest-xdist` controller to the workers.
+    """
+    def __init__(self):
+        self._serialized: Optional[str] = None
+        self._failed = False
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_configure_node(self, node):
+        from seekret.apitest.runprofile import RunProfileError
+
+        if self._serialized is None and not self._failed:
+            try:
+                self._serialized = json.dumps(load_run_profile(node.config).to_dict())
+            except (OSError, TypeError, ValueError, RunProfileError):
+                # Let the workers load the run profile themselves, and report the error in the tests.
+                self._failed = True
+
+        if self._serialized is not None:
+            node.workerinput[_WORKER_INPUT_KEY] = self._serialized
@@ -0,0 +1,355 @@
+"""
+Soak test mode, which runs the selected tests in a loop for a long duration, to catch degradation of the target server
+over time.
+
+The memory of the client process is sampled with `tracemalloc` every few iterations, and the latency of each stage
+template is measured in windows between the samples. The report shows the trend of both, the memory growth per
+iteration and the slope of the p95 latency over time, so a server slowing down can be told apart from a leaking client.
+"""
+import dataclasses
+import fnmatch
+import gc
+import os
+import threading
+import time
+import tracemalloc
+from collections.abc import Callable
+from typing import Optional, Any
+
+import pytest
+from _pytest.config import Config
+from _pytest.python import Function
+from _pytest.terminal import TerminalReporter
+
+from seekret.apitest.context.context import Context
+from seekret.apitest.context.listener import SessionListener, RequestRecord
+from seekret.apitest.context.requestlog import RequestLog, LOG_MODE_NONE
+from seekret.apitest.context.session import Session
+from seekret.apitest.context.stats import LatencySamples, format_bytes, format_ms, linear_slope, render_table
+from seekret.apitest.pytest_plugin.iterations import IterationResults, iteration_arguments, run_iteration, \
+    write_reports
+
+_USER_PROPERTY = 'seekret_soak'
+
+# Number of frames stored for each allocation, to attribute allocations made by libraries to the Seekret code calling
+# them.
+_TRACEBACK_FRAMES = 25
+
+# Number of allocation sites reported.
+_TOP_SITES = 10
+
+_PACKAGE_PATTERN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '*')
+
+# Directory the allocation sites are reported relative to.
+_SOURCE_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+# Files of the soak test runner, which calls all the code of the tests and isn't reported as an allocation site.
+_RUNNER_FILES = frozenset((os.path.abspath(__file__), run_iteration.__code__.co_filename))
+
+
+@dataclasses.dataclass(frozen=True)
+class SoakOptions(object):
+    """
+    Options of the soak test.
+    """
+
+    # Duration of the soak test of each test, in seconds.
+    duration: float
+
+    # Number of iterations between memory samples.
+    sample_every: int = 100
+
+    # Maximum growth of the memory of the client process during the soak test, in bytes, or `None` for no limit.
+    max_memory_growth: Optional[int] = None
+
+    # Ratio of failed iterations allowed before the test fails, between 0 and 1.
+    max_error_rate: float = 0
+
+    @classmethod
+    def from_config(cls, config: Config) -> Optional['SoakOptions']:
+        """
+        Read the soak test options from the command line options.
+
+        :return: Soak test options, or `None` if the soak test mode is disabled.
+        """
+
+        duration = config.getoption('seekret_soak_duration')
+        if not duration or duration <= 0:
+            return None
+
+        return cls(duration=duration,
+                   sample_every=max(config.getoption('seekret_soak_sample_every'), 1),
+                   max_memory_growth=config.getoption('seekret_soak_max_memory_growth') or None,
+                   max_error_rate=config.getoption('seekret_soak_max_error_rate'))
+
+
+@dataclasses.dataclass(frozen=True)
+class SoakSample(object):
+    """
+    Sample of the memory and latency of a soak test.
+    """
+
+    # Number of iterations finished when the sample was taken.
+    iteration: int
+
+    # Time since the soak test started, in seconds.
+    elapsed: float
+
+    # Memory of the client process traced by `tracemalloc`, in bytes.
+    memory: int
+
+    # P95 latency of each stage template since the previous sample, in seconds.
+    p95: dict[str, float]
+
+
+@dataclasses.dataclass(frozen=True)
+class AllocationSite(object):
+    """
+    Line of `seekret.apitest` whose allocations grew during the soak test.
+    """
+
+    # Location of the line, as "path:line" relative to the directory of the `seekret` package.
+    location: str
+
+    # Growth of the memory allocated by the line, in bytes.
+    size: int
+
+    # Growth of the number of memory blocks allocated by the line.
+    count: int
+
+
+class SoakStats(SessionListener, IterationResults):
+    """
+    Statistics of a soak test, with the latency grouped by the stage template ("METHOD /path/{param}").
+    """
+    def __init__(self):
+        super().__init__()
+        # Number of requests of each stage template. Latency is kept for the current window only, so the statistics
+        # don't grow with the iterations.
+        self.requests: dict[str, int] = {}
+        self.samples: list[SoakSample] = []
+        self.sites: list[AllocationSite] = []
+        self.start = self.end = time.perf_counter()
+
+        self._window: dict[str, LatencySamples] = {}
+        self._lock = threading.Lock()
+
+    def request_finished(self, record: RequestRecord):
+        with self._lock:
+            self.requests[record.endpoint] = self.requests.get(record.endpoint, 0) + 1
+            self._window.setdefault(record.endpoint, LatencySamples()).add(record.elapsed)
+
+    def add_sample(self, memory: int, latency: bool = True):
+        """
+        Add a sample of the memory, and of the latency since the previous sample.
+
+        :param memory: Memory of the client process, in bytes.
+        :param latency: Whether to sample the latency, or only start a new latency window.
+        """
+
+        with self._lock:
+            window, self._window = self._window, {}
+        p95 = {endpoint: samples.percentile(95) for endpoint, samples in window.items()} if latency else {}
+        self.samples.append(
+            SoakSample(iteration=self.iterations,
+                       elapsed=time.perf_counter() - self.start,
+                       memory=memory,
+                       p95=p95))
+
+    @property
+    def memory_growth(self) -> int:
+        """
+        Growth of the memory of the client process between the first and the last samples, in bytes.
+        """
+
+        if not self.samples:
+            return 0
+        return self.samples[-1].memory - self.samples[0].memory
+
+    def memory_growth_per_iteration(self) -> float:
+        """
+        Trend of the memory of the client process, in bytes per iteration.
+        """
+
+        return linear_slope([sample.iteration for sample in self.samples],
+                            [sample.memory for sample in self.samples])
+
+    def p95_slope(self, endpoint: str) -> float:
+        """
+        Trend of the p95 latency of the stage template, in seconds per second.
+        """
+
+        samples = [sample for sample in self.samples if endpoint in sample.p95]
+        return linear_slope([sample.elapsed for sample in samples],
+                            [sample.p95[endpoint] for sample in samples])
+
+    def render_sites(self) -> str:
+        lines = ['top allocation sites in seekret.apitest:']
+        for site in self.sites:
+            lines.append(f'  {site.location}: {_signed_bytes(site.size)} in {site.count:+d} blocks')
+        return '\n'.join(lines)
+
+    def render(self, title: str) -> str:
+        """
+        Render the statistics as a text report.
+        """
+
+        elapsed = max(self.end - self.start, 1e-9)
+        lines = [
+            f'{title}: {self.iterations} iterations ({self.failed_iterations} failed) in {elapsed:.1f}s, '
+            f'{len(self.samples)} samples'
+        ]
+        if self.samples:
+            lines.append(
+                f'memory: {format_bytes(self.samples[0].memory)} -> {format_bytes(self.samples[-1].memory)}, '
+                f'{_signed_bytes(self.memory_growth)} '
+                f'({_signed_bytes(self.memory_growth_per_iteration())}/iteration)')
+
+        rows = []
+        for endpoint, requests in sorted(self.requests.items()):
+            windows = [sample.p95[endpoint] for sample in self.samples if endpoint in sample.p95]
+            rows.append((endpoint, requests,
+                         format_ms(windows[0]) if windows else '-',
+                         format_ms(windows[-1]) if windows else '-',
+                         f'{self.p95_slope(endpoint) * 60 * 1000:+.2f}ms/min'))
+        lines.append(render_table(('stage', 'requests', 'p95 first', 'p95 last', 'p95 slope'), rows))
+
+        if self.sites:
+            lines.append(self.render_sites())
+        return '\n'.join(lines)
+
+
+def _signed_bytes(value: float) -> str:
+    return format_bytes(value) if value < 0 else f'+{format_bytes(value)}'
+
+
+def _traced_memory() -> int:
+    # Collect garbage first, so unreachable cycles waiting for the collector aren't mistaken for growth.
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    return current
+
+
+def _take_snapshot() -> tracemalloc.Snapshot:
+    return tracemalloc.take_snapshot().filter_traces(
+        [tracemalloc.Filter(True, _PACKAGE_PATTERN, all_frames=True)])
+
+
+def _top_sites(first: tracemalloc.Snapshot, last: tracemalloc.Snapshot, limit: int) -> list[AllocationSite]:
+    """
+    Get the lines of `seekret.apitest` whose allocations grew the most between the snapshots. Allocations are
+    attributed to the innermost frame of their traceback in `seekret.apitest`, except for frames of the soak test
+    runner, which calls all the code of the tests.
+    """
+
+    sizes: dict[str, list[int]] = {}
+    for stat in last.compare_to(first, 'traceback'):
+        for frame in reversed(stat.traceback):
+            if frame.filename in _RUNNER_FILES or not fnmatch.fnmatch(frame.filename, _PACKAGE_PATTERN):
+                continue
+
+            location = f'{os.path.relpath(frame.filename, _SOURCE_ROOT)}:{frame.lineno}'
+            size = sizes.setdefault(location, [0, 0])
+            size[0] += stat.size_diff
+            size[1] += stat.count_diff
+            break
+
+    sites = [AllocationSite(location, size, count) for location, (size, count) in sizes.items() if size > 0]
+    sites.sort(key=lambda site: site.size, reverse=True)
+    return sites[:limit]
+
+
+class SoakRunner(object):
+    """
+    Runs a test function repeatedly for the duration of the soak test, sampling the memory and latency as it goes.
+    """
+    def __init__(self, options: SoakOptions, session: Session):
+        self.options = options
+        self.session = session
+
+    def run(self, function: Callable[..., Any], kwargs: dict[str, Any], default_user) -> SoakStats:
+        """
+        Run the soak test. The first iteration warms up the client, and is excluded from the trends. At least one more
+        iteration runs after it, so the trends are measured even when an iteration outlasts the duration.
+
+        :param function: Test function to run in each iteration.
+        :param kwargs: Arguments of the test function. The `seekret` argument is replaced by a new context in every
+                       iteration.
+        :param default_user: Default user of the contexts of the iterations.
+        :return: Statistics of the soak test.
+        """
+
+        stats = SoakStats()
+
+        # Keep tracing if it was started by someone else, such as `python -X tracemalloc`.
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(_TRACEBACK_FRAMES)
+
+        # Requests are counted by the statistics instead of being logged, so the log doesn't grow with the iterations.
+        request_log = self.session.request_log
+        self.session.request_log = RequestLog(mode=LOG_MODE_NONE)
+        self.session.add_listener(stats)
+        first_snapshot = None
+        try:
+            stats.start = time.perf_counter()
+            deadline = stats.start + self.options.duration
+            while True:
+                context = Context(self.session, scope='function')
+                context.default_user = default_user
+                run_iteration(function, kwargs, context, stats)
+
+                done = stats.iterations > 1 and time.perf_counter() >= deadline
+                if first_snapshot is None:
+                    stats.add_sample(_traced_memory(), latency=False)
+                    first_snapshot = _take_snapshot()
+                elif done or stats.iterations % self.options.sample_every == 0:
+                    stats.add_sample(_traced_memory())
+
+                if done:
+                    break
+
+            stats.sites = _top_sites(first_snapshot, _take_snapshot(), _TOP_SITES)
+        finally:
+            stats.end = time.perf_counter()
+            self.session.remove_listener(stats)
+            self.session.request_log = request_log
+            if started_tracing:
+                tracemalloc.stop()
+
+        return stats
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_pyfunc_call(pyfuncitem: Function):
+    """
+    Run tests using the `seekret` fixture as soak tests when the soak test mode is enabled.
+    """
+
+    options = SoakOptions.from_config(pyfuncitem.config)
+    if options is None:
+        return None
+    kwargs = iteration_arguments(pyfuncitem, 'soak test mode')
+    if kwargs is None:
+        return None
+
+    context: Context = pyfuncitem.funcargs['seekret']
+    stats = SoakRunner(options, context.session).run(pyfuncitem.obj, kwargs, context.default_user)
+    pyfuncitem.user_properties.append((_USER_PROPERTY, stats.render(pyfuncitem.nodeid)))
+
+    stats.check(options.max_error_rate)
+    if options.max_memory_growth is not None and stats.memory_growth > options.max_memory_growth:
+        pytest.fail(
+            f'client memory grew by {format_bytes(stats.memory_growth)} during the soak test, more than the limit of '
+            f'{format_bytes(options.max_memory_growth)}\n{stats.render_sites()}',
+            pytrace=False)
+
+    return True
+
+
+def pytest_terminal_summary(terminalreporter: TerminalReporter):
+    """
+    Show the reports of the soak tests.
+    """
+
+    write_reports(terminalreporter, _USER_PROPERTY, 'seekret soak test summary')
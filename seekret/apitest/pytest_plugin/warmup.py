@@ -0,0 +1,80 @@
+"""
+Warm-up of the Seekret session before the first test, see `seekret.apitest.context.warmup`.
+"""
+import json
+import threading
+from typing import Any
+
+import pytest
+from _pytest.config import Config
+from _pytest.main import Session as PytestSession
+from _pytest.terminal import TerminalReporter
+
+from seekret.apitest.context.session import Session
+from seekret.apitest.context.stats import format_ms, render_table
+
+_WORKER_OUTPUT_KEY = 'seekret_warm_up_results'
+
+
+class WarmUpPlugin(object):
+    """
+    Plugin warming up the Seekret session when it's created, and reporting the time spent on the warm-up at the end
+    of the test session, apart from the latency of the tests.
+
+    When running with `pytest-xdist`, each worker warms up its own session, and the controller reports on all of them.
+    """
+    def __init__(self, config: Config):
+        self.connections = config.getoption('seekret_warm_up_connections')
+
+        workerinput = getattr(config, 'workerinput', None)
+        self.worker_id = workerinput['workerid'] if workerinput is not None else None
+
+        self.results: list[dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    # Run after the other plugins, so their session listeners observe the warm-up.
+    @pytest.hookimpl(trylast=True)
+    def pytest_seekret_session_initialized(self, session: Session):
+        result = session.warm_up(self.connections)
+        with self._lock:
+            self.results.append({'worker': self.worker_id, **result.to_dict()})
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_testnodedown(self, node, error):
+        results = node.workeroutput.get(_WORKER_OUTPUT_KEY)
+        if results:
+            with self._lock:
+                self.results.extend(json.loads(results))
+
+    def pytest_sessionfinish(self, session: PytestSession):
+        workeroutput = getattr(session.config, 'workeroutput', None)
+        if workeroutput is not None:
+            workeroutput[_WORKER_OUTPUT_KEY] = json.dumps(self.results)
+
+    def pytest_terminal_summary(self, terminalreporter: TerminalReporter):
+        if not self.results:
+            return
+
+        terminalreporter.write_sep('=', 'seekret warm-up')
+        terminalreporter.write_line(self.render())
+
+    def render(self) -> str:
+        """
+        Render the time spent on each warm-up step of each session as a text table, followed by the warm-up errors.
+        """
+
+        results = sorted(self.results, key=lambda result: result['worker'] or '')
+        lines = [
+            render_table(
+                ('worker', 'total', 'dns', 'connect', 'auth', 'connections',
+                 'tls resumed'),
+                [(result['worker'] or '-', format_ms(result['total']),
+                  format_ms(result['dns']), format_ms(result['connect']),
+                  format_ms(result['auth']), result['connections'],
+                  f'{result["tls_resumed"]}/{result["tls_handshakes"]}')
+                 for result in results])
+        ]
+        for result in results:
+            for error in result['errors']:
+                lines.append(f'{result["worker"] or "-"}: {error}')
+        return '\n'.join(lines)
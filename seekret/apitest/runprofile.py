@@ -1,9 +1,38 @@
+import contextlib
 import dataclasses
+import glob
+import hashlib
+import json
+import os
+import re
+import typing
+from collections.abc import Mapping
 from os import PathLike
-from typing import Any
+from typing import Any, Optional, Union
 
 import yaml
 
+# Use the libyaml parser when available, which is much faster than the pure-Python parser for large run profiles.
+_YamlLoader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+# Version of the compiled run profile cache format. Bump when the structure of the run profile changes.
+_CACHE_VERSION = 4
+
+# Observed latency percentile of an endpoint, such as "p95".
+PERCENTILE_PATTERN = re.compile(r'^p(?P<percent>\d+(\.\d+)?)$')
+
+# Name of `target_server` when comparing the responses of several targets.
+PRIMARY_TARGET = 'primary'
+
+_MISSING = object()
+
+
+class RunProfileError(ValueError):
+    """
+    Raised when a run profile is malformed.
+    """
+    pass
+
 
 @dataclasses.dataclass(frozen=True)
 class UserAuth(object):
@@ -11,10 +40,178 @@ class UserAuth(object):
     data: dict[str, Any]
 
 
+@dataclasses.dataclass(frozen=True)
+class RateLimit(object):
+    """
+    Client-side rate limit of the requests of a user, shared by all the processes on the host.
+    """
+
+    # Sustained rate of requests per second, or `None` for no rate limit.
+    requests_per_second: Optional[float] = None
+
+    # Number of requests which may be sent at once after a quiet period. Defaults to one second of requests.
+    burst: Optional[int] = None
+
+    # Maximum number of requests in flight at once, or `None` for no limit.
+    max_concurrency: Optional[int] = None
+
+
 @dataclasses.dataclass(frozen=True)
 class User(object):
     auth: UserAuth
 
+    rate_limit: Optional[RateLimit] = None
+
+
+@dataclasses.dataclass(frozen=True)
+class ConnectionPool(object):
+    """
+    Configuration of the HTTP connection pool shared by the requests of a test session.
+    """
+
+    # Number of per-host connection pools kept alive.
+    pool_size: int = 10
+
+    # Maximum number of connections kept open to a single host.
+    max_connections_per_host: int = 10
+
+    # Reuse connections between requests. When disabled, every request closes its connection.
+    keep_alive: bool = True
+
+
+@dataclasses.dataclass(frozen=True)
+class RequestPolicy(object):
+    """
+    Policy for controlling the latency tail of requests, using hedged requests and retries.
+
+    Hedges apply to safe methods only (GET, HEAD and OPTIONS), since the duplicate of a PUT or DELETE may respond first
+    with a status the first request never got. Retries apply to idempotent methods only (GET, HEAD, OPTIONS, PUT, DELETE
+    and TRACE).
+    """
+
+    # Send a hedged duplicate of a request which did not respond after this time, and use the first response.
+    # Either a time in seconds, an observed latency percentile of the endpoint (such as "p95"), or `None` to disable
+    # hedging.
+    hedge_after: Union[float, str, None] = None
+
+    # Maximum number of times to retry a request after a connection error or a 502, 503 or 504 response.
+    max_retries: int = 0
+
+    # Base delay before retrying, in seconds. The delay is doubled on every retry, and a random part of it is used.
+    retry_backoff: float = 0.1
+
+    # Ratio of retries and hedges to requests allowed across the test session, so a failing target server is not
+    # flooded with retries. Only the value from the run profile is used, even if a stage overrides the policy.
+    retry_budget: float = 0.1
+
+
+class _Validator(object):
+    """
+    Reads values from the parsed run profile, failing with the location of malformed values.
+    """
+    def __init__(self, source: str):
+        self.source = source
+
+    def error(self, location: str, message: str) -> RunProfileError:
+        return RunProfileError(f'{self.source}: {location}: {message}'
+                               if location else f'{self.source}: {message}')
+
+    def get(self,
+            data: Mapping[str, Any],
+            key: str,
+            expected_type: Union[type, tuple[type, ...]],
+            location: str,
+            default: Any = _MISSING) -> Any:
+        key_location = f'{location}.{key}' if location else key
+        if key not in data:
+            if default is _MISSING:
+                raise self.error(location, f'missing required key "{key}"')
+            return default
+
+        value = data[key]
+        types = expected_type if isinstance(expected_type,
+                                            tuple) else (expected_type, )
+        if not isinstance(value, types) or (isinstance(value, bool)
+                                            and bool not in types):
+            raise self.error(
+                key_location,
+                f'expected {_type_name(expected_type)}, got {_type_name(type(value))}'
+            )
+
+        return value
+
+
+def _field_types(field_type: Any) -> tuple[type, ...]:
+    """
+    Get the types accepted for a dataclass field with the given annotation. Integers are accepted for floats.
+    """
+
+    if typing.get_origin(field_type) is Union:
+        return tuple(t for arg in typing.get_args(field_type)
+                     for t in _field_types(arg))
+    if field_type is float:
+        return int, float
+    return field_type,
+
+
+def _parse_section(validator: _Validator,
+                   data: Mapping[str, Any],
+                   key: str,
+                   section_class: type,
+                   location: str = ''):
+    """
+    Create the dataclass of an optional section of the run profile, from its keys.
+    """
+
+    section = validator.get(data, key, Mapping, location, {})
+    location = f'{location}.{key}' if location else key
+    fields = {
+        field.name: _field_types(field.type)
+        for field in dataclasses.fields(section_class)
+    }
+    for field_name in section:
+        if field_name not in fields:
+            raise validator.error(
+                location,
+                f'unknown key "{field_name}", expected one of: {", ".join(fields)}'
+            )
+
+    return section_class(
+        **{
+            field_name: validator.get(section, field_name, fields[field_name],
+                                      location)
+            for field_name in section
+        })
+
+
+def _type_name(value_type: Union[type, tuple[type, ...]]) -> str:
+    if isinstance(value_type, tuple):
+        if float in value_type:
+            # Integers are accepted as numbers.
+            value_type = tuple(t for t in value_type if t is not int)
+        return ' or '.join(_type_name(t) for t in value_type)
+
+    return {
+        dict: 'mapping',
+        Mapping: 'mapping',
+        list: 'list',
+        str: 'string',
+        int: 'integer',
+        bool: 'boolean',
+        float: 'number',
+        type(None): 'null',
+    }.get(value_type, value_type.__name__)
+
+
+def _cache_prefix(path: PathLike) -> str:
+    """
+    Get the prefix of the names of the profiles compiled from the given run profile file. The name continues with the
+    digest of the content the profile was compiled from.
+    """
+
+    path_digest = hashlib.sha256(os.fsencode(os.path.abspath(path))).hexdigest()[:16]
+    return f'run-profile-{path_digest}'
+
 
 @dataclasses.dataclass(frozen=True)
 class RunProfile(object):
@@ -26,15 +223,164 @@ class RunProfile(object):
 
     users: dict[str, User]
 
+    # Additional target servers by name, such as regional deployments and canaries. Every stage request sent to
+    # `target_server` is also sent to each of these concurrently, and their responses are compared.
+    targets: dict[str, str] = dataclasses.field(default_factory=dict)
+
+    connection_pool: ConnectionPool = dataclasses.field(
+        default_factory=ConnectionPool)
+
+    request_policy: RequestPolicy = dataclasses.field(
+        default_factory=RequestPolicy)
+
     @classmethod
-    def load(cls, path: PathLike):
-        with open(path, 'r') as f:
-            data = yaml.load(f, Loader=yaml.SafeLoader)
-
-        return cls(target_server=data['target_server'],
-                   users={
-                       user_name:
-                       User(auth=UserAuth(type=user['auth']['type'],
-                                          data=user['auth']['data']))
-                       for user_name, user in data['users'].items()
-                   })
+    def load(cls, path: PathLike, cache_dir: Optional[PathLike] = None):
+        """
+        Load the run profile from the given YAML file.
+
+        :param path: Path of the run profile file.
+        :param cache_dir: Directory of compiled run profiles. When given, the run profile is loaded from its compiled
+                          form if the file did not change since it was compiled, instead of parsing the YAML again.
+                          The compiled form holds the credentials of the users, and is readable by the current user
+                          only.
+        :raises RunProfileError: The run profile is malformed.
+        """
+
+        with open(path, 'rb') as f:
+            content = f.read()
+
+        cache_path = None
+        if cache_dir is not None:
+            digest = hashlib.sha256(content).hexdigest()
+            cache_path = os.path.join(cache_dir, f'{_cache_prefix(path)}-{digest}.json')
+            run_profile = cls._load_compiled(cache_path, digest)
+            if run_profile is not None:
+                return run_profile
+
+        try:
+            data = yaml.load(content, Loader=_YamlLoader)
+        except yaml.YAMLError as e:
+            raise RunProfileError(f'{path}: invalid YAML: {e}') from e
+
+        run_profile = cls.from_dict(data, source=str(path))
+
+        if cache_path is not None:
+            run_profile._save_compiled(cache_path, digest)
+
+        return run_profile
+
+    @classmethod
+    def from_dict(cls, data: Any, source: str = 'run profile'):
+        """
+        Create the run profile from its parsed content.
+
+        :param data: Parsed content of the run profile.
+        :param source: Name of the run profile in error messages.
+        :raises RunProfileError: The run profile is malformed.
+        """
+
+        validator = _Validator(source)
+        if not isinstance(data, Mapping):
+            raise validator.error(
+                '', f'expected a mapping, got {_type_name(type(data))}')
+
+        users = {}
+        for user_name, user in validator.get(data, 'users', Mapping,
+                                             '').items():
+            location = f'users.{user_name}'
+            if not isinstance(user, Mapping):
+                raise validator.error(
+                    location, f'expected mapping, got {_type_name(type(user))}')
+
+            auth = validator.get(user, 'auth', Mapping, location)
+            rate_limit = None
+            if user.get('rate_limit') is not None:
+                rate_limit = _parse_section(validator, user, 'rate_limit',
+                                            RateLimit, location)
+
+            users[user_name] = User(auth=UserAuth(
+                type=validator.get(auth, 'type', str, f'{location}.auth'),
+                data=validator.get(auth, 'data', Mapping, f'{location}.auth')),
+                                    rate_limit=rate_limit)
+
+        request_policy = _parse_section(validator, data, 'request_policy',
+                                        RequestPolicy)
+        hedge_after = request_policy.hedge_after
+        if isinstance(hedge_after, str) and not PERCENTILE_PATTERN.match(
+                hedge_after):
+            raise validator.error(
+                'request_policy.hedge_after',
+                f'expected seconds or a percentile such as "p95", got "{hedge_after}"'
+            )
+
+        targets = {}
+        for target_name, target_server in validator.get(
+                data, 'targets', Mapping, '', {}).items():
+            if target_name == PRIMARY_TARGET:
+                raise validator.error(
+                    'targets',
+                    f'"{PRIMARY_TARGET}" is reserved for target_server')
+            targets[target_name] = validator.get(data['targets'], target_name,
+                                                 str, 'targets')
+
+        return cls(target_server=validator.get(data, 'target_server', str,
+                                               ''),
+                   users=users,
+                   targets=targets,
+                   connection_pool=_parse_section(validator, data,
+                                                  'connection_pool',
+                                                  ConnectionPool),
+                   request_policy=request_policy)
+
+    def to_dict(self) -> dict[str, Any]:
+        """
+        Convert the run profile to plain data, which `from_dict` accepts.
+        """
+
+        return dataclasses.asdict(self)
+
+    @classmethod
+    def _load_compiled(cls, cache_path: str, digest: str):
+        try:
+            with open(cache_path, 'r') as f:
+                compiled = json.load(f)
+
+            if compiled.get('version') != _CACHE_VERSION or compiled.get(
+                    'sha256') != digest:
+                return None
+
+            return cls.from_dict(compiled['profile'], source=cache_path)
+        except (OSError, ValueError, KeyError, AttributeError):
+            # Missing or corrupt cache, parse the run profile instead.
+            return None
+
+    def _save_compiled(self, cache_path: str, digest: str):
+        cache_dir = os.path.dirname(cache_path)
+        temp_path = f'{cache_path}.{os.getpid()}.tmp'
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            # Readable by the current user only, since the compiled profile holds the credentials of the users.
+            fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w') as f:
+                json.dump(
+                    {
+                        'version': _CACHE_VERSION,
+                        'sha256': digest,
+                        'profile': self.to_dict()
+                    }, f)
+            # Replace atomically, so concurrent workers never read a partially written cache.
+            os.replace(temp_path, cache_path)
+        except (OSError, TypeError, ValueError):
+            # Values JSON can't represent, such as YAML dates, are not cached, and the run profile is parsed every run.
+            return
+        finally:
+            with contextlib.suppress(OSError):
+                os.remove(temp_path)
+
+        # Remove the profiles compiled from earlier versions of the file, which hold outdated credentials. Profiles
+        # compiled from other files are kept, so runs alternating between run profiles don't evict each other.
+        prefix = os.path.basename(cache_path).rsplit('-', 1)[0]
+        for path in glob.glob(os.path.join(glob.escape(cache_dir), f'{glob.escape(prefix)}-*.json')):
+            if path != cache_path:
+                with contextlib.suppress(OSError):
+                    os.remove(path)
@@ -23,6 +23,10 @@ setup(name='seekret.apitest',
           'requests>=2,<3', 'PyYAML>=5,<6', 'jmespath', 'pytest>=6,<7',
           "pykwalify~=1.8"
       ],
+      extras_require={
+          'async': ['aiohttp>=3.8,<4'],
+          'fast': ['orjson>=3,<4']
+      },
       classifiers=[
           "Programming Language :: Python :: 3",
           "License :: OSI Approved :: MIT License",
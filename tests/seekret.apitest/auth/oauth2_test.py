@@ -0,0 +1,189 @@
+import base64
+import threading
+import time
+import urllib.parse
+
+import pytest
+import requests
+
+import seekret.apitest.auth.oauth2
+from seekret.apitest.auth import create_auth, OAuth2Error
+from seekret.apitest.benchmark.server import json_response
+from seekret.apitest.context.session import Session
+from seekret.apitest.runprofile import RunProfile, User, UserAuth
+
+
+class TokenEndpoint(object):
+    """
+    Stand-in OAuth2 token endpoint, issuing numbered tokens.
+    """
+    def __init__(self, expires_in=3600):
+        self.expires_in = expires_in
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def __call__(self, request):
+        with self._lock:
+            self.requests.append(request)
+            count = len(self.requests)
+
+        time.sleep(0.05)  # Make concurrent token requests overlap.
+        return json_response({
+            'access_token': f'token-{count}',
+            'token_type': 'bearer',
+            'expires_in': self.expires_in
+        })
+
+
+@pytest.fixture(autouse=True)
+def token_managers(monkeypatch):
+    managers = {}
+    monkeypatch.setattr(seekret.apitest.auth.oauth2, '_token_managers', managers)
+    yield managers
+    for manager in managers.values():
+        manager.close()
+
+
+@pytest.fixture
+def token_endpoint(stand_in):
+    endpoint = TokenEndpoint()
+    stand_in.route('POST', '/oauth/token', endpoint)
+    return endpoint
+
+
+@pytest.fixture
+def auth_data(stand_in_server, tmp_path):
+    return {
+        'token_url': stand_in_server + 'oauth/token',
+        'client_id': 'my-client',
+        'client_secret': 'my-secret',
+        'scope': ['read', 'write'],
+        'cache_file': str(tmp_path / 'tokens.json'),
+    }
+
+
+def _authorize(auth) -> str:
+    return auth(requests.Request('GET', 'https://seekret.com').prepare()).headers['Authorization']
+
+
+def test_token_request(token_endpoint, auth_data):
+    assert _authorize(create_auth('oauth2_client_credentials', auth_data)) == 'Bearer token-1'
+
+    request = token_endpoint.requests[0]
+    form = dict(urllib.parse.parse_qsl(request.body.decode()))
+    assert form == {'grant_type': 'client_credentials', 'scope': 'read write'}
+    assert request.headers['Authorization'] == 'Basic ' + base64.b64encode(b'my-client:my-secret').decode()
+
+
+def test_client_credentials_in_form(token_endpoint, auth_data):
+    _authorize(create_auth('oauth2_client_credentials', dict(auth_data, client_auth='post')))
+
+    form = dict(urllib.parse.parse_qsl(token_endpoint.requests[0].body.decode()))
+    assert form['client_id'] == 'my-client'
+    assert form['client_secret'] == 'my-secret'
+
+
+def test_token_shared_between_handlers(token_endpoint, auth_data):
+    first = create_auth('oauth2_client_credentials', auth_data)
+    second = create_auth('oauth2_client_credentials', auth_data)
+
+    assert [_authorize(first), _authorize(second), _authorize(first)] == ['Bearer token-1'] * 3
+    assert len(token_endpoint.requests) == 1
+
+
+def test_concurrent_requests_fetch_once(token_endpoint, auth_data):
+    auth = create_auth('oauth2_client_credentials', auth_data)
+    threads = [threading.Thread(target=_authorize, args=(auth, )) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(token_endpoint.requests) == 1
+
+
+def test_token_shared_between_processes_through_file(token_endpoint, auth_data, token_managers):
+    _authorize(create_auth('oauth2_client_credentials', auth_data))
+
+    # Simulate another process, which has no tokens in memory.
+    for manager in token_managers.values():
+        manager.close()
+    token_managers.clear()
+
+    assert _authorize(create_auth('oauth2_client_credentials', auth_data)) == 'Bearer token-1'
+    assert len(token_endpoint.requests) == 1
+
+
+def test_token_refreshed_in_background(token_endpoint, auth_data):
+    token_endpoint.expires_in = 1
+    auth = create_auth('oauth2_client_credentials', dict(auth_data, refresh_margin=60))
+    assert _authorize(auth) == 'Bearer token-1'
+
+    # Short-lived tokens are refreshed half way through their lifetime, before they expire.
+    deadline = time.time() + 5
+    while _authorize(auth) == 'Bearer token-1' and time.time() < deadline:
+        time.sleep(0.05)
+
+    assert _authorize(auth) == 'Bearer token-2'
+    assert len(token_endpoint.requests) == 2
+
+
+def test_unused_token_not_refreshed(token_endpoint, auth_data, token_managers):
+    token_endpoint.expires_in = 2
+    auth = create_auth('oauth2_client_credentials', dict(auth_data, refresh_margin=60))
+    assert _authorize(auth) == 'Bearer token-1'
+
+    # The token is due for a refresh after a second, but wasn't used since it was issued.
+    time.sleep(1.3)
+    manager, = token_managers.values()
+    assert manager._refresh_timer is None
+    assert len(token_endpoint.requests) == 1
+
+    # Using the token again resumes refreshing it in the background.
+    assert _authorize(auth) == 'Bearer token-1'
+    deadline = time.time() + 5
+    while _authorize(auth) == 'Bearer token-1' and time.time() < deadline:
+        time.sleep(0.05)
+    assert _authorize(auth) == 'Bearer token-2'
+    assert len(token_endpoint.requests) == 2
+
+
+def test_session_close_stops_own_clients_only(token_endpoint, auth_data, token_managers):
+    def session(client_id):
+        auth = UserAuth(type='oauth2_client_credentials', data=dict(auth_data, client_id=client_id))
+        return Session(RunProfile(target_server=auth_data['token_url'], users={'default': User(auth=auth)}))
+
+    first, second = session('first-client'), session('second-client')
+    for s in (first, second):
+        _authorize(s._auth_handler('default'))
+    first_manager, second_manager = token_managers.values()
+
+    first.close()
+    assert first_manager._refresh_timer is None
+    assert second_manager._refresh_timer is not None
+    second.close()
+    assert second_manager._refresh_timer is None
+
+
+def test_clients_with_other_secrets_not_shared(token_endpoint, auth_data, tmp_path, monkeypatch):
+    # The default cache file, shared by the processes, is created in the temporary directory.
+    monkeypatch.setattr('tempfile.tempdir', str(tmp_path))
+    del auth_data['cache_file']
+
+    assert _authorize(create_auth('oauth2_client_credentials', auth_data)) == 'Bearer token-1'
+    assert _authorize(create_auth('oauth2_client_credentials', dict(auth_data,
+                                                                    client_secret='other-secret'))) == 'Bearer token-2'
+    assert _authorize(create_auth('oauth2_client_credentials', dict(auth_data, client_auth='post'))) == 'Bearer token-3'
+
+
+def test_token_endpoint_error(stand_in, auth_data):
+    stand_in.route('POST', '/oauth/token', lambda request: json_response({'error': 'invalid_client'}, status=401))
+
+    auth = create_auth('oauth2_client_credentials', auth_data)
+    with pytest.raises(OAuth2Error, match='status 401.*invalid_client'):
+        _authorize(auth)
+
+
+def test_missing_data():
+    with pytest.raises(ValueError, match='requires "token_url"'):
+        create_auth('oauth2_client_credentials', {'client_id': 'a', 'client_secret': 'b'})
@@ -0,0 +1,84 @@
+import json
+
+from seekret.apitest.benchmark.__main__ import main
+from seekret.apitest.benchmark.runner import BenchmarkEnvironment, BenchmarkResult, run_benchmarks, compare_results, \
+    save_results, load_results
+from seekret.apitest.benchmark.server import StandInServer
+
+
+def _result(name: str, seconds_per_op: float, peak_memory_bytes: int = 1000, overhead_per_op=None):
+    return BenchmarkResult(name=name,
+                           iterations=10,
+                           seconds_per_op=seconds_per_op,
+                           peak_memory_bytes=peak_memory_bytes,
+                           overhead_per_op=overhead_per_op)
+
+
+def test_run_benchmarks():
+    results = run_benchmarks(['resolve_path_params', 'request[1024]'], min_time=0.01, repeat=1, memory_iterations=1)
+
+    assert [result.name for result in results] == ['resolve_path_params', 'request[1024]']
+    assert all(result.seconds_per_op > 0 for result in results)
+    assert results[0].overhead_per_op is None
+    assert results[1].overhead_per_op is not None
+    assert results[1].overhead_per_op < results[1].seconds_per_op
+
+
+def test_sessions_keep_no_request_log():
+    with StandInServer() as server:
+        env = BenchmarkEnvironment(server)
+        try:
+            for session in (env.session, env.create_session()):
+                for _ in range(3):
+                    session.request('GET', '/items')
+                assert session.request_log.render() == ''
+        finally:
+            env.close()
+
+
+def test_save_and_load(tmp_path):
+    results = [_result('a', 0.5, overhead_per_op=0.1), _result('b', 0.25)]
+    save_results(results, str(tmp_path / 'results.json'))
+    assert load_results(str(tmp_path / 'results.json')) == results
+
+
+class TestCompareResults:
+    def test_within_threshold(self):
+        _, regressions = compare_results([_result('a', 1.2)], [_result('a', 1.0)], max_regression=0.25)
+        assert regressions == []
+
+    def test_slower(self):
+        report, regressions = compare_results([_result('a', 1.5), _result('b', 1.0)],
+                                              [_result('a', 1.0), _result('b', 1.0)],
+                                              max_regression=0.25)
+        assert regressions == ['a']
+        assert 'REGRESSION' in report
+
+    def test_more_memory(self):
+        _, regressions = compare_results([_result('a', 1.0, peak_memory_bytes=2000)], [_result('a', 1.0)],
+                                         max_regression=0.25)
+        assert regressions == ['a']
+
+    def test_more_overhead(self):
+        _, regressions = compare_results([_result('a', 1.0, overhead_per_op=0.2)],
+                                         [_result('a', 1.0, overhead_per_op=0.1)],
+                                         max_regression=0.25)
+        assert regressions == ['a']
+
+    def test_new_benchmark(self):
+        report, regressions = compare_results([_result('new', 1.0)], [], max_regression=0.25)
+        assert regressions == []
+        assert 'new' in report
+
+
+def test_main_fails_on_regression(tmp_path, capsys):
+    baseline = tmp_path / 'baseline.json'
+    baseline.write_text(json.dumps([{
+        'name': 'resolve_path_params',
+        'iterations': 1,
+        'seconds_per_op': 1e-12,
+        'peak_memory_bytes': 1,
+    }]))
+
+    assert main(['-k', 'resolve_path_params', '--min-time', '0.01', '--repeat', '1', '--compare', str(baseline)]) == 1
+    assert 'regressions: resolve_path_params' in capsys.readouterr().out
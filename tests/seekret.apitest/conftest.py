@@ -0,0 +1,22 @@
+import pytest
+
+from seekret.apitest.benchmark.server import StandInServer
+
+
+@pytest.fixture(scope='session')
+def stand_in():
+    """
+    Local HTTP server standing in for the target server.
+    """
+
+    with StandInServer() as server:
+        yield server
+
+
+@pytest.fixture(scope='session')
+def stand_in_server(stand_in):
+    """
+    Base URL of the stand-in server.
+    """
+
+    return stand_in.url
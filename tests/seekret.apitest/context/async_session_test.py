@@ -0,0 +1,135 @@
+import asyncio
+import time
+
+import pytest
+
+from seekret.apitest.context import Context, Session
+from seekret.apitest.context.listener import SessionListener, RequestRecord
+from seekret.apitest.context.response import ResponseWrapper
+from seekret.apitest.context.session import _TimedAuth
+from seekret.apitest.runprofile import RunProfile, User, UserAuth
+
+
+@pytest.fixture
+def session(stand_in_server) -> Session:
+    session = Session(
+        RunProfile(target_server=stand_in_server,
+                   users={
+                       'default':
+                       User(auth=UserAuth(type='bearer',
+                                          data={'token': 'abcd'}))
+                   }))
+    yield session
+    session.close()
+
+
+class TestAsyncSession:
+    def test_request(self, session):
+        response = asyncio.run(
+            session.async_session.request('POST',
+                                          '/api/{item}',
+                                          json={'a': 1},
+                                          path_params={'item': 'x'},
+                                          query={'q': 'v'},
+                                          user='default'))
+
+        assert isinstance(response, ResponseWrapper)
+        assert response.status_code == 200
+        assert response.search('json.method') == 'POST'
+        assert response.search('json.path') == '/api/x?q=v'
+        assert response.search('json.body') == '{"a":1}'
+        assert response.search(
+            "json.headers.Authorization") == 'Bearer abcd'
+        assert response.search(
+            'headers."Content-Type"') == 'application/json'
+
+    def test_concurrent_requests(self, session):
+        async def main():
+            return await asyncio.gather(*[
+                session.async_session.request(
+                    'GET', '/api/{i}', path_params={'i': i})
+                for i in range(20)
+            ])
+
+        responses = asyncio.run(main())
+        assert [r.search('json.path') for r in responses
+                ] == [f'/api/{i}' for i in range(20)]
+
+    def test_usable_from_multiple_event_loops(self, session):
+        for _ in range(2):
+            response = asyncio.run(
+                session.async_session.request('GET', '/api'))
+            assert response.status_code == 200
+
+
+class _SlowAuth(object):
+    def __init__(self, delay: float):
+        self.delay = delay
+
+    def __call__(self, request):
+        # Blocks like fetching an OAuth2 token.
+        time.sleep(self.delay)
+        request.headers['Authorization'] = 'Bearer slow'
+        return request
+
+
+class _Records(SessionListener):
+    def __init__(self):
+        self.records: list[RequestRecord] = []
+
+    def request_finished(self, record: RequestRecord):
+        self.records.append(record)
+
+
+class TestBlockingAuth:
+    def test_auth_does_not_block_event_loop(self, session):
+        session._auths['default'] = _TimedAuth(_SlowAuth(0.3))
+        ticks = []
+
+        async def ticker():
+            for _ in range(5):
+                ticks.append(time.perf_counter())
+                await asyncio.sleep(0.02)
+
+        async def main():
+            return await asyncio.gather(session.async_session.request('GET', '/api', user='default'), ticker())
+
+        start = time.perf_counter()
+        response, _ = asyncio.run(main())
+        assert response.search('json.headers.Authorization') == 'Bearer slow'
+        # The loop kept running while the auth handler blocked.
+        assert ticks[-1] - start < 0.3
+
+    def test_timings_of_concurrent_requests(self, session):
+        session._auths['default'] = _TimedAuth(_SlowAuth(0.2))
+        records = _Records()
+        session.add_listener(records)
+
+        async def main():
+            await asyncio.gather(*[session.async_session.request('GET', '/api', user='default') for _ in range(2)])
+
+        asyncio.run(main())
+        # Each request is timed separately, even though the requests share the thread of the event loop.
+        assert [0.2 <= record.timings.auth < 0.35 for record in records.records] == [True, True]
+
+
+class TestAsyncStage:
+    def test_async_stage(self, session):
+        context = Context(session, scope='function')
+
+        async def main():
+            async with context.stage(method='PUT',
+                                     path='/api/{id}') as request:
+                return await request({'b': 2}, path_params={'id': 7})
+
+        response = asyncio.run(main())
+        assert response.search('json.method') == 'PUT'
+        assert response.search('json.path') == '/api/7'
+        assert response.search(
+            "json.headers.Authorization") == 'Bearer abcd'
+        assert context._current_stage_index == 2
+
+    def test_sync_stage_still_supported(self, session):
+        context = Context(session, scope='function')
+        with context.stage(method='GET', path='/api') as request:
+            assert request().search('json.method') == 'GET'
@@ -0,0 +1,194 @@
+import itertools
+import time
+import uuid
+
+import pytest
+import requests
+
+from seekret.apitest.benchmark.server import json_response
+from seekret.apitest.context import Context
+from seekret.apitest.context.cache import ResponseCache
+from seekret.apitest.context.listener import SessionListener
+from seekret.apitest.context.session import Session
+from seekret.apitest.runprofile import RunProfile, User, UserAuth
+
+pytest_plugins = ['pytester']
+
+
+class _Records(SessionListener):
+    def __init__(self):
+        self.records = []
+
+    def request_finished(self, record):
+        self.records.append(record)
+
+
+@pytest.fixture
+def base_path():
+    # The stand-in server is shared by all tests, so each test uses its own paths.
+    return f'/api/{uuid.uuid4().hex}'
+
+
+@pytest.fixture
+def counter(stand_in, base_path):
+    """
+    Count the requests to the paths under the base path, and respond with the count.
+    """
+    count = itertools.count(1)
+
+    def respond(request):
+        return json_response({'count': next(count)})
+
+    for path in (base_path, f'{base_path}/items', f'{base_path}/items/1', f'{base_path}/other'):
+        for method in ('GET', 'HEAD'):
+            stand_in.route(method, path, respond)
+    stand_in.route('GET', f'{base_path}/missing', lambda request: json_response({'count': next(count)}, status=404))
+
+
+@pytest.fixture
+def session(stand_in_server):
+    users = {name: User(auth=UserAuth(type='bearer', data={'token': name})) for name in ('default', 'other')}
+    session = Session(RunProfile(target_server=stand_in_server, users=users), response_cache=ResponseCache())
+    session.add_listener(_Records())
+    yield session
+    session.close()
+
+
+def _count(session, path, **kwargs):
+    return session.request('GET', path, **kwargs).search('json.count')
+
+
+@pytest.mark.usefixtures('counter')
+class TestSessionResponseCache:
+    def test_cached(self, session, base_path):
+        assert _count(session, f'{base_path}/items') == 1
+        assert _count(session, f'{base_path}/items') == 1
+        assert [record.cached for record in session.listeners[0].records] == [False, True]
+        assert session.response_cache.hits == 1
+
+    def test_key_includes_user_query_and_headers(self, session, base_path):
+        path = f'{base_path}/items'
+        assert _count(session, path, user='default') == 1
+        assert _count(session, path, user='other') == 2
+        assert _count(session, path, user=None) == 3
+        assert _count(session, path, user=None, query={'page': 2}) == 4
+        assert _count(session, path, user=None, headers={'Accept': 'text/plain'}) == 5
+        assert _count(session, path, user='default') == 1
+
+    def test_key_includes_explicit_credentials(self, session, base_path):
+        path = f'{base_path}/items'
+        assert _count(session, path, user=None, headers={'Authorization': 'Bearer first'}) == 1
+        assert _count(session, path, user=None, headers={'Authorization': 'Bearer second'}) == 2
+        assert _count(session, path, user=None, headers={'X-Api-Key': 'first'}) == 3
+        assert _count(session, path, user=None, headers={'authorization': 'Bearer first'}) == 1
+
+    def test_head_cached_separately(self, session, base_path):
+        assert _count(session, f'{base_path}/items') == 1
+        assert session.request('HEAD', f'{base_path}/items').status_code == 200
+        assert session.request('HEAD', f'{base_path}/items').status_code == 200
+        assert session.response_cache.hits == 1
+        assert session.response_cache.misses == 2
+
+    def test_error_responses_not_cached(self, session, base_path):
+        assert _count(session, f'{base_path}/missing') == 1
+        assert _count(session, f'{base_path}/missing') == 2
+
+    def test_cache_disabled_for_request(self, session, base_path):
+        assert _count(session, f'{base_path}/items') == 1
+        assert _count(session, f'{base_path}/items', cache=False) == 2
+
+    def test_cache_disabled_for_context(self, session, base_path):
+        context = Context(session, scope='function')
+        context.use_response_cache = False
+        assert context.request('GET', f'{base_path}/items').search('json.count') == 1
+        assert context.request('GET', f'{base_path}/items').search('json.count') == 2
+
+    def test_unsafe_method_invalidates_related_paths(self, session, base_path):
+        paths = [base_path, f'{base_path}/items', f'{base_path}/items/1', f'{base_path}/other']
+        for path in paths:
+            _count(session, path)
+
+        session.request('DELETE', f'{base_path}/items')
+
+        cached = {path: session.response_cache.get(session._prepare_request('GET', path), None) is not None
+                  for path in paths}
+        assert cached == {
+            base_path: False,
+            f'{base_path}/items': False,
+            f'{base_path}/items/1': False,
+            f'{base_path}/other': True
+        }
+
+    def test_cached_response_copied(self, session, base_path):
+        session.request('GET', f'{base_path}/items').headers['X-Modified'] = '1'
+        response = session.request('GET', f'{base_path}/items')
+        assert session.listeners[0].records[-1].cached
+        assert 'X-Modified' not in response.headers
+
+
+def _request(url, method='GET'):
+    return requests.Request(method, url).prepare()
+
+
+def _response(status=200, **headers):
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers)
+    response._content = b'{}'
+    return response
+
+
+class TestResponseCache:
+    def test_expired(self):
+        cache = ResponseCache(ttl=0.05)
+        cache.put(_request('https://s.com/a'), None, _response())
+        assert cache.get(_request('https://s.com/a'), None) is not None
+        time.sleep(0.1)
+        assert cache.get(_request('https://s.com/a'), None) is None
+        assert len(cache) == 0
+
+    def test_least_recently_used_evicted(self):
+        cache = ResponseCache(max_entries=2)
+        for path in ('a', 'b'):
+            cache.put(_request(f'https://s.com/{path}'), None, _response())
+        cache.get(_request('https://s.com/a'), None)
+        cache.put(_request('https://s.com/c'), None, _response())
+
+        assert cache.get(_request('https://s.com/a'), None) is not None
+        assert cache.get(_request('https://s.com/b'), None) is None
+        assert cache.get(_request('https://s.com/c'), None) is not None
+
+    def test_no_store_not_cached(self):
+        cache = ResponseCache()
+        cache.put(_request('https://s.com/a'), None, _response(**{'Cache-Control': 'no-store'}))
+        assert len(cache) == 0
+
+    def test_unsafe_methods_not_cached(self):
+        cache = ResponseCache()
+        cache.put(_request('https://s.com/a', method='POST'), None, _response())
+        assert len(cache) == 0
+
+
+def test_marker_disables_cache(pytester, stand_in, stand_in_server, base_path):
+    count = itertools.count(1)
+    stand_in.route('GET', base_path, lambda request: json_response({'count': next(count)}))
+    pytester.makefile('.yaml', **{'run-profile': f'target_server: {stand_in_server}\nusers: {{}}\n'})
+    pytester.makepyfile(test_api=f"""
+        import pytest
+
+        def count(seekret):
+            return seekret.request('GET', '{base_path}', user=None).search('json.count')
+
+        def test_first(seekret):
+            assert count(seekret) == 1
+
+        def test_cached(seekret):
+            assert count(seekret) == 1
+
+        @pytest.mark.no_response_cache
+        def test_not_cached(seekret):
+            assert count(seekret) == 2
+    """)
+
+    result = pytester.runpytest('-p', 'seekret.apitest.pytest_plugin', '--seekret-response-cache')
+    result.assert_outcomes(passed=3)
@@ -0,0 +1,126 @@
+import unittest.mock as mock
+
+import pytest
+from requests.adapters import HTTPAdapter
+
+from seekret.apitest.benchmark.server import json_response
+from seekret.apitest.context.cassette import Cassette, CassetteMissError, MatchRules, INDEX_FILE_NAME
+from seekret.apitest.context.session import Session
+from seekret.apitest.runprofile import RunProfile, User, UserAuth
+
+
+def _session(target_server, cassette) -> Session:
+    return Session(RunProfile(target_server=target_server,
+                              users={'default': User(auth=UserAuth(type='bearer', data={'token': 'secret-token'}))}),
+                   cassette=cassette)
+
+
+@pytest.fixture
+def record(stand_in_server, tmp_path):
+    """
+    Record requests to the stand-in server using the given function, and return the path of the cassette.
+    """
+    def record(function, rules=None):
+        session = _session(stand_in_server, Cassette(str(tmp_path), mode='record', rules=rules))
+        try:
+            function(session)
+        finally:
+            session.close()
+        return str(tmp_path)
+
+    return record
+
+
+def no_network():
+    return mock.patch.object(HTTPAdapter, 'send', side_effect=AssertionError('network used in replay mode'))
+
+
+def test_replay(record, stand_in_server):
+    path = record(lambda session: session.request('POST', '/api/items', json={'name': 'a'}, user='default'))
+
+    with no_network():
+        session = _session(stand_in_server, Cassette(path))
+        response = session.request('POST', '/api/items', json={'name': 'a'}, user='default')
+
+    assert response.status_code == 200
+    assert response.search('json.method') == 'POST'
+    assert response.search('json.body') == '{"name":"a"}'
+    assert response.search('headers."Content-Type"') == 'application/json'
+
+
+def test_different_body_not_matched(record, stand_in_server):
+    path = record(lambda session: session.request('POST', '/api/items', json={'name': 'a'}))
+
+    with no_network():
+        session = _session(stand_in_server, Cassette(path))
+        with pytest.raises(CassetteMissError):
+            session.request('POST', '/api/items', json={'name': 'b'})
+
+
+def test_repeated_requests_replayed_in_order(record, stand_in, stand_in_server):
+    counter = iter(range(100))
+    stand_in.route('GET', '/api/counter', lambda request: json_response({'value': next(counter)}))
+
+    def send_three(session):
+        for _ in range(3):
+            session.request('GET', '/api/counter')
+
+    path = record(send_three)
+
+    with no_network():
+        session = _session(stand_in_server, Cassette(path))
+        values = [session.request('GET', '/api/counter').search('json.value') for _ in range(4)]
+        assert values == [0, 1, 2, 2]
+
+
+def test_authorization_not_stored_or_matched(record, stand_in_server, tmp_path):
+    path = record(lambda session: session.request('GET', '/api/items', user='default'))
+    assert 'secret-token' not in (tmp_path / INDEX_FILE_NAME).read_text()
+
+    # Replay with an unauthenticated request, which has no Authorization header at all.
+    with no_network():
+        session = _session(stand_in_server, Cassette(path))
+        assert session.request('GET', '/api/items').status_code == 200
+
+
+def test_match_headers(record, stand_in_server):
+    rules = MatchRules(match_headers=('Accept', ))
+    path = record(lambda session: session.request('GET', '/api/items', headers={'Accept': 'application/json'}),
+                  rules=rules)
+
+    with no_network():
+        session = _session(stand_in_server, Cassette(path, rules=rules))
+        assert session.request('GET', '/api/items', headers={'Accept': 'application/json'}).status_code == 200
+        with pytest.raises(CassetteMissError):
+            session.request('GET', '/api/items', headers={'Accept': 'text/plain'})
+
+
+def test_ignore_query_params(record, stand_in_server):
+    rules = MatchRules(ignore_query_params=('ts', ))
+    path = record(lambda session: session.request('GET', '/api/items', query={'ts': 1, 'limit': 10}), rules=rules)
+
+    with no_network():
+        session = _session(stand_in_server, Cassette(path, rules=rules))
+        assert session.request('GET', '/api/items', query={'ts': 2, 'limit': 10}).status_code == 200
+        with pytest.raises(CassetteMissError):
+            session.request('GET', '/api/items', query={'ts': 1, 'limit': 20})
+
+
+def test_streamed_replay(record, stand_in_server):
+    path = record(lambda session: session.request('GET', '/payload/1048576'))
+
+    with no_network():
+        session = _session(stand_in_server, Cassette(path))
+        response = session.request('GET', '/payload/1048576', stream=['json[10].id'])
+        assert response.search('json[10].id') == 10
+
+
+def test_missing_cassette(stand_in_server, tmp_path):
+    session = _session(stand_in_server, Cassette(str(tmp_path / 'missing')))
+    with pytest.raises(CassetteMissError, match='does not exist'):
+        session.request('GET', '/api/items')
+
+
+def test_invalid_mode(tmp_path):
+    with pytest.raises(ValueError):
+        Cassette(str(tmp_path), mode='rewind')
@@ -0,0 +1,104 @@
+import gc
+import io
+import json
+import os
+import uuid
+
+import pytest
+import requests
+from requests import Response
+
+from seekret.apitest.benchmark.server import json_response
+from seekret.apitest.context import Context
+from seekret.apitest.context.compact import ResponseStore
+from seekret.apitest.context.response import ResponseWrapper
+from seekret.apitest.context.session import Session
+from seekret.apitest.runprofile import RunProfile
+
+
+def make_response(content: bytes, status_code: int = 200) -> Response:
+    response = Response()
+    response.status_code = status_code
+    response.reason = 'OK'
+    response.url = 'https://seekret.com/api/items'
+    response.headers['Content-Type'] = 'application/json'
+    response.raw = io.BytesIO(content)
+    return response
+
+
+class TestResponseStore:
+    def test_json_kept_parsed(self):
+        store = ResponseStore()
+        wrapper = ResponseWrapper(make_response(b'{"items": [1, 2]}'))
+        wrapper.compact(store)
+
+        assert wrapper.compacted
+        assert wrapper.status_code == 200
+        assert wrapper.ok
+        assert wrapper.headers['content-type'] == 'application/json'
+        assert wrapper.search('json.items[1]') == 2
+        assert wrapper.json() == {'items': [1, 2]}
+        assert json.loads(wrapper.content) == {'items': [1, 2]}
+        assert store.retained_bytes == 17
+
+    def test_text_body_kept(self):
+        wrapper = ResponseWrapper(make_response(b'not json'))
+        wrapper.compact(ResponseStore())
+        assert wrapper.text == 'not json'
+
+    def test_raw_response_dropped(self):
+        wrapper = ResponseWrapper(make_response(b'{}'))
+        wrapper.compact(ResponseStore())
+        with pytest.raises(AttributeError, match="'raw' is not kept"):
+            _ = wrapper.raw
+
+    def test_raise_for_status(self):
+        wrapper = ResponseWrapper(make_response(b'{}', status_code=404))
+        wrapper.compact(ResponseStore())
+        with pytest.raises(requests.HTTPError, match='404 Client Error'):
+            wrapper.raise_for_status()
+
+    def test_spilled_over_cap(self):
+        store = ResponseStore(max_bytes=30)
+        first = ResponseWrapper(make_response(b'{"value": "0123456789"}'))
+        second = ResponseWrapper(make_response(b'{"value": "abcdefghij"}'))
+        first.compact(store)
+        second.compact(store)
+
+        # The first body fits in the cap, the second does not.
+        assert not first._response.spilled
+        assert second._response.spilled
+        assert store.retained_bytes == 23
+        assert store.spilled_bytes == 23
+        assert second.search('json.value') == 'abcdefghij'
+        store.close()
+
+    def test_released_when_collected(self):
+        store = ResponseStore(max_bytes=10)
+        wrapper = ResponseWrapper(make_response(b'{"value": "0123456789"}'))
+        wrapper.compact(store)
+        path = wrapper._response._path
+        assert os.path.exists(path)
+
+        del wrapper
+        gc.collect()
+        assert store.spilled_bytes == 0
+        assert not os.path.exists(path)
+        store.close()
+
+
+def test_stage_responses_compacted(stand_in, stand_in_server):
+    path = f'/api/{uuid.uuid4().hex}'
+    stand_in.route('GET', path, lambda request: json_response({'id': 1}))
+    session = Session(RunProfile(target_server=stand_in_server, users={}), response_store=ResponseStore())
+    context = Context(session, scope='function')
+
+    with context.stage('GET', path) as request:
+        response = request(user=None)
+        assert not response.compacted
+
+    assert response.compacted
+    assert response.search('json.id') == 1
+    # The request log refers to the compacted response, and still renders it.
+    assert '"id": 1' in session.request_log.render()
+    session.close()
@@ -0,0 +1,60 @@
+import time
+
+import pytest
+
+from seekret.apitest.context import Context, Session
+from seekret.apitest.context.requestlog import _log_and_print
+from seekret.apitest.runprofile import RunProfile
+
+
+@pytest.fixture
+def context(stand_in_server) -> Context:
+    session = Session(RunProfile(target_server=stand_in_server, users={}))
+    yield Context(session, scope='function')
+    session.close()
+
+
+class TestGather:
+    def test_responses_returned_in_order(self, context):
+        with context.stage(method='GET', path='/api/{i}') as request:
+            responses = context.gather(
+                request.defer(path_params={'i': i}, user=None)
+                for i in range(10))
+
+        assert [r.search('json.path')
+                for r in responses] == [f'/api/{i}' for i in range(10)]
+
+    def test_output_grouped_per_request(self, context, capsys):
+        def make_request(i):
+            def request():
+                _log_and_print(20, f'start {i}')
+                time.sleep(0.05 * (3 - i))
+                _log_and_print(20, f'end {i}')
+
+            return request
+
+        context.gather(make_request(i) for i in range(3))
+
+        assert capsys.readouterr().out.splitlines() == [
+            'start 0', 'end 0', 'start 1', 'end 1', 'start 2', 'end 2'
+        ]
+
+    def test_first_error_in_order_raised(self, context):
+        class _Error(Exception):
+            pass
+
+        def make_request(i, delay):
+            def request():
+                time.sleep(delay)
+                raise _Error(i)
+
+            return request
+
+        with pytest.raises(_Error) as e:
+            context.gather([
+                lambda: None,
+                make_request(1, 0.1),
+                make_request(2, 0),
+            ])
+
+        assert e.value.args == (1, )
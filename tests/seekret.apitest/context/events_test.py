@@ -0,0 +1,105 @@
+import gzip
+import json
+import threading
+
+from seekret.apitest.context import Context
+from seekret.apitest.context.events import EventWriter, EventLogListener
+from seekret.apitest.context.session import Session
+from seekret.apitest.runprofile import RunProfile
+
+
+def _read_events(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+class TestEventWriter:
+    def test_events_written_in_order(self, tmp_path):
+        path = tmp_path / 'events.ndjson'
+        writer = EventWriter(str(path), batch_size=7)
+        for i in range(100):
+            writer.emit({'event': 'test', 'index': i})
+        writer.close()
+
+        assert [event['index'] for event in _read_events(path)] == list(range(100))
+
+    def test_appends_to_existing_file(self, tmp_path):
+        path = tmp_path / 'events.ndjson'
+        for i in range(2):
+            writer = EventWriter(str(path))
+            writer.emit({'index': i})
+            writer.close()
+
+        assert _read_events(path) == [{'index': 0}, {'index': 1}]
+
+    def test_rotation(self, tmp_path):
+        path = tmp_path / 'events.ndjson'
+        writer = EventWriter(str(path), max_bytes=100, backups=2, batch_size=1)
+        for i in range(20):
+            writer.emit({'event': 'test', 'index': i, 'padding': 'x' * 20})
+        writer.close()
+
+        assert sorted(p.name for p in tmp_path.iterdir()) == [
+            'events.ndjson', 'events.ndjson.1', 'events.ndjson.2'
+        ]
+        # The newest events are kept, in order across the files.
+        indexes = [event['index'] for name in ('events.ndjson.2', 'events.ndjson.1', 'events.ndjson')
+                   for event in _read_events(tmp_path / name)]
+        assert indexes == list(range(20 - len(indexes), 20))
+
+    def test_compressed_rotation(self, tmp_path):
+        path = tmp_path / 'events.ndjson'
+        writer = EventWriter(str(path), max_bytes=100, compress=True, batch_size=1)
+        for i in range(5):
+            writer.emit({'event': 'test', 'index': i, 'padding': 'x' * 20})
+        writer.close()
+
+        with gzip.open(tmp_path / 'events.ndjson.1.gz', 'rt') as f:
+            assert [json.loads(line)['index'] for line in f]
+
+    def test_full_queue_drops_events(self, tmp_path):
+        path = tmp_path / 'events.ndjson'
+        writer = EventWriter(str(path), queue_size=1)
+        # Block the writer thread, so the queue fills up.
+        blocked = threading.Event()
+        original_write = writer._write
+        writer._write = lambda batch: (blocked.wait(), original_write(batch))
+
+        for i in range(50):
+            writer.emit({'index': i})
+        assert writer.dropped > 0
+        blocked.set()
+        writer.close()
+
+        events = _read_events(path)
+        dropped = [event['count'] for event in events if event.get('event') == 'events_dropped']
+        assert sum(dropped) == writer.dropped
+        assert len(events) - len(dropped) + writer.dropped == 50
+
+
+def test_events_correlated_to_stage(tmp_path, stand_in_server):
+    path = tmp_path / 'events.ndjson'
+    writer = EventWriter(str(path))
+    session = Session(RunProfile(target_server=stand_in_server, users={}))
+    session.add_listener(EventLogListener(writer))
+    context = Context(session, scope='function', nodeid='test_api.py::test_items')
+
+    with context.stage('GET', '/api/items') as request:
+        request(user=None)
+    with context.stage('GET', '/api/items/{id}') as request:
+        context.gather(request.defer(user=None, path_params={'id': i}) for i in range(3))
+    session.request('GET', '/api/items')
+    writer.close()
+    session.close()
+
+    events = [(e['event'], e['nodeid'], e['stage'], e.get('status_code')) for e in _read_events(path)]
+    assert events == [
+        ('stage_started', 'test_api.py::test_items', 1, None),
+        ('request', 'test_api.py::test_items', 1, 200),
+        ('stage_finished', 'test_api.py::test_items', 1, None),
+        ('stage_started', 'test_api.py::test_items', 2, None),
+        *[('request', 'test_api.py::test_items', 2, 200)] * 3,
+        ('stage_finished', 'test_api.py::test_items', 2, None),
+        # Sent outside of a stage.
+        ('request', None, None, 200),
+    ]
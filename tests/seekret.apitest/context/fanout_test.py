@@ -0,0 +1,124 @@
+import asyncio
+import uuid
+
+import pytest
+
+from seekret.apitest.benchmark.server import json_response
+from seekret.apitest.context import Context
+from seekret.apitest.context.fanout import FanOutListener, FanOutResult, TargetResult
+from seekret.apitest.context.session import Session
+from seekret.apitest.runprofile import RunProfile
+
+
+@pytest.fixture
+def path(stand_in):
+    # The "eu" target is the stand-in server under another host name, and responds with another region.
+    path = f'/api/{uuid.uuid4().hex}'
+    stand_in.route('GET', path, lambda request: json_response({
+        'id': 1,
+        'region': 'eu' if request.headers['Host'].startswith('localhost') else 'us'
+    }))
+    return path
+
+
+@pytest.fixture
+def session(stand_in_server):
+    session = Session(RunProfile(target_server=stand_in_server,
+                                 users={},
+                                 targets={'eu': stand_in_server.replace('127.0.0.1', 'localhost')}))
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def results(session):
+    results = []
+    session.add_listener(FanOutListener(results.append))
+    return results
+
+
+def test_stage_sent_to_all_targets(session, results, path):
+    context = Context(session, scope='function', nodeid='test_api.py::test_region')
+
+    with context.stage('GET', path) as request:
+        response = request(user=None)
+        assert response.search('json.region') == 'us'
+        assert response.search('json.id') == 1
+        # Compared when the stage ends.
+        assert results == []
+
+    [result] = results
+    assert result.stage.nodeid == 'test_api.py::test_region'
+    assert [(r.target, r.status_code, r.values) for r in result.results] == [
+        ('primary', 200, {'json.region': 'us', 'json.id': 1}),
+        ('eu', 200, {'json.region': 'eu', 'json.id': 1}),
+    ]
+    assert result.differences(latency_ratio=1000) == [('eu', 'json.region is "eu", primary "us"')]
+
+
+def test_search_after_stage_not_compared(session, results, path):
+    context = Context(session, scope='function')
+
+    with context.stage('GET', path) as request:
+        response = request(user=None)
+        assert response.search('json.id') == 1
+
+    # The responses were compared when the stage ended.
+    assert response.search('json.region') == 'us'
+    [result] = results
+    assert [r.values for r in result.results] == [{'json.id': 1}, {'json.id': 1}]
+    assert result.differences(latency_ratio=1000) == []
+
+
+def test_failing_target_does_not_fail_stage(stand_in_server, path):
+    session = Session(RunProfile(target_server=stand_in_server, users={}, targets={'down': 'http://127.0.0.1:1/'}))
+    results = []
+    session.add_listener(FanOutListener(results.append))
+    context = Context(session, scope='function')
+
+    with context.stage('GET', path) as request:
+        assert request(user=None).status_code == 200
+
+    [result] = results
+    assert result.results[1].status_code is None
+    assert 'ConnectionError' in result.results[1].error
+    assert [target for target, _ in result.differences(latency_ratio=1000)] == ['down', 'down']
+    session.close()
+
+
+def test_fan_out_disabled(session, results, path):
+    context = Context(session, scope='function')
+    context.fan_out = False
+
+    with context.stage('GET', path) as request:
+        request(user=None)
+    assert results == []
+
+
+def test_async_stage(session, results, path):
+    pytest.importorskip('aiohttp')
+    context = Context(session, scope='function')
+
+    async def run():
+        async with context.stage('GET', path) as request:
+            response = await request(user=None)
+            assert response.search('json.region') == 'us'
+
+    asyncio.run(run())
+    [result] = results
+    assert [r.values['json.region'] for r in result.results] == ['us', 'eu']
+
+
+@pytest.mark.parametrize('primary, other, flagged', [
+    (0.1, 0.1, False),
+    (0.1, 0.3, True),
+    (0.3, 0.1, True),
+    # Small differences are never flagged.
+    (0.001, 0.01, False),
+])
+def test_latency_differences(primary, other, flagged):
+    result = FanOutResult(method='GET', path='/api/items', stage=None, results=(
+        TargetResult('primary', 200, primary),
+        TargetResult('eu', 200, other),
+    ))
+    assert bool(result.differences(latency_ratio=2)) == flagged
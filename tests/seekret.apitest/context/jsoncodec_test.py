@@ -0,0 +1,161 @@
+import dataclasses
+import datetime
+import enum
+import json
+import unittest.mock as mock
+import uuid
+
+import pytest
+from requests import Response
+
+from seekret.apitest.context import jsoncodec
+from seekret.apitest.context.jsoncodec import available_codecs, create_codec, set_codec, get_codec, \
+    decode_response_json, StdlibJsonCodec, JsonCodec
+
+VALUES = [
+    {'name': 'item', 'tags': ['a', 'b'], 'nested': {'value': 1.5, 'flag': True, 'empty': None}},
+    [1, -2, 3.25, 'text', False],
+    'unicode שלום \U0001f600',
+    {'escapes': 'quote " backslash \\ newline \n tab \t'},
+    [],
+    {},
+]
+
+
+# Values the codecs must encode exactly as the standard library does.
+PARITY_VALUES = [
+    [1e16, -2.5e100, 1e-5, 5e-324, 1e15, 0.1 + 0.2, 0.0, -0.0],
+    {1e16: 'a', 1.5: 'b', True: 'c', None: 'd', 2: 'e'},
+]
+
+
+class Color(enum.Enum):
+    RED = 'red'
+
+
+class Size(enum.IntEnum):
+    SMALL = 1
+
+
+@dataclasses.dataclass
+class Point(object):
+    x: int
+
+
+# Values the standard library rejects, and so must the codecs.
+REJECTED_VALUES = [
+    uuid.UUID(int=1),
+    Color.RED,
+    {Color.RED: 1},
+    datetime.date(2024, 1, 1),
+    Point(x=1),
+    {'nested': [{'id': uuid.UUID(int=1)}]},
+]
+
+
+@pytest.fixture(params=available_codecs())
+def codec(request):
+    return create_codec(request.param)
+
+
+@pytest.fixture
+def restore_codec():
+    previous = jsoncodec._codec
+    yield
+    jsoncodec._codec = previous
+
+
+class TestCodecs:
+    @pytest.mark.parametrize('value', VALUES)
+    def test_same_as_stdlib(self, codec, value):
+        encoded = codec.dumps(value)
+        assert encoded == json.dumps(value, separators=(',', ':'), ensure_ascii=False).encode()
+        assert codec.loads(encoded) == value
+        assert codec.loads(encoded.decode()) == value
+        assert codec.pretty(value) == json.dumps(value, indent=2, ensure_ascii=False)
+
+    @pytest.mark.parametrize('value', PARITY_VALUES + [Size.SMALL, {'size': [Size.SMALL]}])
+    def test_same_as_stdlib_edge_cases(self, codec, value):
+        assert codec.dumps(value) == json.dumps(value, separators=(',', ':'), ensure_ascii=False).encode()
+        assert codec.pretty(value) == json.dumps(value, indent=2, ensure_ascii=False)
+
+    @pytest.mark.parametrize('value', REJECTED_VALUES)
+    def test_rejected_as_stdlib(self, codec, value):
+        with pytest.raises(TypeError):
+            json.dumps(value)
+        with pytest.raises(TypeError):
+            codec.dumps(value)
+        with pytest.raises(TypeError):
+            codec.pretty(value)
+
+    def test_large_integers(self, codec):
+        value = {'id': 2**70}
+        assert codec.loads(codec.dumps(value)) == value
+
+    def test_non_string_keys(self, codec):
+        assert codec.dumps({1: 'a', None: 'b'}) == b'{"1":"a","null":"b"}'
+        with pytest.raises(TypeError):
+            codec.dumps({(1, 2): 'a'})
+
+    def test_unsupported_value(self, codec):
+        with pytest.raises(TypeError):
+            codec.dumps({'value': object()})
+
+    @pytest.mark.parametrize('value', [float('nan'), {'a': [None, float('inf')]}])
+    def test_non_finite_floats(self, codec, value):
+        with pytest.raises(ValueError):
+            codec.dumps(value)
+
+    def test_nan_body(self, codec):
+        value = codec.loads(b'{"a": NaN}')
+        assert codec.pretty(value) == '{\n  "a": NaN\n}'
+
+    @pytest.mark.parametrize('data', [b'{"a": ', b'not json', b'\xff\xfe'])
+    def test_invalid_json(self, codec, data):
+        with pytest.raises(json.JSONDecodeError):
+            codec.loads(data)
+
+
+class TestSelection:
+    def test_interface_is_abstract(self):
+        with pytest.raises(TypeError):
+            JsonCodec()
+
+    def test_auto_prefers_orjson(self):
+        assert create_codec('auto').name == available_codecs()[0]
+
+    def test_stdlib_always_available(self):
+        assert 'stdlib' in available_codecs()
+
+    def test_unknown_codec(self):
+        with pytest.raises(ValueError, match='unknown JSON codec'):
+            create_codec('simplejson')
+
+    def test_codec_not_installed(self):
+        with mock.patch.dict('sys.modules', {'orjson': None}):
+            assert available_codecs() == ['stdlib']
+            with pytest.raises(ValueError, match='not installed'):
+                create_codec('orjson')
+
+    def test_set_codec(self, restore_codec):
+        set_codec('stdlib')
+        assert get_codec().name == 'stdlib'
+
+        codec = StdlibJsonCodec()
+        set_codec(codec)
+        assert get_codec() is codec
+
+
+class TestDecodeResponseJson:
+    def make_response(self, content: bytes, encoding=None) -> Response:
+        response = Response()
+        response._content = content
+        response.encoding = encoding
+        return response
+
+    def test_utf8(self):
+        assert decode_response_json(self.make_response('{"a": "ש"}'.encode(), 'utf-8')) == {'a': 'ש'}
+
+    def test_other_charset(self):
+        response = self.make_response('{"a": "é"}'.encode('latin-1'), 'ISO-8859-1')
+        assert decode_response_json(response) == {'a': 'é'}
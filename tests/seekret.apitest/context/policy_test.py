@@ -0,0 +1,187 @@
+import asyncio
+import itertools
+import socket
+import threading
+import time
+import uuid
+
+import pytest
+import requests
+
+from seekret.apitest.benchmark.server import json_response
+from seekret.apitest.context import Context
+from seekret.apitest.context.policy import PolicyRunner, MIN_HEDGE_SAMPLES
+from seekret.apitest.context.session import Session
+from seekret.apitest.runprofile import RunProfile, RequestPolicy
+
+
+@pytest.fixture
+def path():
+    # The stand-in server is shared by all tests, so each test uses its own path.
+    return f'/api/{uuid.uuid4().hex}'
+
+
+def _session(target_server, **policy) -> Session:
+    return Session(RunProfile(target_server=target_server, users={}, request_policy=RequestPolicy(**policy)))
+
+
+def _respond_in_order(stand_in, method, path, *responses):
+    """
+    Respond to the requests to the path with the given responses in order, repeating the last one.
+    Responses are either a status code, or a delay in seconds before responding with 200.
+    """
+    counter = itertools.count()
+
+    def respond(request):
+        response = responses[min(next(counter), len(responses) - 1)]
+        if isinstance(response, float):
+            time.sleep(response)
+            response = 200
+        return json_response({'status': response}, status=response)
+
+    stand_in.route(method, path, respond)
+    return counter
+
+
+def _closed_port_url():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return f'http://127.0.0.1:{s.getsockname()[1]}'
+
+
+class TestRetries:
+    def test_retried_status(self, stand_in, stand_in_server, path):
+        counter = _respond_in_order(stand_in, 'GET', path, 503, 502, 200)
+        session = _session(stand_in_server, max_retries=2, retry_backoff=0)
+
+        assert session.request('GET', path).status_code == 200
+        assert next(counter) == 3
+        rendered = session.request_log.render()
+        assert '--- retry 1/2 after 503 Service Unavailable' in rendered
+        assert '--- retry 2/2 after 502 Bad Gateway' in rendered
+
+    def test_max_retries(self, stand_in, stand_in_server, path):
+        counter = _respond_in_order(stand_in, 'GET', path, 504)
+        session = _session(stand_in_server, max_retries=2, retry_backoff=0)
+
+        assert session.request('GET', path).status_code == 504
+        assert next(counter) == 3
+
+    def test_non_idempotent_not_retried(self, stand_in, stand_in_server, path):
+        counter = _respond_in_order(stand_in, 'POST', path, 503, 200)
+        session = _session(stand_in_server, max_retries=2, retry_backoff=0)
+
+        assert session.request('POST', path).status_code == 503
+        assert next(counter) == 1
+
+    def test_idempotent_unsafe_method_retried(self, stand_in, stand_in_server, path):
+        counter = _respond_in_order(stand_in, 'DELETE', path, 503, 200)
+        session = _session(stand_in_server, max_retries=1, retry_backoff=0)
+
+        assert session.request('DELETE', path).status_code == 200
+        assert next(counter) == 2
+
+    def test_connection_error_retried(self):
+        session = _session(_closed_port_url(), max_retries=1, retry_backoff=0)
+
+        with pytest.raises(requests.ConnectionError):
+            session.request('GET', '/api/items')
+        assert '--- retry 1/1 after ConnectionError' in session.request_log.render()
+
+    def test_retry_budget(self, stand_in, stand_in_server, path):
+        counter = _respond_in_order(stand_in, 'GET', path, 503)
+        session = _session(stand_in_server, max_retries=100, retry_backoff=0, retry_budget=0)
+
+        session.request('GET', path)
+        # The reserve of the budget, and the original request.
+        assert next(counter) == 11
+        assert 'the retry budget is exhausted' in session.request_log.render()
+
+    def test_stage_policy(self, stand_in, stand_in_server, path):
+        counter = _respond_in_order(stand_in, 'GET', path, 503, 200)
+        context = Context(_session(stand_in_server), scope='function')
+
+        with context.stage('GET', path, policy=RequestPolicy(max_retries=1, retry_backoff=0)) as request:
+            assert request(user=None).status_code == 200
+        assert next(counter) == 2
+
+    def test_async(self, stand_in, stand_in_server, path):
+        pytest.importorskip('aiohttp')
+        counter = _respond_in_order(stand_in, 'GET', path, 503, 200)
+        session = _session(stand_in_server, max_retries=1, retry_backoff=0)
+
+        response = asyncio.run(session.async_session.request('GET', path))
+        assert response.status_code == 200
+        assert next(counter) == 2
+
+
+class TestHedging:
+    def test_hedged_request_used(self, stand_in, stand_in_server, path):
+        counter = _respond_in_order(stand_in, 'GET', path, 2.0, 0.0)
+        session = _session(stand_in_server, hedge_after=0.05)
+
+        start = time.perf_counter()
+        assert session.request('GET', path).status_code == 200
+        assert time.perf_counter() - start < 1.0
+        assert next(counter) == 2
+
+        rendered = session.request_log.render()
+        assert '--- no response after 50.0ms, sending a hedged request' in rendered
+        assert '--- the hedged request responded first' in rendered
+        session.close()
+
+    def test_fast_response_not_hedged(self, stand_in, stand_in_server, path):
+        counter = _respond_in_order(stand_in, 'GET', path, 0.0)
+        session = _session(stand_in_server, hedge_after=1)
+
+        assert session.request('GET', path).status_code == 200
+        assert next(counter) == 1
+        assert '---' not in session.request_log.render()
+
+    @pytest.mark.parametrize('method', ['POST', 'PUT', 'DELETE'])
+    def test_unsafe_method_not_hedged(self, stand_in, stand_in_server, path, method):
+        counter = _respond_in_order(stand_in, method, path, 0.2, 0.0)
+        session = _session(stand_in_server, hedge_after=0.01)
+
+        session.request(method, path)
+        assert next(counter) == 1
+
+    def test_async(self, stand_in, stand_in_server, path):
+        pytest.importorskip('aiohttp')
+        counter = _respond_in_order(stand_in, 'GET', path, 2.0, 0.0)
+        session = _session(stand_in_server, hedge_after=0.05)
+
+        start = time.perf_counter()
+        response = asyncio.run(session.async_session.request('GET', path))
+        assert response.status_code == 200
+        assert time.perf_counter() - start < 1.0
+        assert next(counter) == 2
+
+
+class TestPolicyRunner:
+    def test_percentile_threshold(self):
+        runner = PolicyRunner(retry_budget=0.1, max_hedges=2)
+        policy = RequestPolicy(hedge_after='p90')
+        latency = runner._latency('GET /a')
+
+        for i in range(1, MIN_HEDGE_SAMPLES):
+            latency.add(i / 100)
+        assert runner.hedge_threshold(policy, 'GET /a') is None
+
+        latency.add(MIN_HEDGE_SAMPLES / 100)
+        assert runner.hedge_threshold(policy, 'GET /a') == 0.18
+
+    def test_fixed_threshold(self):
+        runner = PolicyRunner(retry_budget=0.1, max_hedges=2)
+        assert runner.hedge_threshold(RequestPolicy(hedge_after=0.25), 'GET /a') == 0.25
+        assert runner.hedge_threshold(RequestPolicy(), 'GET /a') is None
+
+    def test_retry_budget_shared_by_threads(self):
+        runner = PolicyRunner(retry_budget=0, max_hedges=2)
+        withdrawn = []
+        threads = [threading.Thread(target=lambda: withdrawn.append(runner.budget.withdraw())) for _ in range(50)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert withdrawn.count(True) == 10
@@ -0,0 +1,121 @@
+import asyncio
+import multiprocessing
+import threading
+import time
+import uuid
+
+import pytest
+
+from seekret.apitest.context.listener import SessionListener
+from seekret.apitest.context.ratelimit import RateLimiter
+from seekret.apitest.context.session import Session
+from seekret.apitest.runprofile import RunProfile, User, UserAuth, RateLimit
+
+
+@pytest.fixture
+def key():
+    # The limiter state is shared through the temporary directory, so each test uses its own account.
+    return str(uuid.uuid4())
+
+
+def _reserve_delays(rate_limit, key, count):
+    limiter = RateLimiter(rate_limit, key)
+    try:
+        return [limiter.reserve() for _ in range(count)]
+    finally:
+        limiter.close()
+
+
+class TestRateLimiter:
+    def test_burst_not_delayed(self, key):
+        assert _reserve_delays(RateLimit(requests_per_second=10, burst=5), key, 5) == [0] * 5
+
+    def test_rate(self, key):
+        delays = _reserve_delays(RateLimit(requests_per_second=10, burst=1), key, 4)
+        assert delays[0] == 0
+        for delay, expected in zip(delays[1:], (0.1, 0.2, 0.3)):
+            assert expected - 0.02 < delay <= expected
+
+    def test_wait(self, key):
+        limiter = RateLimiter(RateLimit(requests_per_second=20, burst=1), key)
+        start = time.perf_counter()
+        waited = sum(limiter.wait() for _ in range(3))
+        assert time.perf_counter() - start >= waited > 0.08
+
+    def test_wait_async_off_event_loop(self, key, monkeypatch):
+        limiter = RateLimiter(RateLimit(requests_per_second=20, burst=1), key)
+        reserve_threads = []
+        reserve = limiter.reserve
+        monkeypatch.setattr(limiter, 'reserve',
+                            lambda: reserve_threads.append(threading.current_thread()) or reserve())
+
+        waited = asyncio.run(limiter.wait_async()) + asyncio.run(limiter.wait_async())
+        limiter.close()
+        assert waited > 0.04
+        # The state file is locked outside of the event loop.
+        assert len(reserve_threads) == 2 and threading.current_thread() not in reserve_threads
+
+    def test_no_rate(self, key):
+        assert _reserve_delays(RateLimit(max_concurrency=1), key, 100) == [0] * 100
+
+    def test_state_shared_by_limiters(self, key):
+        rate_limit = RateLimit(requests_per_second=10, burst=2)
+        assert _reserve_delays(rate_limit, key, 2) == [0, 0]
+        assert _reserve_delays(rate_limit, key, 1)[0] > 0
+        assert _reserve_delays(rate_limit, str(uuid.uuid4()), 1) == [0]
+
+    def test_state_shared_by_processes(self, key):
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            pytest.skip('fork is not supported')
+
+        rate_limit = RateLimit(requests_per_second=100, burst=1)
+        with multiprocessing.get_context('fork').Pool(2) as pool:
+            results = pool.starmap(_reserve_delays, [(rate_limit, key, 10)] * 2)
+
+        # Every request was given its own time slot, across both processes.
+        delays = sorted(delay for result in results for delay in result)
+        assert delays[0] == 0
+        assert all(b - a > 0.005 for a, b in zip(delays, delays[1:]))
+
+    def test_concurrency_slots(self, key):
+        rate_limit = RateLimit(max_concurrency=1)
+        first = RateLimiter(rate_limit, key)
+        second = RateLimiter(rate_limit, key)
+
+        slot = first.try_acquire_slot()
+        assert slot is not None
+        assert first.try_acquire_slot() is None
+        assert second.try_acquire_slot() is None
+
+        first.release_slot(slot)
+        second_slot = second.try_acquire_slot()
+        assert second_slot is not None
+        second.release_slot(second_slot)
+
+
+class _Timings(SessionListener):
+    def __init__(self):
+        self.timings = []
+
+    def request_finished(self, record):
+        self.timings.append(record.timings)
+
+
+def test_session_rate_limited(stand_in_server, key):
+    user = User(auth=UserAuth(type='bearer', data={'token': key}),
+                rate_limit=RateLimit(requests_per_second=20, burst=1, max_concurrency=2))
+    session = Session(RunProfile(target_server=stand_in_server, users={'default': user}))
+    listener = _Timings()
+    session.add_listener(listener)
+
+    for _ in range(3):
+        session.request('GET', '/api/items', user='default')
+    session.request('GET', '/api/items')
+
+    waits = [timings.rate_limit for timings in listener.timings]
+    assert waits[0] == 0
+    assert all(wait > 0.02 for wait in waits[1:3])
+    # Unauthenticated requests are not limited.
+    assert waits[3] == 0
+    assert 'for the rate limit of user default' in session.request_log.render()
+    session.close()
@@ -0,0 +1,72 @@
+import json as _json
+
+import pytest
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from seekret.apitest.context.requestlog import RequestLog
+
+
+def make_exchange(request_log: RequestLog, body: bytes):
+    prepared_request = requests.Request(method='POST',
+                                        url='https://seekret.com/api',
+                                        json={
+                                            'a': 1
+                                        }).prepare()
+    response = requests.Response()
+    response.status_code = 200
+    response.reason = 'OK'
+    response.url = prepared_request.url
+    response.headers = CaseInsensitiveDict({'X-Header': 'value'})
+    response._content = body
+
+    exchange = request_log.log_request('POST', prepared_request, {'a': 1})
+    request_log.log_response(exchange, response)
+
+
+class TestRequestLog:
+    def test_lazy_mode_does_not_print(self, capsys):
+        request_log = RequestLog(mode='lazy')
+        make_exchange(request_log, b'{"b": 2}')
+        assert capsys.readouterr().out == ''
+
+    def test_lazy_mode_renders_on_demand(self):
+        request_log = RequestLog(mode='lazy')
+        make_exchange(request_log, b'{"b": 2}')
+
+        rendered = request_log.render()
+        assert '--> POST https://seekret.com/api' in rendered
+        assert '<-- 200 OK from POST https://seekret.com/api' in rendered
+        assert '"X-Header": "value"' in rendered
+        assert '"b": 2' in rendered
+
+    def test_eager_mode_prints(self, capsys):
+        request_log = RequestLog(mode='eager')
+        make_exchange(request_log, b'{"b": 2}')
+
+        out = capsys.readouterr().out
+        assert '--> POST https://seekret.com/api' in out
+        assert '"b": 2' in out
+        assert request_log.render() == ''
+
+    def test_large_body_truncated(self):
+        request_log = RequestLog(max_body_bytes=10)
+        make_exchange(request_log,
+                      _json.dumps({'key': 'x' * 100}).encode())
+
+        rendered = request_log.render()
+        assert '{"key": "x... [truncated 101 bytes]' in rendered
+
+    def test_no_limit(self):
+        request_log = RequestLog(max_body_bytes=0)
+        make_exchange(request_log, _json.dumps({'key': 'x' * 100}).encode())
+        assert 'x' * 100 in request_log.render()
+
+    def test_clear(self):
+        request_log = RequestLog()
+        make_exchange(request_log, b'')
+        request_log.clear()
+        assert request_log.render() == ''
+
+    def test_unsupported_mode_causes_value_error(self):
+        pytest.raises(ValueError, RequestLog, mode='unknown')
@@ -1,12 +1,15 @@
 import io
 import json as _json
+import unittest.mock as mock
 from typing import Optional, Union
 
+import pykwalify.core
 import pytest
 from requests import Response
 from requests.structures import CaseInsensitiveDict
 
-from seekret.apitest.context.response import ResponseWrapper, NullResultError
+from seekret.apitest.context.jsoncodec import decode_response_json
+from seekret.apitest.context.response import ResponseWrapper, NullResultError, _compile_schema
 
 
 def make_wrapper(json=None,
@@ -90,3 +93,69 @@ class TestResponseWrapper:
                     b:
                         type: int
             """)
+
+        def test_schema_compiled_once(self):
+            schema = 'type: seq\nsequence:\n  - type: int'
+            make_wrapper([1, 2]).assert_schema(schema)
+
+            hits = _compile_schema.cache_info().hits
+            make_wrapper([3]).assert_schema(schema)
+            assert _compile_schema.cache_info().hits == hits + 1
+
+        def test_error_message_matches_pykwalify(self):
+            schema = """
+                type: map
+                mapping:
+                    a:
+                        type: str
+                        required: true
+                    b:
+                        type: seq
+                        sequence:
+                            - include: item
+                schema;item:
+                    type: int
+            """
+            data = {'b': [1, 'x']}
+            with pytest.raises(pykwalify.core.SchemaError) as expected:
+                pykwalify.core.Core(
+                    source_data=data,
+                    schema_file_obj=io.StringIO(schema)).validate()
+
+            for _ in range(2):
+                with pytest.raises(AssertionError) as e:
+                    make_wrapper(data).assert_schema(schema)
+                assert str(e.value) == (
+                    f'response schema verification error: {expected.value.msg}')
+
+    class TestSearchMany:
+        def test_multiple_values(self):
+            wrapper = make_wrapper({'a': 1, 'b': {'c': 2}},
+                                   headers={'Some-Header': 'value'})
+            assert wrapper.search_many({
+                'a': 'json.a',
+                'c': 'json.b.c',
+                'header': 'headers."Some-Header"'
+            }) == {
+                'a': 1,
+                'c': 2,
+                'header': 'value'
+            }
+
+        def test_null_value_causes_null_result_error(self):
+            wrapper = make_wrapper({'a': 1})
+            pytest.raises(NullResultError, wrapper.search_many, {
+                'a': 'json.a',
+                'missing': 'json.missing'
+            })
+
+    class TestParseOnce:
+        def test_body_parsed_once(self):
+            wrapper = make_wrapper({'a': 1, 'b': 2})
+            with mock.patch('seekret.apitest.context.response.decode_response_json',
+                            side_effect=decode_response_json) as json_mock:
+                wrapper.search('json.a')
+                wrapper.search('json.b')
+                wrapper.assert_schema('type: map\nallowempty: true')
+
+            assert json_mock.call_count == 1
@@ -1,9 +1,12 @@
 import unittest.mock as mock
+import urllib.parse
+import urllib.request
 
 import pytest
+from requests.cookies import create_cookie
 
-from seekret.apitest.context.session import resolve_path_params, Session
-from seekret.apitest.runprofile import RunProfile, User, UserAuth
+from seekret.apitest.context.session import resolve_path_params, Session, compile_path_template
+from seekret.apitest.runprofile import RunProfile, User, UserAuth, ConnectionPool
 
 
 class TestResolvePathParams:
@@ -57,6 +60,46 @@ class TestResolvePathParams:
                 'excessive_value': 'not-in-path'
             })
 
+    def test_error_messages(self):
+        with pytest.raises(ValueError,
+                           match="expected path param 'channel_id' was not given"):
+            resolve_path_params('/users/{user_name}/channels/{channel_id}',
+                                {'user_name': 'my-user'})
+
+        with pytest.raises(
+                ValueError,
+                match='path params given but do not appear in path: extra'):
+            resolve_path_params('/users/{user_name}', {
+                'user_name': 'my-user',
+                'extra': 'value'
+            })
+
+
+class TestPathTemplate:
+    def test_compiled_once(self):
+        assert compile_path_template('/users/{id}') is compile_path_template(
+            '/users/{id}')
+
+    @pytest.mark.parametrize('target_server', [
+        'https://server.com', 'https://server.com/', 'https://server.com/api',
+        'https://server.com/api/v1/', 'https://server.com/api?key=value'
+    ])
+    @pytest.mark.parametrize('path', [
+        '/', '/users/{id}', 'users/{id}/', '/{id}', '/users/../{id}',
+        '//users/{id}', '/users?id={id}'
+    ])
+    @pytest.mark.parametrize('value', ['1', '', '.', '..', 'a/b', 'a b'])
+    def test_url_same_as_urljoin(self, target_server, path, value):
+        path_params = {'id': value} if '{id}' in path else {}
+        expected = urllib.parse.urljoin(
+            target_server,
+            resolve_path_params(path, path_params).lstrip('/'))
+
+        # Twice, since the URL prefix is computed on the first call.
+        for _ in range(2):
+            assert compile_path_template(path).url(target_server,
+                                                   path_params) == expected
+
 
 class TestSession:
     class TestPrepareRequest:
@@ -77,8 +120,8 @@ class TestSession:
             assert mock_request_ctor.call_args == mock.call(
                 method='GET',
                 url='https://seekret.com/my/api',
-                headers=None,
-                json=None,
+                headers={'X-Seekret-Test': '1'},
+                data=None,
                 params=None,
                 cookies=None,
                 auth=None)
@@ -95,8 +138,8 @@ class TestSession:
             assert mock_request_ctor.call_args == mock.call(
                 method='GET',
                 url='https://seekret.com/my/api',
-                headers=None,
-                json=None,
+                headers={'X-Seekret-Test': '1'},
+                data=None,
                 params=None,
                 cookies=None,
                 auth=None)
@@ -114,8 +157,12 @@ class TestSession:
             assert mock_request_ctor.call_args == mock.call(
                 method='GET',
                 url='https://seekret.com/my/api/param_value',
-                headers={'header': 'header_value'},
-                json={'data': 'json_value'},
+                headers={
+                    'header': 'header_value',
+                    'X-Seekret-Test': '1',
+                    'Content-Type': 'application/json'
+                },
+                data=b'{"data":"json_value"}',
                 params={'query': 'query_value'},
                 cookies={'cookie': 'cookie_value'},
                 auth=None)
@@ -155,3 +202,48 @@ class TestSession:
                 assert mock_request_ctor.call_count == 2
                 assert (mock_request_ctor.call_args_list[0].kwargs['auth'] is
                         mock_request_ctor.call_args_list[1].kwargs['auth'])
+
+    class TestTransport:
+        @pytest.fixture
+        def session(self) -> Session:
+            session = Session(
+                RunProfile(target_server='https://seekret.com',
+                           users={},
+                           connection_pool=ConnectionPool(
+                               pool_size=3, max_connections_per_host=7)))
+            yield session
+            session.close()
+
+        def test_transport_reused_between_calls(self, session):
+            assert session._get_transport() is session._get_transport()
+
+        def test_close_recreates_transport(self, session):
+            transport = session._get_transport()
+            session.close()
+            assert session._get_transport() is not transport
+
+        def test_pool_configured_from_run_profile(self, session):
+            adapter = session._get_transport().get_adapter(
+                'https://seekret.com')
+            assert adapter._pool_connections == 3
+            assert adapter._pool_maxsize == 7
+
+        def test_response_cookies_not_stored(self, session):
+            cookies = session._get_transport().cookies
+            cookies.set_cookie_if_ok(
+                create_cookie('name', 'value', domain='seekret.com'),
+                urllib.request.Request('https://seekret.com/my/api'))
+            assert len(cookies) == 0
+
+        def test_keep_alive_disabled_closes_connection(self):
+            session = Session(
+                RunProfile(target_server='https://seekret.com',
+                           users={},
+                           connection_pool=ConnectionPool(keep_alive=False)))
+            with mock.patch.object(session, '_get_transport') as m:
+                m.return_value.send.return_value.json.return_value = {}
+                m.return_value.send.return_value.headers = {}
+                session.request('GET', '/my/api')
+
+            prepared_request = m.return_value.send.call_args.args[0]
+            assert prepared_request.headers['Connection'] == 'close'
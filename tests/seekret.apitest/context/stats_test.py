@@ -0,0 +1,42 @@
+import pytest
+
+from seekret.apitest.context.stats import LatencySamples, render_table, format_bytes, linear_slope
+
+
+class TestLatencySamples:
+    def test_percentiles(self):
+        samples = LatencySamples()
+        for value in reversed(range(1, 101)):
+            samples.add(value)
+
+        assert samples.percentile(50) == 50
+        assert samples.percentile(95) == 95
+        assert samples.percentile(99) == 99
+        assert samples.percentile(100) == 100
+        assert samples.max() == 100
+        assert len(samples) == 100
+
+    def test_empty(self):
+        samples = LatencySamples()
+        assert samples.percentile(50) == 0
+        assert samples.max() == 0
+
+
+def test_render_table():
+    assert render_table(('name', 'value'), [('a', 1), ('long-name', 100)]) == (
+        'name       value\n'
+        'a              1\n'
+        'long-name    100')
+
+
+def test_format_bytes():
+    assert format_bytes(512) == '512B'
+    assert format_bytes(1536) == '1.5KiB'
+    assert format_bytes(-3 * 1024 * 1024) == '-3.0MiB'
+
+
+def test_linear_slope():
+    assert linear_slope([1, 2, 3], [2, 4, 6]) == pytest.approx(2)
+    assert linear_slope([1, 2, 3, 4], [1, 3, 2, 4]) == pytest.approx(0.8)
+    assert linear_slope([1], [5]) == 0
+    assert linear_slope([1, 1], [2, 4]) == 0
@@ -0,0 +1,168 @@
+import json
+import tracemalloc
+import unittest.mock as mock
+
+import jmespath
+import pytest
+
+from seekret.apitest.context.requestlog import RequestLog
+from seekret.apitest.context.response import NullResultError
+from seekret.apitest.context.session import Session
+from seekret.apitest.context.streaming import parse_stream_expression, StreamingJsonSearch
+from seekret.apitest.runprofile import RunProfile
+
+DOCUMENT = {
+    'data': {
+        'items': [{'id': 1, 'name': 'a "quoted" \\ name'}, {'id': 2, 'tags': [1, 2, {'x': None}]}],
+        'total': 2.5e3,
+    },
+    'skipped': [{'nested': [[], {}, '}]{[']}],
+    'dashed-key': True,
+}
+
+
+class TestParseStreamExpression:
+    def test_keys_and_indices(self):
+        assert parse_stream_expression('json.data.items[0]."item-id"') == ('data', 'items', 0, 'item-id')
+
+    def test_root(self):
+        assert parse_stream_expression('json') == ()
+
+    @pytest.mark.parametrize('expression', ['headers.foo', 'json.items[-1]', 'json.items[*].id', 'length(json)'])
+    def test_unsupported_expression(self, expression):
+        with pytest.raises(ValueError, match='not supported in streaming mode'):
+            parse_stream_expression(expression)
+
+
+class TestStreamingJsonSearch:
+    EXPRESSIONS = [
+        'json.data.items[0].name', 'json.data.items[1]', 'json.data.items[1].tags[2].x', 'json.data.total',
+        'json."dashed-key"', 'json.data.items[5]', 'json.missing', 'json'
+    ]
+
+    @pytest.mark.parametrize('chunk_size', [1, 2, 3, 10, 1000])
+    def test_matches_jmespath(self, chunk_size):
+        text = json.dumps(DOCUMENT)
+        search = StreamingJsonSearch(parse_stream_expression(e) for e in self.EXPRESSIONS)
+        for i in range(0, len(text), chunk_size):
+            search.feed(text[i:i + chunk_size])
+        search.close()
+
+        for expression in self.EXPRESSIONS:
+            assert search.results.get(parse_stream_expression(expression)) == jmespath.search(
+                expression, {'json': DOCUMENT})
+
+    def test_stops_after_all_values_found(self):
+        search = StreamingJsonSearch([('a', )])
+        search.feed('{"a": 1, "b": ')
+        assert search.done
+        search.feed('not json at all')
+        search.close()
+        assert search.results == {('a', ): 1}
+
+    def test_number_split_between_chunks(self):
+        search = StreamingJsonSearch([('a', )])
+        search.feed('{"a": 12')
+        search.feed('34}')
+        search.close()
+        assert search.results == {('a', ): 1234}
+
+    def test_split_at_every_offset(self):
+        text = '{"a": true, "b": false, "c": null, "d": -5, "e": [-1.5e3, true], "f": {"id": 5}}'
+        expected = json.loads(text)
+        for offset in range(len(text) + 1):
+            search = StreamingJsonSearch([(key, ) for key in expected])
+            search.feed(text[:offset])
+            search.feed(text[offset:])
+            search.close()
+            assert search.results == {(key, ): value for key, value in expected.items()}, offset
+
+    def test_strings_split_at_every_offset(self):
+        text = r'{"k\"ey": "v\\a\"l\u00e9", "skipped": ["x\\", "\"]"], "b": {"c\\": "\ud83d\ude00"}}'
+        expected = json.loads(text)
+        paths = [('k"ey', ), ('b', 'c\\'), ('skipped', 1)]
+        for offset in range(len(text) + 1):
+            search = StreamingJsonSearch(paths)
+            search.feed(text[:offset])
+            search.feed(text[offset:])
+            search.close()
+            assert search.results == {
+                ('k"ey', ): expected['k"ey'],
+                ('b', 'c\\'): expected['b']['c\\'],
+                ('skipped', 1): '"]',
+            }, offset
+
+    @pytest.mark.parametrize('prefix', ['{"skipped": "', '{"skipped": ["', '{"'])
+    def test_long_strings_not_kept(self, prefix):
+        # Skipped strings and keys longer than any searched key are dropped as they are read.
+        search = StreamingJsonSearch([('a', )])
+        search.feed(prefix)
+        for _ in range(1000):
+            search.feed('x' * 1000 + '\\\\')
+            assert len(search._buffer) <= 1
+        search.feed('"' + (']' if '[' in prefix else '') + (': 1' if prefix == '{"' else '') + ', "a": 2}')
+        search.close()
+        assert search.results == {('a', ): 2}
+
+    @pytest.mark.parametrize('text', ['{"a": tru}', '{"a" 1}', '{"b": [1, 2}', '{"a": "unterminated'])
+    def test_invalid_json(self, text):
+        search = StreamingJsonSearch([('a', ), ('c', )])
+        with pytest.raises(ValueError):
+            search.feed(text)
+            search.close()
+
+
+class TestStreamedRequest:
+    @pytest.fixture
+    def session(self, stand_in_server) -> Session:
+        session = Session(RunProfile(target_server=stand_in_server, users={}), request_log=RequestLog(max_body_bytes=100))
+        yield session
+        session.close()
+
+    def test_search(self, session):
+        response = session.request('GET', '/payload/1048576', stream=['json[0].id', 'json[100].nested.value'])
+
+        assert response.status_code == 200
+        assert response.search('json[0].id') == 0
+        assert response.search('json[100].nested.value') == 1.5
+        assert response.search('headers."Content-Type"') == 'application/json'
+
+    def test_missing_value(self, session):
+        response = session.request('GET', '/payload/1024', stream=['json[100000].id'])
+        with pytest.raises(NullResultError):
+            response.search('json[100000].id')
+
+    def test_undeclared_expression(self, session):
+        response = session.request('GET', '/payload/1024', stream=['json[0].id'])
+        with pytest.raises(ValueError, match='was not given in `stream`'):
+            response.search('json[1].id')
+
+    def test_body_not_available(self, session):
+        response = session.request('GET', '/payload/1024', stream=['json[0].id'])
+        with pytest.raises(RuntimeError):
+            response.assert_schema('type: seq')
+
+    def test_unsupported_expression_fails_before_sending(self, session):
+        with mock.patch.object(session._get_transport(), 'send') as send:
+            with pytest.raises(ValueError):
+                session.request('GET', '/payload/1024', stream=['json[*].id'])
+        assert not send.called
+
+    def test_log_shows_start_of_body(self, session):
+        session.request('GET', '/payload/1048576', stream=['json[0].id'])
+        rendered = session.request_log.render()
+        assert '[truncated' in rendered
+        assert len(rendered) < 2000
+
+    def test_peak_memory_bounded(self, session):
+        size = 8 * 1024 * 1024
+        session.request('GET', '/payload/{size}', path_params={'size': size}, stream=['json[0].id'])  # Warm up.
+
+        tracemalloc.start()
+        try:
+            session.request('GET', '/payload/{size}', path_params={'size': size}, stream=['json[0].id'])
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        assert peak < size / 8
@@ -0,0 +1,201 @@
+import json
+import re
+import threading
+import time
+import uuid
+
+import pytest
+
+from seekret.apitest.context import Context
+from seekret.apitest.context.session import Session
+from seekret.apitest.context.tracing import Span, Tracer, SpanExporter, OtlpJsonFileExporter, current_span, \
+    SPAN_KIND_CLIENT, STATUS_ERROR, STATUS_UNSET
+from seekret.apitest.runprofile import RunProfile
+
+
+class ListExporter(SpanExporter):
+    def __init__(self):
+        self.batches = []
+        self.shut_down = False
+
+    def export(self, spans):
+        self.batches.append(list(spans))
+
+    def shutdown(self):
+        self.shut_down = True
+
+    @property
+    def spans(self):
+        return [span for batch in self.batches for span in batch]
+
+
+class TestSpan:
+    def test_traceparent(self):
+        span = Span('test')
+        assert re.fullmatch('00-[0-9a-f]{32}-[0-9a-f]{16}-01', span.traceparent)
+        assert span.parent_span_id is None
+
+    def test_child_joins_trace(self):
+        parent = Span('test')
+        child = Span('stage', parent=parent)
+        assert child.trace_id == parent.trace_id
+        assert child.parent_span_id == parent.span_id
+        assert child.span_id != parent.span_id
+
+    def test_to_otlp(self):
+        span = Span('request',
+                    SPAN_KIND_CLIENT,
+                    attributes={'method': 'GET', 'status': 200, 'cached': False, 'elapsed': 0.5, 'user': None})
+        span.end_time_ns = span.start_time_ns + 1000
+        span.set_error(ValueError('failed'))
+
+        otlp = span.to_otlp()
+        assert otlp['kind'] == SPAN_KIND_CLIENT
+        assert otlp['endTimeUnixNano'] == str(span.start_time_ns + 1000)
+        assert otlp['attributes'] == [
+            {'key': 'method', 'value': {'stringValue': 'GET'}},
+            {'key': 'status', 'value': {'intValue': '200'}},
+            {'key': 'cached', 'value': {'boolValue': False}},
+            {'key': 'elapsed', 'value': {'doubleValue': 0.5}},
+        ]
+        assert otlp['status'] == {'code': STATUS_ERROR, 'message': "ValueError('failed')"}
+        assert 'parentSpanId' not in otlp
+
+
+class TestTracer:
+    def test_spans_nested_and_exported(self):
+        exporter = ListExporter()
+        tracer = Tracer([exporter])
+        with tracer.span('test') as test_span:
+            with tracer.span('stage') as stage_span:
+                assert current_span() is stage_span
+            assert current_span() is test_span
+        assert current_span() is None
+        tracer.shutdown()
+
+        assert [span.name for span in exporter.spans] == ['stage', 'test']
+        assert stage_span.parent_span_id == test_span.span_id
+        assert stage_span.duration >= 0
+        assert exporter.shut_down
+
+    def test_error(self):
+        exporter = ListExporter()
+        tracer = Tracer([exporter])
+        with pytest.raises(ValueError):
+            with tracer.span('stage'):
+                raise ValueError()
+        tracer.shutdown()
+
+        assert exporter.spans[0].status == STATUS_ERROR
+
+    def test_never_blocks(self):
+        release = threading.Event()
+
+        class BlockedExporter(SpanExporter):
+            def export(self, spans):
+                release.wait()
+
+        tracer = Tracer([BlockedExporter()], queue_size=2, batch_size=1)
+        start = time.perf_counter()
+        for _ in range(10):
+            tracer.end_span(tracer.start_span('stage'))
+        assert time.perf_counter() - start < 0.5
+        assert tracer.dropped >= 7
+
+        release.set()
+        tracer.shutdown()
+
+    def test_failing_exporter(self):
+        class FailingExporter(SpanExporter):
+            def export(self, spans):
+                raise RuntimeError('export failed')
+
+        exporter = ListExporter()
+        tracer = Tracer([FailingExporter(), exporter])
+        tracer.end_span(tracer.start_span('stage'))
+        tracer.shutdown()
+
+        assert [span.name for span in exporter.spans] == ['stage']
+
+    def test_exporter_must_implement_export(self):
+        class IncompleteExporter(SpanExporter):
+            pass
+
+        with pytest.raises(TypeError):
+            IncompleteExporter()
+
+    def test_otlp_json_file(self, tmp_path):
+        path = tmp_path / 'spans.jsonl'
+        tracer = Tracer([OtlpJsonFileExporter(str(path), service_name='my-tests')])
+        with tracer.span('test'):
+            pass
+        tracer.shutdown()
+
+        with open(path) as f:
+            requests = [json.loads(line) for line in f]
+        resource_spans = requests[0]['resourceSpans'][0]
+        assert resource_spans['resource']['attributes'] == [{
+            'key': 'service.name',
+            'value': {'stringValue': 'my-tests'}
+        }]
+        assert [span['name'] for span in resource_spans['scopeSpans'][0]['spans']] == ['test']
+
+
+@pytest.fixture
+def traced_session(stand_in_server):
+    exporter = ListExporter()
+    session = Session(RunProfile(target_server=stand_in_server, users={}), tracer=Tracer([exporter]))
+    yield session, exporter
+    session.close()
+
+
+def test_stage_and_request_spans(traced_session):
+    session, exporter = traced_session
+    seekret = Context(session, 'function', nodeid='test_api.py::test_items')
+    path = f'/{uuid.uuid4()}/items/{{id}}'
+
+    with session.tracer.span('test') as test_span:
+        with seekret.stage('GET', path) as request:
+            response = request(path_params={'id': 1}, user=None)
+    session.close()
+
+    request_span, stage_span, _ = exporter.spans
+    assert stage_span.parent_span_id == test_span.span_id
+    assert request_span.parent_span_id == stage_span.span_id
+    assert request_span.trace_id == test_span.trace_id
+    assert response.search('json.headers.traceparent') == request_span.traceparent
+
+    assert stage_span.name == f'Stage #1: GET {path}'
+    assert stage_span.attributes['seekret.nodeid'] == 'test_api.py::test_items'
+    assert request_span.kind == SPAN_KIND_CLIENT
+    assert request_span.status == STATUS_UNSET
+    assert request_span.attributes['url.template'] == path
+    assert request_span.attributes['http.response.status_code'] == 200
+    assert request_span.attributes['seekret.timings.total'] > 0
+
+
+def test_request_error(traced_session):
+    session, exporter = traced_session
+    with pytest.raises(ValueError):
+        session.request('GET', '/{missing}')
+    session.close()
+
+    assert exporter.spans[0].status == STATUS_ERROR
+
+
+def test_traceparent_of_test_kept(traced_session):
+    session, _ = traced_session
+    headers = {'Traceparent': '00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01'}
+    response = session.request('GET', f'/{uuid.uuid4()}', headers=headers)
+
+    assert response.search('json.headers.Traceparent') == headers['Traceparent']
+    assert list(headers) == ['Traceparent']
+
+
+def test_no_traceparent_without_tracer(stand_in_server):
+    session = Session(RunProfile(target_server=stand_in_server, users={}))
+    try:
+        response = session.request('GET', f'/{uuid.uuid4()}')
+        assert 'traceparent' not in response.search('json.headers')
+    finally:
+        session.close()
@@ -0,0 +1,140 @@
+import shutil
+import ssl
+import subprocess
+import uuid
+
+import pytest
+
+import seekret.apitest.auth.oauth2
+from seekret.apitest.benchmark.server import StandInServer, json_response
+from seekret.apitest.context.listener import SessionListener, RequestRecord
+from seekret.apitest.context.session import Session
+from seekret.apitest.runprofile import RunProfile, User, UserAuth
+
+
+class _Recorder(SessionListener):
+    def __init__(self):
+        self.records = []
+        self.warm_ups = []
+
+    def request_finished(self, record: RequestRecord):
+        self.records.append(record)
+
+    def warm_up_finished(self, result):
+        self.warm_ups.append(result)
+
+
+def _session(target_server: str, **users) -> Session:
+    return Session(RunProfile(target_server=target_server, users=users))
+
+
+@pytest.fixture
+def token_managers(monkeypatch):
+    managers = {}
+    monkeypatch.setattr(seekret.apitest.auth.oauth2, '_token_managers', managers)
+    yield managers
+    for manager in managers.values():
+        manager.close()
+
+
+def test_connections_reused_by_requests(stand_in_server):
+    session = _session(stand_in_server)
+    recorder = _Recorder()
+    session.add_listener(recorder)
+    try:
+        result = session.warm_up(connections=3)
+        assert result.connections == 3
+        assert result.errors == ()
+        assert result.total >= result.dns + result.connect
+        assert recorder.warm_ups == [result]
+
+        # Connections already open are not opened again.
+        assert session.warm_up(connections=3).connections == 0
+
+        session.request('GET', f'/{uuid.uuid4()}')
+        assert recorder.records[0].timings.connect == 0
+    finally:
+        session.close()
+
+
+def test_users_authenticated(stand_in, stand_in_server, token_managers):
+    path = f'/{uuid.uuid4()}/token'
+    token_requests = []
+
+    def token_endpoint(request):
+        token_requests.append(request)
+        return json_response({'access_token': 'abcd', 'expires_in': 3600})
+
+    stand_in.route('POST', path, token_endpoint)
+    session = _session(stand_in_server,
+                       default=User(auth=UserAuth(type='oauth2_client_credentials',
+                                                  data={
+                                                      'token_url': stand_in_server + path[1:],
+                                                      'client_id': 'my-client',
+                                                      'client_secret': 'my-secret',
+                                                      'cache_file': False,
+                                                  })))
+    try:
+        assert session.warm_up().errors == ()
+        assert len(token_requests) == 1
+
+        response = session.request('GET', f'/{uuid.uuid4()}', user='default')
+        assert response.search('json.headers.Authorization') == 'Bearer abcd'
+        assert len(token_requests) == 1
+    finally:
+        session.close()
+
+
+@pytest.mark.parametrize('target_server, error', [
+    ('http://seekret-warm-up.invalid/', 'resolving seekret-warm-up.invalid'),
+    ('http://127.0.0.1:1/', 'connecting to http://127.0.0.1:1/'),
+])
+def test_errors_reported(target_server, error):
+    session = _session(target_server)
+    try:
+        result = session.warm_up()
+        assert result.connections == 0
+        assert len(result.errors) == 1
+        assert result.errors[0].startswith(error)
+    finally:
+        session.close()
+
+
+@pytest.fixture(scope='module')
+def certificate(tmp_path_factory):
+    if shutil.which('openssl') is None:
+        pytest.skip('openssl is not installed')
+
+    directory = tmp_path_factory.mktemp('tls')
+    cert, key = str(directory / 'cert.pem'), str(directory / 'key.pem')
+    subprocess.run([
+        'openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-keyout', key, '-out', cert, '-days', '1',
+        '-subj', '/CN=127.0.0.1', '-addext', 'subjectAltName=IP:127.0.0.1'
+    ],
+                   check=True,
+                   capture_output=True)
+    return cert, key
+
+
+@pytest.fixture(scope='module')
+def tls_stand_in(certificate):
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(*certificate)
+    with StandInServer(ssl_context=context) as server:
+        yield server
+
+
+def test_tls_session_resumed(tls_stand_in, certificate):
+    session = _session(tls_stand_in.url)
+    session._get_transport().verify = certificate[0]
+    try:
+        result = session.warm_up(connections=1)
+        assert (result.connections, result.tls_handshakes, result.tls_resumed) == (1, 1, 0)
+
+        # The session ticket of the connection is received with its first response.
+        assert session.request('GET', f'/{uuid.uuid4()}').status_code == 200
+
+        result = session.warm_up(connections=2)
+        assert (result.connections, result.tls_handshakes, result.tls_resumed) == (1, 1, 1)
+    finally:
+        session.close()
@@ -0,0 +1,49 @@
+import json
+import uuid
+
+from seekret.apitest.benchmark.server import json_response
+
+pytest_plugins = ['pytester']
+
+
+def test_comparison_report(pytester, stand_in, stand_in_server):
+    path = f'/api/{uuid.uuid4().hex}'
+    stand_in.route('GET', path, lambda request: json_response({
+        'region': 'eu' if request.headers['Host'].startswith('localhost') else 'us'
+    }))
+    eu_server = stand_in_server.replace('127.0.0.1', 'localhost')
+    pytester.makefile('.yaml', **{'run-profile': f'target_server: {stand_in_server}\n'
+                                                 f'targets: {{eu: "{eu_server}"}}\nusers: {{}}\n'})
+    pytester.makepyfile(test_api=f"""
+        def test_region(seekret):
+            with seekret.stage(method='GET', path='{path}') as request:
+                assert request(user=None).search('json.region') == 'us'
+    """)
+
+    result = pytester.runpytest('-p', 'seekret.apitest.pytest_plugin', '--seekret-fan-out-json', 'fan-out.json')
+
+    result.assert_outcomes(passed=1)
+    result.stdout.fnmatch_lines([
+        '*seekret target comparison*',
+        'endpoint *target *count *errors *differing *p50 *p95',
+        f'GET {path} *primary *1 *0 *0 *',
+        f'GET {path} *eu *1 *0 *1 *',
+        '1 differences from the primary target:',
+        f'  test_api.py::test_region stage #1 GET {path}: eu: json.region is "eu", primary "us"',
+    ])
+    with open(pytester.path / 'fan-out.json') as f:
+        [exported] = json.load(f)
+    assert [r['target'] for r in exported['results']] == ['primary', 'eu']
+
+
+def test_no_report_without_targets(pytester, stand_in_server):
+    pytester.makefile('.yaml', **{'run-profile': f'target_server: {stand_in_server}\nusers: {{}}\n'})
+    pytester.makepyfile(test_api="""
+        def test_items(seekret):
+            with seekret.stage(method='GET', path='/api/items') as request:
+                request(user=None)
+    """)
+
+    result = pytester.runpytest('-p', 'seekret.apitest.pytest_plugin')
+    result.assert_outcomes(passed=1)
+    result.stdout.no_fnmatch_line('*seekret target comparison*')
@@ -0,0 +1,35 @@
+import json
+
+import pytest
+
+from seekret.apitest.pytest_plugin.eventlog import worker_path
+
+pytest_plugins = ['pytester']
+
+
+def test_event_log(pytester, stand_in_server):
+    pytester.makefile('.yaml', **{'run-profile': f'target_server: {stand_in_server}\nusers: {{}}\n'})
+    pytester.makepyfile(test_api="""
+        def test_get_item(seekret):
+            with seekret.stage(method='GET', path='/api/items/{id}') as request:
+                assert request(path_params={'id': 1}, user=None).status_code == 200
+    """)
+
+    result = pytester.runpytest('-p', 'seekret.apitest.pytest_plugin', '--seekret-event-log', 'events.ndjson')
+    result.assert_outcomes(passed=1)
+
+    with open(pytester.path / 'events.ndjson') as f:
+        events = [json.loads(line) for line in f]
+    assert [event['event'] for event in events] == ['stage_started', 'request', 'stage_finished']
+    assert {event['nodeid'] for event in events} == {'test_api.py::test_get_item'}
+    assert events[1]['url'].endswith('/api/items/1')
+    assert events[1]['timings']['total'] > 0
+
+
+@pytest.mark.parametrize('path, worker_id, expected', [
+    ('events.ndjson', None, 'events.ndjson'),
+    ('events.ndjson', 'gw1', 'events.gw1.ndjson'),
+    ('logs/events', 'gw0', 'logs/events.gw0'),
+])
+def test_worker_path(path, worker_id, expected):
+    assert worker_path(path, worker_id) == expected
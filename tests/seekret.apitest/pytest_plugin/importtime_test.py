@@ -0,0 +1,93 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import seekret.apitest
+
+pytest_plugins = ['pytester']
+
+REPO_ROOT = os.path.dirname(
+    os.path.dirname(os.path.dirname(seekret.apitest.__file__)))
+
+# Modules which must not be imported by the plugin entry point, only when Seekret fixtures are used.
+DEFERRED_MODULES = ('requests', 'urllib3', 'jmespath', 'pykwalify', 'yaml')
+
+# Maximum time to import the plugin entry point after pytest was imported, in microseconds.
+# Importing it takes a few milliseconds, and took about 300 milliseconds before deferring its dependencies.
+IMPORT_TIME_BUDGET_US = 50_000
+
+
+def _plugin_import_times() -> dict[str, int]:
+    """
+    Import the plugin entry point in a fresh interpreter, after pytest, and measure it with `-X importtime`.
+
+    :return: Dictionary mapping the modules imported by the entry point to their cumulative import time, in
+             microseconds.
+    """
+
+    result = subprocess.run([
+        sys.executable, '-X', 'importtime', '-c',
+        'import pytest; import seekret.apitest.pytest_plugin'
+    ],
+                            env={
+                                **os.environ, 'PYTHONPATH': REPO_ROOT
+                            },
+                            capture_output=True,
+                            text=True,
+                            check=True)
+
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+
+        _, cumulative, module = line.split('|')
+        module = module.strip()
+        if module == 'pytest':
+            # Everything imported until now was imported by pytest.
+            times = {}
+        else:
+            times[module] = int(cumulative)
+
+    return times
+
+
+def test_entry_point_does_not_import_dependencies():
+    imported = _plugin_import_times().keys()
+    for module in DEFERRED_MODULES:
+        assert not any(
+            name == module or name.startswith(f'{module}.')
+            for name in imported), f'{module} imported by the entry point'
+
+
+def test_entry_point_import_time():
+    # Best of several runs, to ignore slow runs on a busy machine.
+    import_time = min(
+        _plugin_import_times()['seekret.apitest.pytest_plugin']
+        for _ in range(3))
+    assert import_time < IMPORT_TIME_BUDGET_US
+
+
+def test_exports_imported_on_access():
+    from seekret.apitest.context import Context
+
+    assert seekret.apitest.Context is Context
+    assert 'RunProfile' in dir(seekret.apitest)
+    with pytest.raises(AttributeError):
+        seekret.apitest.NotExported
+
+
+def test_run_without_seekret_fixtures(pytester, monkeypatch):
+    # Make the package importable from the subprocess.
+    monkeypatch.setenv('PYTHONPATH', REPO_ROOT)
+    pytester.makepyfile(f"""
+        import sys
+
+        def test_not_imported():
+            assert not any(name.split('.')[0] in {DEFERRED_MODULES!r} for name in sys.modules)
+    """)
+
+    result = pytester.runpytest_subprocess('-p', 'seekret.apitest.pytest_plugin')
+    result.assert_outcomes(passed=1)
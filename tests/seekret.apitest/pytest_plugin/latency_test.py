@@ -0,0 +1,69 @@
+import json
+import os
+
+import pytest
+
+import seekret.apitest
+
+pytest_plugins = ['pytester']
+
+
+@pytest.fixture
+def seekret_pytester(pytester, stand_in_server):
+    pytester.makefile('.yaml',
+                      **{
+                          'run-profile':
+                          f'target_server: {stand_in_server}\nusers: {{}}\n'
+                      })
+    pytester.makepyfile(test_api="""
+        import pytest
+
+        @pytest.mark.parametrize('item_id', range(5))
+        def test_get_item(seekret, item_id):
+            with seekret.stage(method='GET', path='/api/items/{id}') as request:
+                assert request(path_params={'id': item_id}, user=None).status_code == 200
+
+        def test_post_item(seekret):
+            with seekret.stage(method='POST', path='/api/items') as request:
+                assert request({}, user=None).status_code == 200
+    """)
+    return pytester
+
+
+def test_summary_grouped_by_endpoint_template(seekret_pytester):
+    result = seekret_pytester.runpytest('-p', 'seekret.apitest.pytest_plugin',
+                                        '--seekret-latency-report')
+
+    result.assert_outcomes(passed=6)
+    result.stdout.fnmatch_lines([
+        '*seekret latency summary*',
+        'endpoint *count*p50*p95*p99*max*connect p50*ttfb p50*download p50*overhead p50',
+        'GET /api/items/{id} *5 *ms *ms *ms *ms *ms *ms *ms *ms',
+        'POST /api/items *1 *',
+    ])
+
+
+def test_summary_disabled_by_default(seekret_pytester):
+    result = seekret_pytester.runpytest('-p', 'seekret.apitest.pytest_plugin')
+    result.stdout.no_fnmatch_line('*seekret latency summary*')
+
+
+@pytest.mark.parametrize('extra_args', [[], ['-n', '2']], ids=['local', 'xdist'])
+def test_json_export(seekret_pytester, extra_args, monkeypatch):
+    pytest.importorskip('xdist')
+    # Make the package importable from the subprocess.
+    monkeypatch.setenv(
+        'PYTHONPATH',
+        os.path.dirname(os.path.dirname(os.path.dirname(
+            seekret.apitest.__file__))))
+    output = seekret_pytester.path / 'latency.json'
+    result = seekret_pytester.runpytest_subprocess(
+        '-p', 'seekret.apitest.pytest_plugin', '--seekret-latency-json',
+        str(output), *extra_args)
+
+    result.assert_outcomes(passed=6)
+    samples = json.loads(output.read_text())
+    assert sorted(s['endpoint'] for s in samples) == ['GET /api/items/{id}'] * 5 + ['POST /api/items']
+    assert all(s['status_code'] == 200 for s in samples)
+    assert all(s['total'] >= s['ttfb'] + s['download'] for s in samples)
+    assert any(s['connect'] > 0 for s in samples)
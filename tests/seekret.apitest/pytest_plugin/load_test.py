@@ -0,0 +1,101 @@
+import pytest
+
+pytest_plugins = ['pytester']
+
+
+@pytest.fixture
+def seekret_pytester(pytester, stand_in_server):
+    pytester.makefile('.yaml',
+                      **{
+                          'run-profile':
+                          f'target_server: {stand_in_server}\nusers: {{}}\n'
+                      })
+    pytester.makepyfile(test_api="""
+        import itertools
+
+        def test_workflow(seekret):
+            with seekret.stage(method='POST', path='/api/items') as request:
+                assert request({}, user=None).status_code == 200
+            with seekret.stage(method='GET', path='/api/items/{id}') as request:
+                assert request(path_params={'id': 1}, user=None).status_code == 200
+
+        def test_failure(seekret):
+            with seekret.stage(method='GET', path='/api/failure') as request:
+                assert request(user=None).status_code == 404
+
+        flaky_calls = itertools.count()
+
+        def test_flaky(seekret):
+            with seekret.stage(method='GET', path='/api/flaky') as request:
+                assert request(user=None).status_code == 200
+            assert next(flaky_calls) % 4 != 0
+
+        async def test_async(seekret):
+            pass
+    """)
+    return pytester
+
+
+def test_load_summary(seekret_pytester):
+    result = seekret_pytester.runpytest('-p', 'seekret.apitest.pytest_plugin',
+                                        '-k', 'workflow or failure',
+                                        '--seekret-load-users', '3',
+                                        '--seekret-load-iterations', '4')
+
+    result.assert_outcomes(passed=1, failed=1)
+    result.stdout.fnmatch_lines([
+        '*seekret load test summary*',
+        'test_api.py::test_workflow: 3 users, 12 iterations (0 failed) in *',
+        'stage *requests*rps*errors*p50*p95*p99*max',
+        'GET /api/items/{id} *12 * 0.0% *',
+        'POST /api/items *12 * 0.0% *',
+        'test_api.py::test_failure: 3 users, 12 iterations (12 failed) in *',
+        'GET /api/failure *12 * 100.0% *',
+    ])
+
+
+def test_duration_and_rate(seekret_pytester):
+    result = seekret_pytester.runpytest('-p', 'seekret.apitest.pytest_plugin',
+                                        '-k', 'workflow',
+                                        '--seekret-load-users', '2',
+                                        '--seekret-load-duration', '0.5',
+                                        '--seekret-load-rps', '20')
+
+    result.assert_outcomes(passed=1)
+    line, = [
+        line for line in result.outlines
+        if line.startswith('POST /api/items')
+    ]
+    # 20 requests per second across 2 stages, for half a second.
+    assert int(line.split()[2]) <= 7
+
+
+def test_failed_iterations(seekret_pytester):
+    result = seekret_pytester.runpytest('-p', 'seekret.apitest.pytest_plugin',
+                                        '-k', 'flaky',
+                                        '--seekret-load-users', '2',
+                                        '--seekret-load-iterations', '4')
+
+    result.assert_outcomes(failed=1)
+    result.stdout.fnmatch_lines([
+        '*2 of 8 iterations failed (25.0%), more than the allowed error rate of 0.0%. The first error was '
+        'AssertionError*',
+    ])
+
+
+def test_max_error_rate(seekret_pytester):
+    result = seekret_pytester.runpytest('-p', 'seekret.apitest.pytest_plugin',
+                                        '-k', 'flaky',
+                                        '--seekret-load-users', '2',
+                                        '--seekret-load-iterations', '4',
+                                        '--seekret-load-max-error-rate', '0.25')
+
+    result.assert_outcomes(passed=1)
+
+
+def test_async_test_warned(seekret_pytester):
+    result = seekret_pytester.runpytest('-p', 'seekret.apitest.pytest_plugin',
+                                        '-k', 'async',
+                                        '--seekret-load-users', '2')
+
+    result.stdout.fnmatch_lines(['*load generation does not support async tests, test_api.py::test_async runs once'])
@@ -0,0 +1,42 @@
+import pytest
+
+pytest_plugins = ['pytester']
+
+
+@pytest.fixture
+def seekret_pytester(pytester, stand_in_server):
+    pytester.makefile('.yaml',
+                      **{
+                          'run-profile':
+                          f'target_server: {stand_in_server}\nusers: {{}}\n'
+                      })
+    pytester.makepyfile(test_api="""
+        def test_success(seekret):
+            with seekret.stage(method='GET', path='/api/success') as request:
+                assert request(user=None).status_code == 200
+
+        def test_failure(seekret):
+            with seekret.stage(method='POST', path='/api/failure') as request:
+                assert request({'sent': 'value'}, user=None).status_code == 201
+    """)
+    return pytester
+
+
+def test_failed_test_report_contains_requests(seekret_pytester):
+    result = seekret_pytester.runpytest('-p', 'seekret.apitest.pytest_plugin')
+
+    result.assert_outcomes(passed=1, failed=1)
+    result.stdout.fnmatch_lines([
+        '*Captured seekret requests call*',
+        '--> POST *api/failure',
+        '*"sent": "value"*',
+    ])
+    result.stdout.no_fnmatch_line('--> GET *api/success')
+
+
+def test_eager_mode_prints_requests(seekret_pytester):
+    result = seekret_pytester.runpytest('-p', 'seekret.apitest.pytest_plugin',
+                                        '--seekret-log-mode', 'eager', '-rP')
+
+    result.assert_outcomes(passed=1, failed=1)
+    result.stdout.fnmatch_lines(['*Captured stdout call*', '--> GET *api/success'])
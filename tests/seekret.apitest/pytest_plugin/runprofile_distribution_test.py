@@ -0,0 +1,75 @@
+import os
+
+import pytest
+
+import seekret.apitest
+
+pytest_plugins = ['pytester']
+
+
+@pytest.fixture
+def seekret_pytester(pytester, monkeypatch):
+    # Make the package importable from the subprocess.
+    monkeypatch.setenv(
+        'PYTHONPATH',
+        os.path.dirname(os.path.dirname(os.path.dirname(
+            seekret.apitest.__file__))))
+    pytester.makepyfile(test_profile="""
+        import pytest
+
+        @pytest.mark.parametrize('i', range(4))
+        def test_profile(seekret_session, pytestconfig, i):
+            assert seekret_session.run_profile.target_server == 'https://seekret.com'
+            assert seekret_session.run_profile.users['default'].auth.type == 'bearer'
+            assert 'seekret_run_profile' in getattr(pytestconfig, 'workerinput', {'seekret_run_profile': None})
+    """)
+    return pytester
+
+
+def test_profile_passed_to_workers(seekret_pytester):
+    pytest.importorskip('xdist')
+    seekret_pytester.makefile('.yaml', **{
+        'run-profile': 'target_server: https://seekret.com\n'
+                       'users: {default: {auth: {type: bearer, data: {token: abcd}}}}\n'
+    })
+
+    result = seekret_pytester.runpytest_subprocess('-p', 'seekret.apitest.pytest_plugin', '-n', '2')
+    result.assert_outcomes(passed=4)
+
+
+def test_malformed_profile_reported_in_workers(seekret_pytester):
+    pytest.importorskip('xdist')
+    seekret_pytester.makefile('.yaml', **{'run-profile': 'target_server: https://seekret.com\n'})
+
+    result = seekret_pytester.runpytest_subprocess('-p', 'seekret.apitest.pytest_plugin', '-n', '2')
+    result.assert_outcomes(errors=4)
+    result.stdout.fnmatch_lines(['*RunProfileError: *run-profile.yaml: missing required key "users"*'])
+
+
+def test_profile_not_serializable_loaded_by_workers(seekret_pytester):
+    pytest.importorskip('xdist')
+    seekret_pytester.makefile('.yaml', **{
+        'run-profile': 'target_server: https://seekret.com\n'
+                       'users: {default: {auth: {type: bearer, data: {token: abcd, issued: 2024-01-01}}}}\n'
+    })
+    seekret_pytester.makepyfile(test_profile="""
+        def test_profile(seekret_session, pytestconfig):
+            assert seekret_session.run_profile.users['default'].auth.type == 'bearer'
+            assert 'seekret_run_profile' not in pytestconfig.workerinput
+    """)
+
+    result = seekret_pytester.runpytest_subprocess('-p', 'seekret.apitest.pytest_plugin', '-n', '2')
+    result.assert_outcomes(passed=1)
+
+
+@pytest.mark.parametrize('args, compiled', [((), False), (('--seekret-compile-run-profile',), True)])
+def test_profile_compiled_on_request(seekret_pytester, args, compiled):
+    seekret_pytester.makefile('.yaml', **{
+        'run-profile': 'target_server: https://seekret.com\n'
+                       'users: {default: {auth: {type: bearer, data: {token: abcd}}}}\n'
+    })
+
+    result = seekret_pytester.runpytest_subprocess('-p', 'seekret.apitest.pytest_plugin', *args)
+    result.assert_outcomes(passed=4)
+    cache_dir = seekret_pytester.path / '.pytest_cache' / 'd' / 'seekret'
+    assert (cache_dir.exists() and len(os.listdir(cache_dir)) == 1) == compiled
@@ -0,0 +1,148 @@
+import pytest
+
+from seekret.apitest.pytest_plugin.soak import SoakStats, SoakSample
+
+pytest_plugins = ['pytester']
+
+
+@pytest.fixture
+def seekret_pytester(pytester, stand_in_server):
+    pytester.makefile('.yaml',
+                      **{
+                          'run-profile':
+                          f'target_server: {stand_in_server}\nusers: {{}}\n'
+                      })
+    pytester.makepyfile(test_api="""
+        import itertools
+
+        responses = []
+
+        def test_workflow(seekret):
+            with seekret.stage(method='POST', path='/api/items') as request:
+                assert request({}, user=None).status_code == 200
+            with seekret.stage(method='GET', path='/api/items/{id}') as request:
+                assert request(path_params={'id': 1}, user=None).status_code == 200
+
+        def test_leak(seekret):
+            with seekret.stage(method='GET', path='/api/leak') as request:
+                responses.append(request(user=None))
+
+        def test_failure(seekret):
+            with seekret.stage(method='GET', path='/api/failure') as request:
+                assert request(user=None).status_code == 404
+
+        flaky_calls = itertools.count()
+
+        def test_flaky(seekret):
+            assert next(flaky_calls) % 2 == 0
+
+        async def test_async(seekret):
+            pass
+    """)
+    return pytester
+
+
+def test_soak_summary(seekret_pytester):
+    result = seekret_pytester.runpytest('-p', 'seekret.apitest.pytest_plugin',
+                                        '-k', 'workflow or failure',
+                                        '--seekret-soak-duration', '0.5',
+                                        '--seekret-soak-sample-every', '5')
+
+    result.assert_outcomes(passed=1, failed=1)
+    result.stdout.fnmatch_lines([
+        '*seekret soak test summary*',
+        'test_api.py::test_workflow: * iterations (0 failed) in *s, * samples',
+        'memory: *B -> *B, *B (*B/iteration)',
+        'stage *requests*p95 first*p95 last*p95 slope',
+        'GET /api/items/{id} *ms *ms *ms/min',
+        'POST /api/items *ms *ms *ms/min',
+        'test_api.py::test_failure: * iterations (* failed) in *',
+    ])
+    line, = [line for line in result.outlines if line.startswith('test_api.py::test_workflow')]
+    iterations, samples = int(line.split()[1]), int(line.split()[-2])
+    # A sample after the first iteration, every 5 iterations, and after the last iteration.
+    assert iterations > 1
+    assert samples == 1 + iterations // 5 + (1 if iterations % 5 else 0)
+
+
+def test_iteration_outlasts_duration(seekret_pytester):
+    # The duration ends during the first iteration, so the soak test runs the one measured iteration after it.
+    result = seekret_pytester.runpytest('-p', 'seekret.apitest.pytest_plugin',
+                                        '-k', 'workflow',
+                                        '--seekret-soak-duration', '0.000001')
+
+    result.assert_outcomes(passed=1)
+    result.stdout.fnmatch_lines([
+        'test_api.py::test_workflow: 2 iterations (0 failed) in *s, 2 samples',
+        'GET /api/items/{id} *2 *ms *ms *ms/min',
+        'POST /api/items *2 *ms *ms *ms/min',
+    ])
+
+
+def test_memory_growth_fails(seekret_pytester):
+    result = seekret_pytester.runpytest('-p', 'seekret.apitest.pytest_plugin',
+                                        '-k', 'leak',
+                                        '--seekret-soak-duration', '0.5',
+                                        '--seekret-soak-max-memory-growth', '1024')
+
+    result.assert_outcomes(failed=1)
+    result.stdout.fnmatch_lines([
+        '*client memory grew by *B during the soak test, more than the limit of 1.0KiB',
+        'top allocation sites in seekret.apitest:',
+        '  seekret/apitest/*.py:*: +*B in +* blocks',
+    ])
+
+
+def test_no_memory_limit(seekret_pytester):
+    result = seekret_pytester.runpytest('-p', 'seekret.apitest.pytest_plugin',
+                                        '-k', 'leak',
+                                        '--seekret-soak-duration', '0.2',
+                                        '--seekret-soak-max-memory-growth', '0')
+
+    result.assert_outcomes(passed=1)
+
+
+def test_failed_iterations(seekret_pytester):
+    result = seekret_pytester.runpytest('-p', 'seekret.apitest.pytest_plugin',
+                                        '-k', 'flaky',
+                                        '--seekret-soak-duration', '0.2')
+
+    result.assert_outcomes(failed=1)
+    result.stdout.fnmatch_lines(['* iterations failed (*%), more than the allowed error rate of 0.0%*'])
+
+    result = seekret_pytester.runpytest('-p', 'seekret.apitest.pytest_plugin',
+                                        '-k', 'flaky',
+                                        '--seekret-soak-duration', '0.2',
+                                        '--seekret-soak-max-error-rate', '0.6')
+    result.assert_outcomes(passed=1)
+
+
+def test_async_test_warned(seekret_pytester):
+    result = seekret_pytester.runpytest('-p', 'seekret.apitest.pytest_plugin',
+                                        '-k', 'async',
+                                        '--seekret-soak-duration', '0.2')
+
+    result.stdout.fnmatch_lines(['*soak test mode does not support async tests, test_api.py::test_async runs once'])
+
+
+def test_load_and_soak_conflict(seekret_pytester):
+    result = seekret_pytester.runpytest('-p', 'seekret.apitest.pytest_plugin',
+                                        '--seekret-soak-duration', '1',
+                                        '--seekret-load-users', '2')
+
+    assert result.ret == pytest.ExitCode.USAGE_ERROR
+
+
+def test_trends():
+    stats = SoakStats()
+    stats.samples = [
+        SoakSample(iteration=1, elapsed=0, memory=1000, p95={}),
+        SoakSample(iteration=101, elapsed=60, memory=2000, p95={'GET /items': 0.010}),
+        SoakSample(iteration=201, elapsed=120, memory=3000, p95={'GET /items': 0.020}),
+        SoakSample(iteration=301, elapsed=180, memory=4000, p95={'GET /items': 0.030}),
+    ]
+
+    assert stats.memory_growth == 3000
+    assert stats.memory_growth_per_iteration() == pytest.approx(10)
+    assert stats.p95_slope('GET /items') == pytest.approx(0.010 / 60)
+    assert stats.p95_slope('GET /other') == 0
@@ -0,0 +1,56 @@
+import json
+
+pytest_plugins = ['pytester']
+
+
+def test_trace_file(pytester, stand_in_server):
+    pytester.makefile('.yaml', **{'run-profile': f'target_server: {stand_in_server}\nusers: {{}}\n'})
+    pytester.makepyfile(test_api="""
+        def test_get_item(seekret):
+            with seekret.stage(method='GET', path='/api/items/{id}') as request:
+                assert request(path_params={'id': 1}, user=None).status_code == 200
+
+        def test_fails(seekret):
+            assert False
+    """)
+
+    result = pytester.runpytest('-p', 'seekret.apitest.pytest_plugin', '--seekret-trace-file', 'spans.jsonl')
+    result.assert_outcomes(passed=1, failed=1)
+
+    with open(pytester.path / 'spans.jsonl') as f:
+        spans = [
+            span for line in f for resource_spans in json.loads(line)['resourceSpans']
+            for scope_spans in resource_spans['scopeSpans'] for span in scope_spans['spans']
+        ]
+    request, stage, test, failed_test = spans
+    assert test['name'] == 'test_api.py::test_get_item'
+    assert stage['parentSpanId'] == test['spanId']
+    assert request['parentSpanId'] == stage['spanId']
+    assert {span['traceId'] for span in (request, stage, test)} == {test['traceId']}
+    assert test['status'] == {'code': 0}
+    assert failed_test['status'] == {'code': 2, 'message': 'test failed in call'}
+
+
+def test_exporter_hook(pytester, stand_in_server):
+    pytester.makefile('.yaml', **{'run-profile': f'target_server: {stand_in_server}\nusers: {{}}\n'})
+    pytester.makeconftest("""
+        from seekret.apitest.context.tracing import SpanExporter
+
+        class PrintExporter(SpanExporter):
+            def export(self, spans):
+                for span in spans:
+                    print('exported span', span.name)
+
+        def pytest_seekret_span_exporter(config):
+            return PrintExporter()
+    """)
+    pytester.makepyfile(test_api="""
+        def test_get_item(seekret):
+            with seekret.stage(method='GET', path='/api/items') as request:
+                assert request(user=None).status_code == 200
+    """)
+
+    result = pytester.runpytest('-p', 'seekret.apitest.pytest_plugin', '-s')
+    result.assert_outcomes(passed=1)
+    result.stdout.fnmatch_lines(['*exported span GET /api/items', 'exported span Stage #1: GET /api/items',
+                                 'exported span test_api.py::test_get_item'])
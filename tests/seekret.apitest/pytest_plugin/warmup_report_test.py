@@ -0,0 +1,37 @@
+import json
+
+pytest_plugins = ['pytester']
+
+
+def test_warm_up(pytester, stand_in_server):
+    pytester.makefile('.yaml', **{'run-profile': f'target_server: {stand_in_server}\nusers: {{}}\n'})
+    pytester.makepyfile(test_api="""
+        def test_get_item(seekret):
+            with seekret.stage(method='GET', path='/api/items/{id}') as request:
+                assert request(path_params={'id': 1}, user=None).status_code == 200
+    """)
+
+    result = pytester.runpytest('-p', 'seekret.apitest.pytest_plugin', '--seekret-warm-up',
+                                '--seekret-warm-up-connections', '2', '--seekret-event-log', 'events.ndjson')
+    result.assert_outcomes(passed=1)
+    result.stdout.fnmatch_lines(['*seekret warm-up*', 'worker*total*dns*connect*auth*connections*tls resumed',
+                                 '-  *ms*ms*ms*ms*2*0/0'])
+
+    # The warm-up runs after the event log listener is registered, and before the first test.
+    with open(pytester.path / 'events.ndjson') as f:
+        events = [json.loads(line) for line in f]
+    assert [event['event'] for event in events] == ['warm_up', 'stage_started', 'request', 'stage_finished']
+    assert events[0]['connections'] == 2
+    assert events[2]['timings']['connect'] == 0
+
+
+def test_no_warm_up_by_default(pytester, stand_in_server):
+    pytester.makefile('.yaml', **{'run-profile': f'target_server: {stand_in_server}\nusers: {{}}\n'})
+    pytester.makepyfile(test_api="""
+        def test_session(seekret_session):
+            pass
+    """)
+
+    result = pytester.runpytest('-p', 'seekret.apitest.pytest_plugin')
+    result.assert_outcomes(passed=1)
+    assert 'seekret warm-up' not in result.stdout.str()
@@ -0,0 +1,125 @@
+import json
+import os
+
+import pytest
+
+from seekret.apitest.runprofile import RunProfile, RunProfileError, User, UserAuth, ConnectionPool, RequestPolicy
+
+PROFILE = """
+target_server: https://seekret.com
+targets:
+  eu: https://eu.seekret.com
+users:
+  default:
+    auth:
+      type: bearer
+      data:
+        token: abcd
+connection_pool:
+  pool_size: 3
+  keep_alive: false
+request_policy:
+  hedge_after: p95
+  max_retries: 2
+  retry_backoff: 1
+"""
+
+
+@pytest.fixture
+def profile_path(tmp_path):
+    path = tmp_path / 'run-profile.yaml'
+    path.write_text(PROFILE)
+    return path
+
+
+def test_load(profile_path):
+    assert RunProfile.load(profile_path) == RunProfile(
+        target_server='https://seekret.com',
+        users={'default': User(auth=UserAuth(type='bearer', data={'token': 'abcd'}))},
+        targets={'eu': 'https://eu.seekret.com'},
+        connection_pool=ConnectionPool(pool_size=3, keep_alive=False),
+        request_policy=RequestPolicy(hedge_after='p95', max_retries=2, retry_backoff=1))
+
+
+def test_to_dict_round_trip(profile_path):
+    run_profile = RunProfile.load(profile_path)
+    assert RunProfile.from_dict(json.loads(json.dumps(run_profile.to_dict()))) == run_profile
+
+
+class TestCompiledCache:
+    def test_compiled_on_first_load(self, profile_path, tmp_path):
+        cache_dir = tmp_path / 'cache'
+        run_profile = RunProfile.load(profile_path, cache_dir=cache_dir)
+        assert len(os.listdir(cache_dir)) == 1
+        assert RunProfile.load(profile_path, cache_dir=cache_dir) == run_profile
+
+    def test_cache_used_instead_of_parsing(self, profile_path, tmp_path, monkeypatch):
+        cache_dir = tmp_path / 'cache'
+        RunProfile.load(profile_path, cache_dir=cache_dir)
+
+        monkeypatch.setattr('yaml.load', lambda *args, **kwargs: pytest.fail('run profile parsed again'))
+        assert RunProfile.load(profile_path, cache_dir=cache_dir).target_server == 'https://seekret.com'
+
+    def test_changed_file_compiled_again(self, profile_path, tmp_path):
+        cache_dir = tmp_path / 'cache'
+        RunProfile.load(profile_path, cache_dir=cache_dir)
+
+        profile_path.write_text(PROFILE.replace('seekret.com', 'example.com'))
+        assert RunProfile.load(profile_path, cache_dir=cache_dir).target_server == 'https://example.com'
+        # The profile compiled from the earlier file is removed.
+        assert len(os.listdir(cache_dir)) == 1
+
+    def test_other_files_kept(self, profile_path, tmp_path):
+        cache_dir = tmp_path / 'cache'
+        other_path = tmp_path / 'other-profile.yaml'
+        other_path.write_text(PROFILE.replace('seekret.com', 'example.com'))
+
+        RunProfile.load(profile_path, cache_dir=cache_dir)
+        RunProfile.load(other_path, cache_dir=cache_dir)
+        assert len(os.listdir(cache_dir)) == 2
+
+    def test_readable_by_owner_only(self, profile_path, tmp_path):
+        cache_dir = tmp_path / 'cache'
+        RunProfile.load(profile_path, cache_dir=cache_dir)
+        name, = os.listdir(cache_dir)
+        assert os.stat(cache_dir / name).st_mode & 0o777 == 0o600
+
+    def test_values_not_serializable_to_json(self, profile_path, tmp_path):
+        cache_dir = tmp_path / 'cache'
+        profile_path.write_text(PROFILE.replace('token: abcd', 'token: abcd\n        issued: 2024-01-01'))
+
+        run_profile = RunProfile.load(profile_path, cache_dir=cache_dir)
+        assert str(run_profile.users['default'].auth.data['issued']) == '2024-01-01'
+        assert os.listdir(cache_dir) == []
+
+    def test_corrupt_cache_ignored(self, profile_path, tmp_path):
+        cache_dir = tmp_path / 'cache'
+        RunProfile.load(profile_path, cache_dir=cache_dir)
+        for name in os.listdir(cache_dir):
+            (cache_dir / name).write_text('{"version": 1, "sha256": "')
+
+        assert RunProfile.load(profile_path, cache_dir=cache_dir).target_server == 'https://seekret.com'
+
+
+@pytest.mark.parametrize('content, message', [
+    ('target_server: [', 'invalid YAML'),
+    ('- a\n- b', 'expected a mapping, got list'),
+    ('users: {}', 'missing required key "target_server"'),
+    ('target_server: 1\nusers: {}', 'target_server: expected string, got integer'),
+    ('target_server: a\nusers:', 'users: expected mapping, got null'),
+    ('target_server: a\nusers: {alice: {}}', 'users.alice: missing required key "auth"'),
+    ('target_server: a\nusers: {alice: {auth: {type: bearer, data: 1}}}', 'users.alice.auth.data: expected mapping'),
+    ('target_server: a\nusers: {}\nconnection_pool: {size: 1}', 'connection_pool: unknown key "size"'),
+    ('target_server: a\nusers: {}\nconnection_pool: {pool_size: true}', 'connection_pool.pool_size: expected integer'),
+    ('target_server: a\nusers: {}\nrequest_policy: {retry_backoff: fast}', 'request_policy.retry_backoff: expected number'),
+    ('target_server: a\nusers: {}\nrequest_policy: {hedge_after: slow}', 'request_policy.hedge_after: expected seconds'),
+    ('target_server: a\nusers: {}\ntargets: {eu: 1}', 'targets.eu: expected string'),
+    ('target_server: a\nusers: {}\ntargets: {primary: b}', 'targets: "primary" is reserved'),
+])
+def test_malformed_profile(tmp_path, content, message):
+    path = tmp_path / 'run-profile.yaml'
+    path.write_text(content)
+
+    with pytest.raises(RunProfileError, match=message) as e:
+        RunProfile.load(path)
+    assert str(path) in str(e.value)